@@ -26,6 +26,19 @@ class DungeonAreaConfig(BaseModel):
         ]
     ] = None
     fullness: confloat(ge=0.0, le=1.0)
+    # Seconds the rooms can be placed for, not counting the dead end cleanup.
+    time_budget: Optional[confloat(gt=0.0)] = None
+    # Number of failed attempts to place a room after which the placing stops.
+    max_failed_attempts: Optional[conint(ge=1)] = None
+    # Seconds the dead end cleanup can run for.
+    cleanup_time_budget: Optional[confloat(gt=0.0)] = None
+    # Number of origins sampled for each room placed next to another one, the
+    # best scored one is used.
+    placement_candidates: conint(ge=1) = 1
+    # Number of neighbours a new room is fitted next to at once in a thread pool.
+    # It is placed next to the first one in the order they were drawn where it
+    # fits.
+    concurrent_fits: conint(ge=1) = 1
 
     @field_validator("range_room_size")
     @classmethod
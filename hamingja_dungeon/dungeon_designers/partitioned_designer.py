@@ -0,0 +1,282 @@
+from __future__ import annotations
+
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Tuple
+
+import numpy as np
+from hamingja_dungeon.dungeon_designers.config.dungeon_area_config import (
+    DungeonAreaConfig,
+)
+from hamingja_dungeon.dungeon_designers.population_report import (
+    PopulationReport,
+    PopulationStatus,
+)
+from hamingja_dungeon.dungeon_designers.prototype_designer import PrototypeDesigner
+from hamingja_dungeon.dungeon_elements.sector import Sector
+from hamingja_dungeon.utils.dimension_sampler import DimensionSampler
+from hamingja_dungeon.utils.exceptions import EmptyFitArea
+from hamingja_dungeon.utils.morphology.scratch import count_allocations
+from hamingja_dungeon.utils.shared_transfer import SharedPayload, share
+from hamingja_dungeon.utils.utils import derive_seed
+from hamingja_dungeon.utils.vector import Vector
+
+# Number of attempts to grow rooms from the rooms along the seams of two parts
+# that are not connected after the parts are merged.
+STITCH_ATTEMPTS = 64
+# Statuses of the parts from the one reported first for the whole sector.
+STATUS_ORDER = [
+    PopulationStatus.TIME_BUDGET,
+    PopulationStatus.ATTEMPT_BUDGET,
+    PopulationStatus.NO_SPACE,
+    PopulationStatus.FULL,
+]
+
+
+def _split(length: int, parts: int, margin: int) -> list[Tuple[int, int]]:
+    """Splits a length into parts separated by margin free lines. Without a margin
+    the neighbouring parts share one line, so walls of their rooms can overlap."""
+    gap = margin if margin > 0 else -1
+    part_length = (length - (parts - 1) * gap) // parts
+    if part_length < 3:
+        raise ValueError("The parts are too small to hold a room.")
+    result = []
+    for i in range(parts):
+        start = i * (part_length + gap)
+        end = length if i == parts - 1 else start + part_length
+        result.append((start, end))
+    return result
+
+
+def partition(
+    size: Tuple[int, int], parts: Tuple[int, int], margin: int = 0
+) -> list[Tuple[Vector, Tuple[int, int]]]:
+    """Splits an area of the given size into a grid of regions given by their
+    origins and sizes in the row-major order."""
+    if parts[0] <= 0 or parts[1] <= 0 or margin < 0:
+        raise ValueError("The number of parts has to be positive.")
+    return [
+        (Vector(y0, x0), (y1 - y0, x1 - x0))
+        for y0, y1 in _split(size[0], parts[0], margin)
+        for x0, x1 in _split(size[1], parts[1], margin)
+    ]
+
+
+def _populate_part(
+    config: DungeonAreaConfig, seed: int, mask: np.ndarray
+) -> Tuple[PopulationReport, SharedPayload]:
+    """Populates a part limited to the given window of the sector mask."""
+    random.seed(seed)
+    sector = Sector(config.size)
+    sector.array = mask
+    try:
+        report = PrototypeDesigner(config).populate(sector)
+    except EmptyFitArea:
+        report = PopulationReport(
+            status=PopulationStatus.NO_SPACE,
+            fullness=sector.fullness(),
+            rooms=0,
+            failed_attempts=0,
+            elapsed=0.0,
+            cleanup_elapsed=0.0,
+            cleanup_complete=True,
+        )
+    return report, share(sector)
+
+
+class PartitionedDesigner:
+    """Populates a large sector by splitting it into a grid of parts populated in
+    parallel worker processes with independent seeds. Each part is its own sector
+    limited to its window of the sector mask. The rooms of the parts are then
+    merged into the sector and the parts are stitched: rooms sharing a wall
+    across a seam get an entrance, and the seams of parts that stay disconnected
+    are bridged by rooms grown from the rooms along them."""
+
+    def __init__(
+        self,
+        config: DungeonAreaConfig,
+        parts: Tuple[int, int] = (2, 2),
+        margin: int = 0,
+        workers: int = None,
+    ):
+        self.config = config
+        self.parts = parts
+        self.margin = margin
+        self.workers = workers
+        # Pairs of indices of the neighbouring parts that ended up connected.
+        self.stitched: list[Tuple[int, int]] = []
+
+    def _part_config(self, size: Tuple[int, int]) -> DungeonAreaConfig:
+        """Returns the config of a part. Room sizes given by factors are turned
+        into ranges so the rooms are sized by the whole sector."""
+        update = {"size": size}
+        if self.config.room_size_method == "factor":
+            sampler = DimensionSampler.as_factor(
+                self.config.size, self.config.factor_room_size
+            )
+            update["room_size_method"] = "range"
+            update["range_room_size"] = (
+                sampler.min_h,
+                sampler.max_h,
+                sampler.min_w,
+                sampler.max_w,
+            )
+        return self.config.model_copy(update=update)
+
+    def _neighbouring_parts(self) -> list[Tuple[int, int]]:
+        rows, columns = self.parts
+        result = []
+        for i in range(rows * columns):
+            if i % columns + 1 < columns:
+                result.append((i, i + 1))
+            if i + columns < rows * columns:
+                result.append((i, i + columns))
+        return result
+
+    def _connected_parts(
+        self, sector: Sector, part_of: dict[int, int]
+    ) -> set[Tuple[int, int]]:
+        membership = sector.room_graph.connected_components().membership
+        parts_of_component: dict[int, set[int]] = {}
+        for room_id, part in part_of.items():
+            if room_id not in sector.children:
+                continue
+            component = membership[sector.vertex_index(room_id)]
+            parts_of_component.setdefault(component, set()).add(part)
+        return {
+            pair
+            for pair in self._neighbouring_parts()
+            if any(pair[0] in p and pair[1] in p for p in parts_of_component.values())
+        }
+
+    def _connect_across(self, sector: Sector, part_of: dict[int, int]) -> None:
+        """Makes entrances between rooms of different parts that share a wall."""
+        for room_id in sorted(part_of):
+            for nearby_id in sorted(sector.rooms_sharing_entrypoints(room_id)):
+                if part_of.get(nearby_id, part_of[room_id]) == part_of[room_id]:
+                    continue
+                if sector.is_within_hops(room_id, nearby_id, 2):
+                    continue
+                sector.make_entrance(room_id, nearby_id)
+
+    def _seam_rooms(
+        self,
+        sector: Sector,
+        part_of: dict[int, int],
+        regions: list[Tuple[Vector, Tuple[int, int]]],
+        pair: Tuple[int, int],
+        reach: int,
+    ) -> list[int]:
+        """Returns the rooms of the two parts lying within the reach of the region
+        of the other part."""
+        result = []
+        for room_id in sorted(part_of):
+            part = part_of[room_id]
+            if part not in pair:
+                continue
+            other_origin, other_size = regions[pair[1] if part == pair[0] else pair[0]]
+            child = sector.get_child(room_id)
+            if (
+                child.origin.y < other_origin.y + other_size[0] + reach
+                and other_origin.y < child.origin.y + child.object.h + reach
+                and child.origin.x < other_origin.x + other_size[1] + reach
+                and other_origin.x < child.origin.x + child.object.w + reach
+            ):
+                result.append(room_id)
+        return result
+
+    def populate(self, sector: Sector, seed: int = None) -> PopulationReport:
+        """Fills an empty sector with rooms and hallways. The result is determined
+        by the seed, not by the number of workers. Parts with no free tile in the
+        sector mask are skipped.
+
+        The report sums the attempts and allocations of the parts and the
+        stitching. Its status is the first of the part statuses in STATUS_ORDER
+        and its times are measured on the wall clock, the parts overlapping."""
+        if sector.children:
+            raise ValueError("The sector has to be empty.")
+        if seed is None:
+            seed = random.getrandbits(64)
+        start = time.perf_counter()
+        regions = partition(sector.size, self.parts, self.margin)
+        configs = [self._part_config(size) for _, size in regions]
+        seeds = [derive_seed(seed, "part", i) for i in range(len(regions))]
+        masks = [
+            np.asarray(sector.array[o.y : o.y + size[0], o.x : o.x + size[1]])
+            for o, size in regions
+        ]
+        indices = [i for i, mask in enumerate(masks) if mask.any()]
+        futures = []
+        try:
+            with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                for i in indices:
+                    futures.append(
+                        executor.submit(_populate_part, configs[i], seeds[i], masks[i])
+                    )
+            results = [future.result() for future in futures]
+            reports = [report for report, _ in results]
+            parts = [payload.load() for _, payload in results]
+        finally:
+            # The blocks are not tracked, the parts not loaded because of an
+            # error are freed here.
+            for future in futures:
+                if not future.cancelled() and future.exception() is None:
+                    future.result()[1].release()
+
+        part_of = {}
+        for i, part in zip(indices, parts):
+            for room_id in sector.add_sector(regions[i][0], part).values():
+                part_of[room_id] = i
+        state = random.getstate()
+        random.seed(derive_seed(seed, "stitch"))
+        try:
+            with count_allocations() as allocations:
+                cleanup_elapsed = self._stitch(sector, part_of, regions)
+        finally:
+            random.setstate(state)
+        self.stitched = sorted(self._connected_parts(sector, part_of))
+        for report in reports:
+            allocations.add(report.allocations)
+        statuses = {report.status for report in reports}
+        return PopulationReport(
+            status=next(
+                (status for status in STATUS_ORDER if status in statuses),
+                PopulationStatus.NO_SPACE,
+            ),
+            fullness=sector.fullness(),
+            rooms=len(sector.get_rooms()),
+            failed_attempts=sum(report.failed_attempts for report in reports),
+            elapsed=time.perf_counter() - start - cleanup_elapsed,
+            cleanup_elapsed=cleanup_elapsed,
+            cleanup_complete=all(report.cleanup_complete for report in reports),
+            allocations=allocations,
+        )
+
+    def _stitch(
+        self,
+        sector: Sector,
+        part_of: dict[int, int],
+        regions: list[Tuple[Vector, Tuple[int, int]]],
+    ) -> float:
+        """Connects the parts. Returns the seconds spent removing the dead
+        ends."""
+        self._connect_across(sector, part_of)
+        designer = PrototypeDesigner(self._part_config(sector.size))
+        sampler = designer.room_dim_sampler
+        reach = self.margin + max(sampler.max_h, sampler.max_w)
+        connected = self._connected_parts(sector, part_of)
+        for pair in self._neighbouring_parts():
+            if pair in connected:
+                continue
+            start_rooms = self._seam_rooms(sector, part_of, regions, pair, reach)
+            if not start_rooms:
+                continue
+            known = set(sector.get_rooms())
+            designer.grow(sector, start_rooms, STITCH_ATTEMPTS)
+            for room_id in set(sector.get_rooms()) - known:
+                part_of[room_id] = -1
+            connected = self._connected_parts(sector, part_of)
+        cleanup_start = time.perf_counter()
+        designer.remove_dead_ends(sector)
+        return time.perf_counter() - cleanup_start
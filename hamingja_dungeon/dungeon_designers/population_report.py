@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from enum import Enum
+
+from hamingja_dungeon.utils.morphology.scratch import AllocationCounter
+
+
+class PopulationStatus(Enum):
+    """Why the placing of rooms stopped."""
+
+    FULL = "full"
+    NO_SPACE = "no_space"
+    TIME_BUDGET = "time_budget"
+    ATTEMPT_BUDGET = "attempt_budget"
+
+
+@dataclass
+class PopulationReport:
+    """Summary of a populate call."""
+
+    status: PopulationStatus
+    fullness: float
+    rooms: int
+    failed_attempts: int
+    # Seconds spent placing the rooms and cleaning up the dead ends.
+    elapsed: float
+    cleanup_elapsed: float
+    # False if the cleanup ran out of its budget.
+    cleanup_complete: bool
+    # Morphology buffers of the placing thread and of the threads fitting rooms.
+    allocations: AllocationCounter = field(default_factory=AllocationCounter)
+
+    def is_complete(self) -> bool:
+        """Checks whether no budget cut the population short."""
+        return (
+            self.status in (PopulationStatus.FULL, PopulationStatus.NO_SPACE)
+            and self.cleanup_complete
+        )
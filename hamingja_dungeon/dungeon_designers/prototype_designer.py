@@ -1,30 +1,51 @@
+import os
 import random
-from copy import deepcopy
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from typing import Iterator
 
 import igraph as ig
+import numpy as np
 from hamingja_dungeon.dungeon_elements.hallway import Hallway
-from hamingja_dungeon.dungeon_elements.mask import Mask
 from hamingja_dungeon.hallway_designers.hallway_designer import (
     DesignerError,
     HallwayDesigner,
 )
 from hamingja_dungeon.utils.dimension_sampler import DimensionSampler
+from hamingja_dungeon.dungeon_elements.mask import MaskWithOrigin
 from hamingja_dungeon.dungeon_elements.sector import Sector
 from hamingja_dungeon.utils.direction import Direction
 from hamingja_dungeon.utils.exceptions import EmptyFitArea
+from hamingja_dungeon.utils.morphology.scratch import (
+    AllocationCounter,
+    count_allocations,
+    scratch_pool,
+)
 from hamingja_dungeon.dungeon_elements.room import CircleRoom, LRoom, Room
 from hamingja_dungeon.dungeon_designers.config.dungeon_area_config import (
     DungeonAreaConfig,
 )
+from hamingja_dungeon.dungeon_designers.population_report import (
+    PopulationReport,
+    PopulationStatus,
+)
 from hamingja_dungeon.tile_types import carpet
 
 
 # TODO look for entrances and not put new ones close to the already placed.
 class PrototypeDesigner:
-    def __init__(self, config: DungeonAreaConfig):
+    def __init__(self, config: DungeonAreaConfig, workers: int = None):
         self._to_process: list[int] = []
         self.hallway_designer = None
         self.config = config
+        # Threads fitting a new room next to several neighbours at once. The
+        # result does not depend on their number.
+        self.workers = workers
+        self._executor: ThreadPoolExecutor | None = None
+        self._failed_attempts = 0
+        # Morphology buffers given out during the last populate call.
+        self.allocations = AllocationCounter()
         if config.room_size_method == "factor":
             self.room_dim_sampler = DimensionSampler.as_factor(
                 config.size,
@@ -35,6 +56,13 @@ class PrototypeDesigner:
         else:
             self.room_dim_sampler = DimensionSampler.fixed(config.fixed_room_size)
 
+    def _smallest_room_square(self) -> int:
+        """Returns a lower bound of the side of the largest square inside any room
+        this designer can create, not counting the walls. The narrower arm of an
+        L room is at least a third of its size."""
+        min_side = min(self.room_dim_sampler.min_h, self.room_dim_sampler.min_w)
+        return max(min_side // 3 - 2, 0)
+
     def _get_room(self):
         size = self.room_dim_sampler.sample()
         num = random.random()
@@ -58,7 +86,14 @@ class PrototypeDesigner:
             origin_point, Direction.get_all_directions()
         )
 
-    def _prepare(self, dungeon_area: Sector):
+    def _prepare(self, dungeon_area: Sector, start_rooms: list[int] = None):
+        """Starts the queue of the rooms to grow from anew, so rooms queued by an
+        earlier call are not grown again."""
+        self.hallway_designer = HallwayDesigner(dungeon_area)
+        self._to_process = []
+        if start_rooms:
+            self._to_process.extend(dict.fromkeys(start_rooms))
+            return
         start_room = self._get_room()
         start_room.draw_inside(carpet)
         fit_area = dungeon_area.fit_in(start_room)
@@ -67,34 +102,38 @@ class PrototypeDesigner:
         origin = fit_area.sample_mask_coordinate()
         id = dungeon_area.add_room(origin, start_room)
         self._to_process.append(id)
-        self.hallway_designer = HallwayDesigner(dungeon_area)
 
-    def connect_nearby(self, sector: Sector, room_id: int) -> None:
+    @staticmethod
+    def _nearby_rooms(sector: Sector, room_id: int) -> Iterator[int]:
+        """Yields the rooms sharing entrypoints with the room in the order they
+        have always been visited, which decides the random entrances made to
+        them. Each room is met at the first entrypoint of the room, in row-major
+        order, that it covers, and the rooms are visited in the order of a set
+        they are added to as they are met."""
         child = sector.get_child(room_id)
-        room = child.object
-        origin = child.origin
+        origin = (child.origin.y, child.origin.x)
+        entrypoints = np.argwhere(child.object.entrypoints.array) + origin
+        entrypoints = entrypoints[(entrypoints < sector.size).all(axis=1)]
+        met = []
+        for nearby_id in sector.rooms_sharing_entrypoints(room_id):
+            nearby = sector.get_child(nearby_id)
+            local = entrypoints - (nearby.origin.y, nearby.origin.x)
+            inside = ((local >= 0) & (local < nearby.object.size)).all(axis=1)
+            covered = np.zeros(len(local), dtype=bool)
+            covered[inside] = nearby.object.array[local[inside, 0], local[inside, 1]]
+            met.append((int(np.argmax(covered)), nearby_id))
+        nearby_ids = set()
+        for _, nearby_id in sorted(met):
+            nearby_ids.add(nearby_id)
+        yield from nearby_ids
+
+    def connect_nearby(self, sector: Sector, room_id: int) -> None:
+        room = sector.get_child(room_id).object
         if not isinstance(room, Room):
             raise ValueError("Can connect only rooms.")
 
-        entrypoints = Mask.empty_mask(sector.size).insert_shape(origin, room.entrypoints)
-
-        nearby = set()
-        for entrypoint in entrypoints.mask_coordinates():
-            ids = sector.get_children_at(entrypoint)
-            ids.remove(room_id)
-            for id in ids:
-                child = sector.get_child(id)
-                if not isinstance(child.object, Room):
-                    continue
-                child_entrypoints = Mask.empty_mask(sector.size).insert_shape(
-                    child.origin, child.object.entrypoints
-                )
-                if not (entrypoints & child_entrypoints).is_empty():
-                    nearby.add(id)
-
-        for nearby_id in nearby:
-            distance = sector.room_graph.distances(room_id, nearby_id)[0][0]
-            if distance < 3:
+        for nearby_id in self._nearby_rooms(sector, room_id):
+            if sector.is_within_hops(room_id, nearby_id, 2):
                 continue
             sector.make_entrance(room_id, nearby_id)
 
@@ -106,13 +145,13 @@ class PrototypeDesigner:
         while tries < 2:
             num = random.random()
             if num < 0.6 or isinstance(sector.get_child(neighbour_id).object, Hallway):
-                room = self._get_room()
                 try:
-                    new_room_id = sector.add_room_adjacent(room, neighbour_id)
+                    new_room_id = self._add_adjacent_room(sector, neighbour_id)
                     # sector.make_entrance(neighbour_id, new_room_id)
                     self.connect_nearby(sector, new_room_id)
                 except EmptyFitArea:
                     tries += 1
+                    self._failed_attempts += 1
                     continue
                 self._to_process.append(new_room_id)
                 return 1
@@ -125,27 +164,173 @@ class PrototypeDesigner:
 
                 except DesignerError:
                     tries += 1
+                    self._failed_attempts += 1
                     continue
                 self._to_process.append(new_room_id)
                 return 1
         self._to_process.remove(neighbour_id)
         return 1
 
-    def remove_dead_ends(self, sector: Sector):
-        rooms_copy = deepcopy(sector.get_rooms())
-        for room_id, room in rooms_copy.items():
-            if not isinstance(room.object, Hallway):
-                continue
-            if room.object.has_dead_end():
-                sector.remove_room(room_id)
+    @contextmanager
+    def _fit_executor(self) -> Iterator[None]:
+        """Runs the thread pool fitting the new rooms while placing them if they
+        are fitted next to more neighbours at once."""
+        if self.config.concurrent_fits == 1:
+            yield
+            return
+        cpus = os.cpu_count() or 1
+        workers = self.workers or min(self.config.concurrent_fits, cpus)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            self._executor = executor
+            try:
+                yield
+            finally:
+                self._executor = None
+
+    @staticmethod
+    def _fit_adjacent(
+        sector: Sector, neighbour_id: int, room: Room
+    ) -> MaskWithOrigin | None:
+        """Fits the room next to the neighbour without changing the sector, so
+        it can run in a worker thread. None if the room does not fit."""
+        if not sector.room_may_fit(room, neighbour_id=neighbour_id):
+            return None
+        fit_area = sector.fit_room_adjacent(room, neighbour_id=neighbour_id)
+        return None if fit_area.is_empty() else fit_area
+
+    @staticmethod
+    def _fit_adjacent_counted(
+        sector: Sector, neighbour_id: int, room: Room
+    ) -> tuple[MaskWithOrigin | None, AllocationCounter]:
+        """Fits the room in a worker thread and counts the buffers it used, so
+        they can be added to the counters of the placing thread."""
+        with count_allocations() as allocations:
+            fit_area = PrototypeDesigner._fit_adjacent(sector, neighbour_id, room)
+        return fit_area, allocations
+
+    def _add_adjacent_room(self, sector: Sector, neighbour_id: int) -> int:
+        """Adds a new room next to the neighbour. With concurrent fits the room
+        is also fitted next to other rooms waiting to be processed, drawn at
+        random, in the thread pool. It is placed next to the first of them in
+        the order they were drawn where it fits. All random numbers are drawn in
+        this thread in a fixed order, so the result depends only on the seed."""
+        room = self._get_room()
+        candidates = self.config.placement_candidates
+        if self._executor is None:
+            return sector.add_room_adjacent(room, neighbour_id, candidates=candidates)
+        others = [id for id in self._to_process if id != neighbour_id]
+        neighbours = [neighbour_id] + random.sample(
+            others, min(len(others), self.config.concurrent_fits - 1)
+        )
+        # Built here so the threads only read it.
+        sector.free_pyramid
+        futures = [
+            self._executor.submit(self._fit_adjacent_counted, sector, id, room)
+            for id in neighbours
+        ]
+        try:
+            for future in futures:
+                fit_area = future.result()[0]
+                if fit_area is not None:
+                    break
+            else:
+                raise EmptyFitArea("The new room cannot be fitted.")
+        finally:
+            # The sector cannot change while the threads still read it.
+            for future in futures:
+                future.cancel()
+            wait(futures)
+            pool = scratch_pool()
+            for future in futures:
+                if not future.cancelled() and future.exception() is None:
+                    pool.merge(future.result()[1])
+        return sector.add_room_at_fit(room, fit_area, candidates=candidates)
+
+    def remove_dead_ends(self, sector: Sector, deadline: float = None) -> bool:
+        """Removes the hallways with a dead end. Stops at the deadline given as a
+        time.perf_counter value and returns False if it was reached."""
+        # Removing a hallway removes entrances of its neighbours, so the dead ends
+        # are all found before any hallway is removed.
+        dead_ends = [
+            room_id
+            for room_id, room in sector.get_rooms().items()
+            if isinstance(room.object, Hallway) and room.object.has_dead_end()
+        ]
+        for room_id in dead_ends:
+            if deadline is not None and time.perf_counter() >= deadline:
+                return False
+            sector.remove_room(room_id)
+        return True
+
+    def grow(self, sector: Sector, start_rooms: list[int], attempts: int) -> None:
+        """Adds rooms growing from the given rooms of an already populated sector
+        for at most the given number of attempts."""
+        self._prepare(sector, start_rooms)
+        with self._fit_executor():
+            for _ in range(attempts):
+                if self._add_room(sector) == -1:
+                    break
 
     # TODO populate with iterations.
-    def populate(self, sector: Sector):
-        self._prepare(sector)
+    def populate(
+        self, sector: Sector, start_rooms: list[int] = None
+    ) -> PopulationReport:
+        """Fills the sector with rooms and hallways. The rooms grow from the given
+        rooms already in the sector or from a randomly placed first room. Placing
+        stops when the sector is full enough, when no room fits or when a budget of
+        the config is spent, the dead end cleanup then runs within its own
+        budget."""
+        with count_allocations() as allocations:
+            report = self._populate(sector, start_rooms)
+        self.allocations = allocations
+        report.allocations = allocations
+        return report
+
+    def _deadline(self, start: float, budget: float | None) -> float | None:
+        return None if budget is None else start + budget
+
+    def _place_rooms(self, sector: Sector, deadline: float | None) -> PopulationStatus:
+        smallest_room_square = self._smallest_room_square()
+        max_failed_attempts = self.config.max_failed_attempts
         while sector.fullness() < self.config.fullness:
+            if not sector.free_pyramid.has_free_square(smallest_room_square):
+                return PopulationStatus.NO_SPACE
+            if deadline is not None and time.perf_counter() >= deadline:
+                return PopulationStatus.TIME_BUDGET
+            if (
+                max_failed_attempts is not None
+                and self._failed_attempts >= max_failed_attempts
+            ):
+                return PopulationStatus.ATTEMPT_BUDGET
             code = self._add_room(sector)
             if code == -1:
-                break
-        self.remove_dead_ends(sector)
-        self.remove_dead_ends(sector)
-        self.remove_dead_ends(sector)
+                return PopulationStatus.NO_SPACE
+        return PopulationStatus.FULL
+
+    def _populate(
+        self, sector: Sector, start_rooms: list[int] = None
+    ) -> PopulationReport:
+        start = time.perf_counter()
+        self._failed_attempts = 0
+        self._prepare(sector, start_rooms)
+        with self._fit_executor():
+            status = self._place_rooms(
+                sector, self._deadline(start, self.config.time_budget)
+            )
+        cleanup_start = time.perf_counter()
+        cleanup_deadline = self._deadline(
+            cleanup_start, self.config.cleanup_time_budget
+        )
+        cleanup_complete = all(
+            self.remove_dead_ends(sector, cleanup_deadline) for _ in range(3)
+        )
+        end = time.perf_counter()
+        return PopulationReport(
+            status=status,
+            fullness=sector.fullness(),
+            rooms=len(sector.get_rooms()),
+            failed_attempts=self._failed_attempts,
+            elapsed=cleanup_start - start,
+            cleanup_elapsed=end - cleanup_start,
+            cleanup_complete=cleanup_complete,
+        )
@@ -0,0 +1,246 @@
+from __future__ import annotations
+
+import os
+import pickle
+import random
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+from typing import Tuple
+
+from hamingja_dungeon.dungeon_designers.config.dungeon_area_config import (
+    DungeonAreaConfig,
+)
+from hamingja_dungeon.dungeon_designers.prototype_designer import PrototypeDesigner
+from hamingja_dungeon.dungeon_elements.room import Room
+from hamingja_dungeon.dungeon_elements.sector import Sector
+from hamingja_dungeon.tile_types import carpet
+from hamingja_dungeon.utils.ascii_dungeon_generator.dungeon_cache import (
+    dungeon_key,
+    is_cacheable,
+)
+from hamingja_dungeon.utils.direction import Direction
+from hamingja_dungeon.utils.utils import derive_seed
+from hamingja_dungeon.utils.vector import NEIGHBOUR_OFFSETS, Vector
+
+# Number of chunks a world keeps in memory.
+WORLD_CACHE_SIZE = 16
+# Side of the rooms placed at the gates between chunks.
+GATE_SIZE = 5
+
+# Coordinates of the entrance of a gate room at the border in each direction.
+GATE_ENTRANCES = {
+    Direction.NORTH: Vector(0, GATE_SIZE // 2),
+    Direction.EAST: Vector(GATE_SIZE // 2, GATE_SIZE - 1),
+    Direction.SOUTH: Vector(GATE_SIZE - 1, GATE_SIZE // 2),
+    Direction.WEST: Vector(GATE_SIZE // 2, 0),
+}
+
+# The designers draw from the global random generator, so chunks generated in this
+# process are generated one at a time with the generator seeded for the chunk.
+_generation_lock = threading.Lock()
+
+
+def _generate_chunk(
+    config: DungeonAreaConfig, seed: int, gates: dict[Direction, Vector]
+) -> Sector:
+    """Generates a chunk with the global random generator seeded by the seed."""
+    random.seed(seed)
+    sector = Sector(config.size)
+    gate_ids = []
+    for direction, point in gates.items():
+        gate = Room((GATE_SIZE, GATE_SIZE))
+        gate.draw_inside(carpet)
+        gate.place_entrance(GATE_ENTRANCES[direction])
+        gate_ids.append(sector.add_room(point - GATE_ENTRANCES[direction], gate))
+    PrototypeDesigner(config).populate(sector, start_rooms=gate_ids)
+    return sector
+
+
+class World:
+    """An unbounded dungeon made of chunks generated on demand. Every chunk is a
+    sector of the configured size populated by the prototype designer with a seed
+    derived from the world seed and the chunk coordinates, so it is the same
+    whenever it is generated.
+
+    Two neighbouring chunks agree on a gate on their common border. Both place a
+    room with an entrance on the border at the gate and grow their rooms from it,
+    so the chunks connect at the seam.
+
+    Recently used chunks are kept in memory, all generated chunks are kept in the
+    cache directory if one is given. The neighbours of a requested chunk are
+    generated in the background in a worker process, so the prefetching does not
+    touch the random generator of this process. Chunks requested before they are
+    prefetched are generated in the calling thread, which saves and restores the
+    state of the global random generator around the generation. The returned
+    sectors are shared, they should not be changed."""
+
+    def __init__(
+        self,
+        config: DungeonAreaConfig,
+        seed: int,
+        cache_dir: Path | str = None,
+        cache_size: int = WORLD_CACHE_SIZE,
+        prefetch: bool = True,
+    ):
+        if min(config.size) < 3 * GATE_SIZE:
+            raise ValueError("The chunks have to be at least three gates wide.")
+        if cache_size <= 0:
+            raise ValueError("The cache size has to be positive.")
+        self.config = config
+        self.seed = seed
+        self.cache_size = cache_size
+        self.cache_dir = None
+        # Chunks generated within a time budget are not the same every time, so
+        # they are not kept on disk.
+        if cache_dir is not None and is_cacheable(config):
+            # The key changes with the library version, so chunks of an older
+            # generator are not served.
+            self.cache_dir = Path(cache_dir) / dungeon_key(config, seed)
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._chunks: OrderedDict[Tuple[int, int], Sector] = OrderedDict()
+        self._pending: dict[Tuple[int, int], Future] = {}
+        self._lock = threading.Lock()
+        self._executor = ProcessPoolExecutor(max_workers=1) if prefetch else None
+
+    def __enter__(self) -> World:
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Waits for the running prefetches and stops prefetching."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+            self._pending.clear()
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def chunk_seed(self, cy: int, cx: int) -> int:
+        return derive_seed(self.seed, "chunk", cy, cx)
+
+    def _gate_offset(self, seam: Tuple[str, int, int]) -> int:
+        """Returns the position of the gate along a seam. Vertical seams are keyed
+        by x and the chunk to their east, horizontal seams by y and the chunk to
+        their south. Gates stay a gate away from the corners so the gate rooms of
+        different sides never overlap."""
+        length = self.config.size[0] if seam[0] == "x" else self.config.size[1]
+        rng = random.Random(derive_seed(self.seed, "seam", *seam))
+        margin = GATE_SIZE + GATE_SIZE // 2
+        return rng.randrange(margin, length - margin)
+
+    def gates(self, cy: int, cx: int) -> dict[Direction, Vector]:
+        """Returns the coordinates of the border entrances of the chunk leading to
+        its neighbours in each direction."""
+        h, w = self.config.size
+        return {
+            Direction.NORTH: Vector(0, self._gate_offset(("y", cy, cx))),
+            Direction.EAST: Vector(self._gate_offset(("x", cy, cx + 1)), w - 1),
+            Direction.SOUTH: Vector(h - 1, self._gate_offset(("y", cy + 1, cx))),
+            Direction.WEST: Vector(self._gate_offset(("x", cy, cx)), 0),
+        }
+
+    def _generate(self, cy: int, cx: int) -> Sector:
+        with _generation_lock:
+            state = random.getstate()
+            try:
+                return _generate_chunk(
+                    self.config, self.chunk_seed(cy, cx), self.gates(cy, cx)
+                )
+            finally:
+                random.setstate(state)
+
+    def _chunk_path(self, key: Tuple[int, int]) -> Path | None:
+        if self.cache_dir is None:
+            return None
+        return self.cache_dir / f"chunk_{key[0]}_{key[1]}.pickle"
+
+    def _load(self, key: Tuple[int, int]) -> Sector:
+        """Reads the chunk from the cache directory or generates it, and keeps it
+        in memory."""
+        path = self._chunk_path(key)
+        if path is not None and path.exists():
+            with open(path, "rb") as file:
+                sector = pickle.load(file)
+        else:
+            sector = self._generate(*key)
+        self._store(key, sector)
+        return sector
+
+    def _store(self, key: Tuple[int, int], sector: Sector) -> None:
+        """Keeps the chunk in memory and writes it to the cache directory if it
+        is not there yet."""
+        path = self._chunk_path(key)
+        if path is not None and not path.exists():
+            descriptor, temporary = tempfile.mkstemp(dir=self.cache_dir)
+            try:
+                with os.fdopen(descriptor, "wb") as file:
+                    pickle.dump(sector, file, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(temporary, path)
+            except BaseException:
+                os.unlink(temporary)
+                raise
+        with self._lock:
+            self._chunks[key] = sector
+            self._chunks.move_to_end(key)
+            while len(self._chunks) > self.cache_size:
+                self._chunks.popitem(last=False)
+            self._pending.pop(key, None)
+
+    def _prefetched(self, key: Tuple[int, int], future: Future) -> None:
+        """Stores a chunk generated in the background."""
+        with self._lock:
+            if self._pending.get(key) is not future:
+                return
+        if future.cancelled() or future.exception() is not None:
+            with self._lock:
+                self._pending.pop(key, None)
+            return
+        self._store(key, future.result())
+
+    def _prefetch_neighbours(self, key: Tuple[int, int]) -> None:
+        with self._lock:
+            if self._executor is None:
+                return
+            for dy, dx in NEIGHBOUR_OFFSETS:
+                neighbour = (key[0] + dy, key[1] + dx)
+                if neighbour in self._chunks or neighbour in self._pending:
+                    continue
+                path = self._chunk_path(neighbour)
+                if path is not None and path.exists():
+                    continue
+                future = self._executor.submit(
+                    _generate_chunk,
+                    self.config,
+                    self.chunk_seed(*neighbour),
+                    self.gates(*neighbour),
+                )
+                self._pending[neighbour] = future
+                future.add_done_callback(
+                    lambda done, neighbour=neighbour: self._prefetched(neighbour, done)
+                )
+
+    def chunk(self, cy: int, cx: int) -> Sector:
+        """Returns the chunk at the given chunk coordinates and starts generating
+        its neighbours."""
+        key = (cy, cx)
+        with self._lock:
+            sector = self._chunks.get(key)
+            if sector is not None:
+                self._chunks.move_to_end(key)
+            future = self._pending.get(key)
+        if sector is None and future is not None:
+            try:
+                sector = future.result()
+            except Exception:
+                # A failed or cancelled prefetch is retried here.
+                sector = None
+            else:
+                self._store(key, sector)
+        if sector is None:
+            sector = self._load(key)
+        self._prefetch_neighbours(key)
+        return sector
@@ -1,13 +1,12 @@
 from __future__ import annotations
 
 import itertools
-from copy import deepcopy
 from dataclasses import dataclass
 from typing import Tuple
 
 import numpy as np
 
-from hamingja_dungeon.dungeon_elements.mask import Mask
+from hamingja_dungeon.dungeon_elements.mask import LazyMask, Mask, MaskWithOrigin
 from hamingja_dungeon.tile_types import default, tile_dt
 from hamingja_dungeon.utils.vector import Vector
 
@@ -18,9 +17,44 @@ class AreaWithOrigin:
     object: Area
 
 
+class SavedArrays:
+    """Contents of the arrays of an area at a snapshot. An array stays None until
+    it is first changed after the snapshot, when its old contents are copied
+    here."""
+
+    def __init__(self):
+        self.array: np.ndarray | None = None
+        self.tiles: np.ndarray | None = None
+
+
+@dataclass(frozen=True)
+class AreaSnapshot:
+    """State of an area taken by Area.snapshot. It refers to the saved contents of
+    the arrays of the area and to the position of its marker in the mutation
+    log."""
+
+    log: list
+    position: int
+    token: object
+    saved: SavedArrays
+
+
 class Area(Mask):
     """Represent an area in the dungeon with its tile representation.
-    It can have sub-areas (children)."""
+    It can have sub-areas (children).
+
+    Snapshots are cheap: the contents of the arrays are copied into the snapshot
+    only when they are first changed after it, and changes of the children are
+    recorded in a log that is undone when a snapshot is restored. The arrays
+    themselves are changed in place, so views of them stay valid."""
+
+    # True while the tiles are shared with a drawing copy.
+    _tiles_shared = False
+    # Log of the changes made since the first snapshot, None without snapshots.
+    _log: list | None = None
+    # Snapshots whose mask or tiles have not been saved yet.
+    _unsaved_array: tuple | list = ()
+    _unsaved_tiles: tuple | list = ()
 
     def __init__(self, size: Tuple[int, int], fill_value: np.ndarray = None):
         super().__init__(size)
@@ -30,10 +64,60 @@ class Area(Mask):
         self.children: dict[int, AreaWithOrigin] = {}
         self.id_generator = itertools.count()
 
+    def __getstate__(self) -> dict:
+        """The id generator is stored as the next id, iterators cannot be pickled
+        on all versions. Snapshots stay with the original."""
+        next_id = next(self.id_generator)
+        self.id_generator = itertools.count(next_id)
+        state = self.__dict__.copy()
+        state["id_generator"] = next_id
+        state.pop("_log", None)
+        state.pop("_unsaved_array", None)
+        state.pop("_unsaved_tiles", None)
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self.id_generator = itertools.count(state["id_generator"])
+
     @property
     def tiles(self) -> np.ndarray:
         return self._tiles
 
+    @property
+    def array(self) -> np.ndarray:
+        return self._array
+
+    @array.setter
+    def array(self, new_array: np.ndarray) -> None:
+        self._save_array()
+        Mask.array.fset(self, new_array)
+
+    def _save_array(self) -> None:
+        """Saves the mask into the snapshots taken since it last changed."""
+        if self._unsaved_array:
+            saved_array = self._array.copy()
+            for saved in self._unsaved_array:
+                saved.array = saved_array
+            self._unsaved_array = []
+
+    def _own_array(self) -> np.ndarray:
+        self._save_array()
+        return super()._own_array()
+
+    def _own_tiles(self) -> np.ndarray:
+        """Saves the tiles into the snapshots taken since they last changed and
+        copies them if they are shared so they can be changed in place."""
+        if self._unsaved_tiles:
+            saved_tiles = self._tiles.copy()
+            for saved in self._unsaved_tiles:
+                saved.tiles = saved_tiles
+            self._unsaved_tiles = []
+        if self._tiles_shared:
+            self._tiles = self._tiles.copy()
+            self._tiles_shared = False
+        return self._tiles
+
     def in_childless_area(self, point: Vector) -> bool:
         """Checks whether a point is in an area not occupied by children."""
         return self.childless_shape().is_inside_mask(point)
@@ -75,23 +159,23 @@ class Area(Mask):
 
     def childless_shape(self) -> Mask:
         """Returns a shape with the children removed."""
-        result = Mask.from_array(self.array)
-        return result & ~self.children_shapes()
+        return (self.lazy() - self.children_shapes()).evaluate()
 
     def inner_shape(self) -> Mask:
         """Returns a shape without the border."""
-        return Mask.from_array(self.array) - self.border()
+        return (self.lazy() - self.border()).evaluate()
 
     def draw(self, value: np.ndarray, mask: Mask = None) -> None:
         """Will draw on the area with the given value with respect to the
         given mask. If no mask is given will draw everywhere."""
-        if mask is None:
-            mask = Mask(self.size)
         if value.dtype != tile_dt:
             raise ValueError("Fill value has to have the tile dtype.")
+        if mask is None:
+            self._own_tiles()[...] = value
+            return
         if mask.size != self.size:
             raise ValueError("The mask has to have the the size of the area.")
-        self.tiles[mask.array] = value
+        self._own_tiles()[mask.array] = value
 
     def draw_border(self, value: np.ndarray, thickness: int = 1) -> None:
         """Will draw the border of the given thickness with the given value."""
@@ -110,7 +194,7 @@ class Area(Mask):
         protrudes outside of this area it will be cropped."""
         if not p.is_positive():
             raise ValueError("The area cannot be drawn from negative point.")
-        afflicted_tiles = self.tiles[p.y : p.y + area.h, p.x : p.x + area.w]
+        afflicted_tiles = self._own_tiles()[p.y : p.y + area.h, p.x : p.x + area.w]
         if 0 in afflicted_tiles.shape:
             return
         cropped_mask = area.array[
@@ -126,14 +210,28 @@ class Area(Mask):
         if not origin.is_positive():
             raise ValueError("The origin of the new child has to be positive.")
         id = next(self.id_generator)
-        self.children[id] = AreaWithOrigin(origin, area)
+        self._link_child(id, AreaWithOrigin(origin, area))
+        self._record("add_child", id)
         return id
 
     def remove_child(self, id: int) -> None:
         """Removes a child by its id."""
         if id not in self.children:
             raise ValueError("A child of this id does not exist.")
-        self.children.pop(id)
+        self._record("remove_child", id, self._unlink_child(id))
+
+    def _link_child(self, id: int, child: AreaWithOrigin) -> None:
+        """Puts the child under its id. The children stay ordered by their ids
+        when a removed child is put back."""
+        last_id = next(reversed(self.children), None)
+        self.children[id] = child
+        if last_id is not None and last_id > id:
+            ordered = sorted(self.children.items())
+            self.children.clear()
+            self.children.update(ordered)
+
+    def _unlink_child(self, id: int) -> AreaWithOrigin:
+        return self.children.pop(id)
 
     def get_child(self, id: int) -> AreaWithOrigin:
         """Returns the child of the given id."""
@@ -151,17 +249,167 @@ class Area(Mask):
                 result.append(id)
         return result
 
+    def _record(self, *entry) -> None:
+        """Appends a change to the log if there is a snapshot to undo it to."""
+        if self._log is not None:
+            self._log.append(entry)
+
+    def snapshot(self) -> AreaSnapshot:
+        """Takes a snapshot of the area to restore later. Nothing is copied, an
+        array is copied only on its first change after the snapshot. The children
+        are not snapshotted, they have to be changed only through this area."""
+        if self._log is None:
+            self._log = []
+        saved = SavedArrays()
+        self._unsaved_array = [*self._unsaved_array, saved]
+        self._unsaved_tiles = [*self._unsaved_tiles, saved]
+        token = object()
+        self._log.append(("snapshot", token))
+        return AreaSnapshot(self._log, len(self._log) - 1, token, saved)
+
+    def restore(self, snapshot: AreaSnapshot) -> None:
+        """Returns the area to the state of the snapshot by undoing the changes
+        logged after it. The snapshots taken after it become invalid."""
+        log = self._log
+        if (
+            snapshot.log is not log
+            or snapshot.position >= len(log)
+            or log[snapshot.position][1] is not snapshot.token
+        ):
+            raise ValueError("The snapshot is not valid for this area.")
+        while len(log) > snapshot.position + 1:
+            self._undo(log.pop())
+        # An array that was not saved has not changed since the snapshot. The
+        # saved contents are copied back into the arrays in place.
+        saved = snapshot.saved
+        if saved.array is not None:
+            self._own_array()[...] = saved.array
+            self._unsaved_array = []
+        if saved.tiles is not None:
+            self._own_tiles()[...] = saved.tiles
+            self._unsaved_tiles = []
+
+    def release_snapshots(self) -> None:
+        """Stops logging the changes. All the snapshots become invalid."""
+        self._log = None
+        self._unsaved_array = ()
+        self._unsaved_tiles = ()
+
+    def _undo(self, entry: tuple) -> None:
+        """Reverts a logged change. Subclasses undo the kinds of changes they log
+        and pass the rest on."""
+        kind = entry[0]
+        if kind == "add_child":
+            self._unlink_child(entry[1])
+        elif kind == "remove_child":
+            self._link_child(entry[1], entry[2])
+        elif kind != "snapshot":
+            raise ValueError(f"Unknown change {kind} in the log.")
+
+    def _drawing_copy(self) -> Area:
+        """Returns an area sharing the shape, the tiles and the children of this
+        area. The copy copies the arrays before it changes them. Changes of this
+        area are seen by the copy until then."""
+        result = Area.__new__(Area)
+        result._array = self.array
+        result._tiles = self._tiles
+        result.children = dict(self.children)
+        result.id_generator = itertools.count(max(self.children, default=-1) + 1)
+        result._shared = True
+        result._tiles_shared = True
+        return result
+
     def draw_children(self) -> Area:
-        """Draws all of its children."""
-        result = deepcopy(self)
+        """Draws all of its children. The result is a plain area sharing the
+        unchanged arrays and the children with this area."""
+        result = self._drawing_copy()
         for child in self.children.values():
             with_children = child.object.draw_children()
             result.draw_area(child.origin, with_children)
         return result
 
-    def fit_adjacent_at_border(self, to_fit: Area, neighbour_id: int) -> Mask:
+    def _children_shapes_in(self, origin: Vector, size: Tuple[int, int]) -> Mask:
+        """Returns a combined shapes of the children cropped from the given origin
+        by the size. Only children overlapping the window are visited."""
+        result = Mask.empty_mask(size)
+        for child in self.children.values():
+            top_left = Vector(
+                max(origin.y, child.origin.y), max(origin.x, child.origin.x)
+            )
+            bottom_right = Vector(
+                min(origin.y + size[0], child.origin.y + child.object.h),
+                min(origin.x + size[1], child.origin.x + child.object.w),
+            )
+            if top_left.y >= bottom_right.y or top_left.x >= bottom_right.x:
+                continue
+            in_result = top_left - origin
+            in_child = top_left - child.origin
+            window_size = bottom_right - top_left
+            result.array[
+                in_result.y : in_result.y + window_size.y,
+                in_result.x : in_result.x + window_size.x,
+            ] |= child.object.array[
+                in_child.y : in_child.y + window_size.y,
+                in_child.x : in_child.x + window_size.x,
+            ]
+        return result
+
+    def _free_space(self, origin: Vector, size: Tuple[int, int]) -> Mask:
+        """Returns the shape not occupied by children cropped from the given origin
+        by the size."""
+        result = LazyMask.leaf(self._crop_array(origin, size))
+        return (result - self._children_shapes_in(origin, result.size)).evaluate()
+
+    def _fit_window(
+        self, origin: Vector, size: Tuple[int, int], to_fit_size: Tuple[int, int]
+    ) -> Tuple[Vector, Vector]:
+        """Returns the top left and bottom right (exclusive) corners of the window
+        of origins at which a shape of to_fit_size overlaps the given area."""
+        top_left = Vector(
+            max(origin.y - to_fit_size[0] + 1, 0),
+            max(origin.x - to_fit_size[1] + 1, 0),
+        )
+        bottom_right = Vector(
+            min(origin.y + size[0], self.h), min(origin.x + size[1], self.w)
+        )
+        return top_left, bottom_right
+
+    def _fit_touching_neighbour(
+        self,
+        to_fit: Mask,
+        to_fit_anchor: Mask,
+        neighbour: AreaWithOrigin,
+        anchor: Mask,
+    ) -> MaskWithOrigin:
+        """Fits the new shape into the free space extended by the neighbour's
+        border so that the anchors touch. Only origins at which the shape overlaps
+        the neighbour can touch its anchor, so the fitting is done in that window
+        alone."""
+        top_left, bottom_right = self._fit_window(
+            neighbour.origin, neighbour.object.size, to_fit.size
+        )
+        window_size = bottom_right - top_left
+        if window_size.y <= 0 or window_size.x <= 0:
+            return MaskWithOrigin(Vector(0, 0), Mask.empty_mask((1, 1)))
+        local_origin = neighbour.origin - top_left
+        without_children = self._free_space(
+            top_left, (window_size.y + to_fit.h - 1, window_size.x + to_fit.w - 1)
+        ).insert_shape(local_origin, neighbour.object.border())
+        local_anchor = Mask.empty_mask(without_children.size).insert_shape(
+            local_origin, anchor
+        )
+        fit = without_children.fit_in_anchors_touching(
+            to_fit, anchor=local_anchor, to_fit_anchor=to_fit_anchor
+        )
+        return MaskWithOrigin(
+            top_left,
+            fit.crop_view(Vector(0, 0), (window_size.y, window_size.x)),
+        )
+
+    def fit_adjacent_at_border(self, to_fit: Area, neighbour_id: int) -> MaskWithOrigin:
         """Fits the new area next to already added child given by its id.
-        The new area will share a border with the neighbour."""
+        The new area will share a border with the neighbour. The result covers
+        only the window around the neighbour where the area can be fitted."""
 
         # TODO Support borders of thickness larger than 1.
 
@@ -170,13 +418,6 @@ class Area(Mask):
                 "The neighbour of the area to fit has to be a child of this area."
             )
         neighbour = self.get_child(neighbour_id)
-
-        anchor = Mask.empty_mask(self.size).insert_shape(
-            neighbour.origin, neighbour.object.border()
-        )
-        without_children = self.childless_shape().insert_shape(
-            neighbour.origin, neighbour.object.border()
-        )
-        return without_children.fit_in_anchors_touching(
-            to_fit, anchor=anchor, to_fit_anchor=to_fit.border()
+        return self._fit_touching_neighbour(
+            to_fit, to_fit.border(), neighbour, neighbour.object.border()
         )
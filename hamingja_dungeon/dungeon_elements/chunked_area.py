@@ -0,0 +1,195 @@
+from __future__ import annotations
+
+import itertools
+from pathlib import Path
+from typing import Tuple
+
+import numpy as np
+
+from hamingja_dungeon.dungeon_elements.area import Area, AreaSnapshot
+from hamingja_dungeon.dungeon_elements.mask import Mask, MaskWithOrigin
+from hamingja_dungeon.tile_types import default, tile_dt
+from hamingja_dungeon.utils.chunked_array import (
+    CHUNK_SIZE,
+    MAX_RESIDENT_CHUNKS,
+    ChunkedArray,
+)
+from hamingja_dungeon.utils.vector import Vector
+
+
+class ChunkedMask(Mask):
+    """Mask stored in memory mapped chunks on disk. Fitting reads and writes
+    only one chunk of the mask and of the result at a time. Operations not
+    specialized here read the whole array into memory.
+
+    Without a path the chunks are kept in a temporary directory removed on
+    close. Use it as a context manager or close it when done."""
+
+    def __init__(
+        self,
+        size: Tuple[int, int],
+        fill: bool = True,
+        path: Path | str = None,
+        chunk_size: Tuple[int, int] = CHUNK_SIZE,
+        max_resident_chunks: int = MAX_RESIDENT_CHUNKS,
+    ):
+        self._array = ChunkedArray(
+            size, bool, fill, path, chunk_size, max_resident_chunks
+        )
+
+    @property
+    def array(self) -> ChunkedArray:
+        return self._array
+
+    @array.setter
+    def array(self, new_array: np.ndarray) -> None:
+        if np.shape(new_array) != self.size:
+            raise ValueError("The arrays have to have the same shape.")
+        self._array[...] = new_array
+
+    def _blocks(self) -> list[Tuple[int, int, int, int]]:
+        """Returns the windows of the chunk grid."""
+        ch, cw = self._array.chunk_size
+        return [
+            (y, min(y + ch, self.h), x, min(x + cw, self.w))
+            for y in range(0, self.h, ch)
+            for x in range(0, self.w, cw)
+        ]
+
+    def _set_array_values(self, origin: Vector, mask: Mask, set_to: bool) -> None:
+        afflicted_area = self._crop_array(origin, mask.size)
+        cropped_mask = mask._crop_array(Vector(0, 0), afflicted_area.shape)
+        afflicted_area[cropped_mask] = set_to
+        self._array[
+            origin.y : origin.y + afflicted_area.shape[0],
+            origin.x : origin.x + afflicted_area.shape[1],
+        ] = afflicted_area
+
+    def fit_in(self, to_fit: Mask) -> ChunkedMask:
+        """Fits the shape chunk by chunk into a chunked mask in a temporary
+        directory. Each chunk is read together with the margin the shape reaches
+        into, so the result matches the fit of the whole array. Chunks where the
+        shape does not fit are not stored."""
+        result = ChunkedMask(
+            self.size,
+            fill=False,
+            chunk_size=self._array.chunk_size,
+            max_resident_chunks=self._array.max_resident,
+        )
+        for y0, y1, x0, x1 in self._blocks():
+            window = Mask.wrap(
+                self._array[y0 : y1 + to_fit.h - 1, x0 : x1 + to_fit.w - 1]
+            )
+            fit = window.fit_in(to_fit).array[0 : y1 - y0, 0 : x1 - x0]
+            if fit.any():
+                result.array[y0:y1, x0:x1] = fit
+        return result
+
+    def fit_in_window(
+        self, to_fit: Mask, origin: Vector, size: Tuple[int, int]
+    ) -> MaskWithOrigin:
+        """Fits the shape with its top left corner inside the window given by the
+        origin and size. Only the chunks under the window and its margin are
+        read."""
+        y1, x1 = min(origin.y + size[0], self.h), min(origin.x + size[1], self.w)
+        if origin.y >= y1 or origin.x >= x1:
+            return MaskWithOrigin(Vector(0, 0), Mask.empty_mask((1, 1)))
+        window = Mask.wrap(
+            self._array[origin.y : y1 + to_fit.h - 1, origin.x : x1 + to_fit.w - 1]
+        )
+        fit = window.fit_in(to_fit)
+        return MaskWithOrigin(
+            origin, fit.crop_view(Vector(0, 0), (y1 - origin.y, x1 - origin.x))
+        )
+
+    def flush(self) -> None:
+        """Writes the mapped chunks to their files."""
+        self._array.flush()
+
+    def __enter__(self) -> ChunkedMask:
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Writes and unmaps the chunks. A temporary chunk directory is
+        removed."""
+        self._array.close()
+
+
+class ChunkedArea(ChunkedMask, Area):
+    """Area whose mask and tiles are stored in memory mapped chunks on disk, for
+    maps larger than the memory. Inserting shapes, drawing areas and fitting read
+    and write only the chunks they overlap. Operations not specialized here read
+    the whole arrays into memory.
+
+    This is storage only: the designers populate sectors, whose occupancy and
+    free space indices cover the whole sector in memory, so designing still needs
+    the whole map in memory. Populated sectors can be drawn into a chunked area
+    with draw_area.
+
+    Without a path the chunks are kept in temporary directories removed on
+    close. Use it as a context manager or close it when done."""
+
+    def __init__(
+        self,
+        size: Tuple[int, int],
+        path: Path | str = None,
+        fill_value: np.ndarray = None,
+        chunk_size: Tuple[int, int] = CHUNK_SIZE,
+        max_resident_chunks: int = MAX_RESIDENT_CHUNKS,
+    ):
+        if fill_value is None:
+            fill_value = default
+        if fill_value.dtype != tile_dt:
+            raise ValueError("Fill value has to have the tile dtype.")
+        mask_path = tiles_path = None
+        if path is not None:
+            mask_path, tiles_path = Path(path) / "mask", Path(path) / "tiles"
+        super().__init__(size, True, mask_path, chunk_size, max_resident_chunks)
+        self._tiles = ChunkedArray(
+            size, tile_dt, fill_value, tiles_path, chunk_size, max_resident_chunks
+        )
+        self.children = {}
+        self.id_generator = itertools.count()
+
+    def draw_area(self, p: Vector, area: Area) -> None:
+        if not p.is_positive():
+            raise ValueError("The area cannot be drawn from negative point.")
+        window = (slice(p.y, p.y + area.h), slice(p.x, p.x + area.w))
+        afflicted_tiles = self.tiles[window]
+        if 0 in afflicted_tiles.shape:
+            return
+        h, w = afflicted_tiles.shape
+        cropped = (slice(0, h), slice(0, w))
+        cropped_mask = np.asarray(area.array[cropped])
+        afflicted_tiles[cropped_mask] = np.asarray(area.tiles[cropped])[cropped_mask]
+        self.tiles[window] = afflicted_tiles
+
+    def snapshot(self) -> AreaSnapshot:
+        """The chunks are changed in place on disk, so they cannot be shared with
+        a snapshot."""
+        raise ValueError("Chunked areas do not support snapshots.")
+
+    def draw_children(self) -> ChunkedArea:
+        """Draws all of its children onto its own tiles. The storage is not
+        copied as it can be larger than the memory."""
+        for child in self.children.values():
+            with_children = child.object.draw_children()
+            self.draw_area(child.origin, with_children)
+        return self
+
+    def flush(self) -> None:
+        """Writes the mapped chunks to their files."""
+        super().flush()
+        self._tiles.flush()
+
+    def __enter__(self) -> ChunkedArea:
+        return self
+
+    def close(self) -> None:
+        """Writes and unmaps the chunks. Temporary chunk directories are
+        removed."""
+        super().close()
+        self._tiles.close()
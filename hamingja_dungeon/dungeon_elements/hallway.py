@@ -1,15 +1,16 @@
 from __future__ import annotations
 import numpy as np
-from scipy.ndimage import binary_dilation
 from skimage.measure import label
 
 from hamingja_dungeon.dungeon_elements.mask import Mask
-from hamingja_dungeon.utils.morphology.morphology import get_endpoints
+from hamingja_dungeon.utils.morphology.morphology import dilation, get_endpoints
 from hamingja_dungeon.utils.morphology.structure_elements.structure_elements import PLUS_SIGN, SQUARE
 from hamingja_dungeon.dungeon_elements.room import Room
 from hamingja_dungeon.tile_types import wall
 from hamingja_dungeon.utils.utils import tighten
 
+# Offsets of the plus sign neighbourhood relative to its center.
+PLUS_SIGN_OFFSETS = np.argwhere(PLUS_SIGN.fg) - np.array(PLUS_SIGN.fg.shape) // 2
 
 # TODO create a common super class for hallway and room (region, section?) since hallway is not really a room, is it?
 class Hallway(Room):
@@ -31,25 +32,37 @@ class Hallway(Room):
 
         borderless = np.zeros(new_size).astype(bool)
         borderless[1:-1, 1:-1] = path
-        with_border = binary_dilation(borderless, structure=SQUARE.fg)
+        with_border = dilation(borderless, SQUARE.fg)
         self.array = with_border
-        self.hallway_border = Mask.from_array(with_border ^ borderless)
+        self.hallway_border = Mask.wrap(with_border ^ borderless)
         self.draw(wall, self.hallway_border)
         self.endpoints = get_endpoints(borderless)
-        self.entrypoints = Mask.from_array(
-            binary_dilation(self.endpoints, structure=PLUS_SIGN.fg) & self.border(
-
-            ).array
+        entrypoints = dilation(self.endpoints, PLUS_SIGN.fg)
+        entrypoints &= self.border().array
+        self.entrypoints = Mask.wrap(entrypoints)
+        labeled, self._endpoint_count = label(
+            self.endpoints, background=0, return_num=True
+        )
+        self.endpoint_coordinates = np.argwhere(labeled)
+        # Zero based label of the endpoint component of each coordinate.
+        self._endpoint_labels = (
+            labeled[self.endpoint_coordinates[:, 0], self.endpoint_coordinates[:, 1]]
+            - 1
         )
 
-    # TODO Make about localisation not only binary check.
     # TODO: make it work for very short hallways.
-    def has_dead_end(self):
-        labeled, count = label(self.endpoints, background=0, return_num=True)
-        entrances = self.get_entrances_area()
-        for component_label in range(1, count + 1):
-            end = np.where(labeled == component_label, 1, 0)
-            if not np.any(binary_dilation(end, structure=PLUS_SIGN.fg) &
-                          entrances.array):
-                return True
-        return False
+    def dead_ends(self) -> np.ndarray:
+        """Returns the coordinates of the endpoints (an array of shape (N, 2)) that
+        belong to an end of the hallway not touching any entrance."""
+        neighbourhood = (
+            self.endpoint_coordinates[:, np.newaxis, :] + PLUS_SIGN_OFFSETS
+        )
+        touches_entrance = self._entrance_count[
+            neighbourhood[..., 0], neighbourhood[..., 1]
+        ].any(axis=1)
+        connected = np.zeros(self._endpoint_count, dtype=bool)
+        np.logical_or.at(connected, self._endpoint_labels, touches_entrance)
+        return self.endpoint_coordinates[~connected[self._endpoint_labels]]
+
+    def has_dead_end(self) -> bool:
+        return len(self.dead_ends()) > 0
@@ -1,10 +1,10 @@
 from __future__ import annotations
 
 import random
-from typing import Tuple
+from dataclasses import dataclass
+from typing import Iterator, Tuple
 
 import numpy as np
-from scipy.ndimage import binary_erosion, binary_hit_or_miss, binary_dilation
 
 from hamingja_dungeon.utils.checks.array_checks import (check_array_is_two_dimensional,
                                                         check_array_is_same_shape, )
@@ -14,47 +14,94 @@ from hamingja_dungeon.utils.checks.mask_checks import (check_vector_is_positive,
                                                        check_anchor_is_subset,
                                                        check_mask_is_not_empty, )
 from hamingja_dungeon.utils.direction import Direction
+from hamingja_dungeon.utils.morphology.morphology import (dilation, erosion,
+                                                          hit_or_miss, )
+from hamingja_dungeon.utils.morphology.scratch import scratch_pool
 from hamingja_dungeon.utils.morphology.structure_elements.structure_elements import (
     OUTSIDE_CORNERS, SQUARE, INSIDE_CORNERS, BORDERS_FOR_EROSION, )
 from hamingja_dungeon.utils.morphology.structure_elements.utils import (
     center_to_top_left, center_to_bottom_right, )
-from hamingja_dungeon.utils.vector import Vector
+from hamingja_dungeon.utils.vector import Vector, VectorArray
 
 
 class Mask:
     """Represents a binary area."""
 
-    def __init__(self, size: Tuple[int, int]):
+    # True while the array is shared with the area this is a drawing copy of. The
+    # array is then copied before it is changed in place.
+    _shared = False
+
+    def __init__(self, size: Tuple[int, int], fill: bool | None = True):
+        """Creates a mask of the given size filled with the given value. If the fill
+        is None the values are left uninitialized."""
         if size[0] <= 0 or size[1] <= 0:
             raise ValueError("The size has to be positive.")
-        self._array = np.full(size, fill_value=True, dtype=np.bool)
+        if fill is None:
+            self._array = np.empty(size, dtype=bool)
+        elif fill:
+            self._array = np.ones(size, dtype=bool)
+        else:
+            self._array = np.zeros(size, dtype=bool)
 
     def _crop_array(self, origin: Vector, size: Tuple[int, int]) -> np.array:
         """Returns a cropped array from the given origin given by the size."""
         check_vector_is_positive(origin)
         return self.array[origin.y : origin.y + size[0], origin.x : origin.x + size[1]]
 
+    def _own_array(self) -> np.ndarray:
+        """Copies the array if it is shared so it can be changed in place."""
+        array = self.array
+        if self._shared:
+            array = self._array = array.copy()
+            self._shared = False
+        return array
+
     def _set_array_values(self, origin: Vector, mask: Mask, set_to: bool) -> None:
         """Sets values defined by the true values of the new mask inserted to
         the given origin."""
+        self._own_array()
         afflicted_area = self._crop_array(origin, mask.size)
         cropped_mask = mask._crop_array(Vector(0, 0), afflicted_area.shape)
         afflicted_area[cropped_mask] = set_to
 
     @staticmethod
     def from_array(array: np.ndarray) -> Mask:
-        """Creates a new mask from a numpy array."""
+        """Creates a new mask from a copy of a numpy array."""
+        check_array_is_two_dimensional(array)
+        return Mask.wrap(np.array(array, dtype=bool))
+
+    @staticmethod
+    def wrap(array: np.ndarray) -> Mask:
+        """Creates a mask that takes over the given bool array without copying it.
+        The caller should not use the array afterwards."""
         check_array_is_two_dimensional(array)
-        result = Mask((array.shape[0], array.shape[1]))
-        result.array = np.array(array, dtype=bool)
+        if array.dtype != bool:
+            raise ValueError("The array has to have the bool dtype.")
+        if array.shape[0] <= 0 or array.shape[1] <= 0:
+            raise ValueError("The size has to be positive.")
+        result = Mask.__new__(Mask)
+        result._array = array
         return result
 
+    @staticmethod
+    def view(array: np.ndarray) -> Mask:
+        """Creates a mask sharing the given bool array with its owner. Changes made
+        through either of them are visible in both."""
+        return Mask.wrap(array)
+
     @staticmethod
     def empty_mask(size: Tuple[int, int]) -> Mask:
         """Creates an empty mask of the given size."""
-        shape = Mask(size)
-        shape.array.fill(False)
-        return shape
+        return Mask(size, fill=False)
+
+    def crop_view(self, origin: Vector, size: Tuple[int, int]) -> Mask:
+        """Returns a mask sharing memory with the window of this mask given by the
+        origin and size. The window is cropped at the end of the mask."""
+        return Mask.view(self._crop_array(origin, size))
+
+    def copy(self) -> Mask:
+        """Returns a new mask with a copy of the array."""
+        return Mask.from_array(self.array)
 
     @property
     def size(self) -> Tuple[int, int]:
@@ -77,9 +124,10 @@ class Mask:
         check_array_is_two_dimensional(new_array)
         check_array_is_same_shape(self.array, new_array)
         self._array = new_array
+        self._shared = False
 
     def __str__(self) -> str:
-        return str(np.where(self._array, "■", "□"))
+        return str(np.where(self.array, "■", "□"))
 
     def __and__(self, other: Mask) -> Mask:
         check_masks_are_same_size(self, other)
@@ -87,6 +135,7 @@ class Mask:
 
     def __iand__(self, other: Mask) -> Mask:
         check_masks_are_same_size(self, other)
+        self._own_array()
         self.array &= other.array
         return self
 
@@ -96,6 +145,7 @@ class Mask:
 
     def __ior__(self, other: Mask) -> Mask:
         check_masks_are_same_size(self, other)
+        self._own_array()
         self.array |= other.array
         return self
 
@@ -105,6 +155,7 @@ class Mask:
 
     def __ixor__(self, other: Mask) -> Mask:
         check_masks_are_same_size(self, other)
+        self._own_array()
         self.array ^= other.array
         return self
 
@@ -114,12 +165,18 @@ class Mask:
 
     def __isub__(self, other: Mask) -> Mask:
         check_masks_are_same_size(self, other)
+        self._own_array()
         self.array &= ~other.array
         return self
 
     def __invert__(self) -> Mask:
         return Mask.from_array(~self.array)
 
+    def lazy(self) -> LazyMask:
+        """Returns a lazy mask reading this mask. Operators on it build an
+        expression that is evaluated at once when needed."""
+        return LazyMask.leaf(self.array)
+
     def intersection(
         self,
         first_origin: Vector,
@@ -139,12 +196,20 @@ class Mask:
         """Returns a number of true elements."""
         return np.count_nonzero(self.array)
 
-    def is_inside_bbox(self, vector: Vector) -> bool:
-        """Checks whether a coordinate is inside the bounding box of the mask."""
+    def is_inside_bbox(self, vector: Vector | VectorArray) -> bool | np.ndarray:
+        """Checks whether a coordinate is inside the bounding box of the mask. For
+        a batch of coordinates returns a boolean array."""
+        if isinstance(vector, VectorArray):
+            return vector.in_bounds(self.size)
         return 0 <= vector.y < self.h and 0 <= vector.x < self.w
 
-    def is_inside_mask(self, vector: Vector) -> bool:
-        """Checks whether a coordinate is inside the mask."""
+    def is_inside_mask(self, vector: Vector | VectorArray) -> bool | np.ndarray:
+        """Checks whether a coordinate is inside the mask. For a batch of
+        coordinates returns a boolean array."""
+        if isinstance(vector, VectorArray):
+            result = vector.in_bounds(self.size)
+            result[result] = self.array[vector.ys[result], vector.xs[result]]
+            return result
         if not self.is_inside_bbox(vector):
             return False
         return bool(self.array[vector.y, vector.x])
@@ -170,89 +235,105 @@ class Mask:
         self._set_array_values(origin, to_remove, False)
         return self
 
+    def _minus_erosion(self, structure: np.ndarray, origin, iterations: int) -> Mask:
+        """Returns the mask without its erosion by the given structure."""
+        result = scratch_pool().allocate(self.size)
+        with scratch_pool().borrow(self.size) as eroded:
+            erosion(self.array, structure, origin, iterations, output=eroded)
+            np.greater(self.array, eroded, out=result)
+        return Mask.wrap(result)
+
+    def _hit_or_miss_union(self, structures: list) -> Mask:
+        """Returns the union of hit or miss transforms by the given structures."""
+        result = scratch_pool().allocate(self.size)
+        result.fill(False)
+        with scratch_pool().borrow(self.size) as hits:
+            for structure in structures:
+                hit_or_miss(
+                    self.array, structure.fg, origin1=structure.origin, output=hits
+                )
+                result |= hits
+        return Mask.wrap(result)
+
     def border_in_direction(self, direction: Direction, thickness: int = 1) -> Mask:
         """Returns border in the given direction."""
         check_thickness_is_positive(thickness)
         structure = BORDERS_FOR_EROSION.get(direction)
-        return Mask.from_array(
-            self.array
-            & ~binary_erosion(
-                self.array,
-                structure=structure.fg,
-                origin=structure.origin,
-                iterations=thickness,
-            )
-        )
+        return self._minus_erosion(structure.fg, structure.origin, thickness)
 
     def border(self, thickness: int = 1) -> Mask:
         """Returns a border of the given thickness"""
         check_thickness_is_positive(thickness)
-        return Mask.from_array(
-            self.array
-            & ~binary_erosion(
-                self.array,
-                structure=SQUARE.fg,
-                origin=SQUARE.origin,
-                iterations=thickness,
-            )
-        )
+        return self._minus_erosion(SQUARE.fg, SQUARE.origin, thickness)
 
     def corners(self) -> Mask:
         """Returns all the corners."""
-        result = Mask.empty_mask(self.size)
-        for dir in Direction.get_all_directions():
-            result |= self.corners_in_direction(dir)
-        return result
+        return self._hit_or_miss_union(
+            [INSIDE_CORNERS.get(dir) for dir in Direction.get_all_directions()]
+        )
 
     def corners_in_direction(self, direction: Direction) -> Mask:
         """Returns all the corners in a given direction. The given direction and
         its clockwise neighbour specifies the corner orientation."""
         corner = INSIDE_CORNERS.get(direction)
-        return Mask.from_array(
-            binary_hit_or_miss(self.array, structure1=corner.fg, origin1=corner.origin)
-        )
+        return Mask.wrap(hit_or_miss(self.array, corner.fg, origin1=corner.origin))
 
     def outside_corners_in_direction(self, direction: Direction) -> Mask:
         """Returns all the outside corners in a given direction. The given direction and
         its clockwise neighbour specifies the corner orientation."""
         corner = OUTSIDE_CORNERS.get(direction)
-        return Mask.from_array(
-            binary_hit_or_miss(self.array, structure1=corner.fg, origin1=corner.origin)
-        )
+        return Mask.wrap(hit_or_miss(self.array, corner.fg, origin1=corner.origin))
 
     def outside_corners(self) -> Mask:
         """Returns all the outside corners."""
-        result = Mask.empty_mask(self.size)
-        for dir in Direction.get_all_directions():
-            result |= self.outside_corners_in_direction(dir)
-        return result
+        return self._hit_or_miss_union(
+            [OUTSIDE_CORNERS.get(dir) for dir in Direction.get_all_directions()]
+        )
 
     def border_without_corners(self) -> Mask:
         """Returns a border without the shape's outside corners."""
-        return self.border() - self.corners() - self.outside_corners()
-
-    def mask_coordinates(self) -> list[Vector]:
-        """Returns a list of all coordinates that of the mask."""
-        result = []
-        for y, x in np.argwhere(self.array):
-            result.append(Vector(y, x))
-        return result
+        result = self.border().lazy() - self.corners() - self.outside_corners()
+        return result.evaluate()
+
+    def mask_coordinates(self) -> VectorArray:
+        """Returns all coordinates of the mask."""
+        return VectorArray(np.argwhere(self.array))
+
+    def iter_mask_coordinates(self) -> Iterator[Vector]:
+        """Yields all coordinates of the mask in row-major order without building
+        a list of them."""
+        for y in np.flatnonzero(self.array.any(axis=1)).tolist():
+            for x in np.flatnonzero(self.array[y]).tolist():
+                yield Vector(y, x)
+
+    def _coordinates_of_indices(self, indices: np.ndarray) -> VectorArray:
+        """Returns coordinates of the true values given by their indices in the
+        row-major order. Only the row counts and the rows of the results are
+        scanned."""
+        row_ends = np.cumsum(np.count_nonzero(self.array, axis=1))
+        ys = np.searchsorted(row_ends, indices, side="right")
+        in_row = indices - (row_ends[ys] - np.count_nonzero(self.array[ys], axis=1))
+        seen = np.cumsum(self.array[ys], axis=1)
+        xs = np.argmax(seen > in_row[:, np.newaxis], axis=1)
+        return VectorArray(np.stack((ys, xs), axis=-1))
 
     def sample_mask_coordinate(self) -> Vector:
         """Samples and returns a coordinate of a true value within the mask."""
         check_mask_is_not_empty(self)
-        sample = random.choice(np.argwhere(self.array))
-        return Vector(sample[0], sample[1])
+        index = random.randrange(self.volume())
+        return self._coordinates_of_indices(np.array([index]))[0]
+
+    def sample_mask_coordinates(self, k: int) -> VectorArray:
+        """Samples k different coordinates of true values within the mask."""
+        check_mask_is_not_empty(self)
+        indices = random.sample(range(self.volume()), k)
+        return self._coordinates_of_indices(np.array(indices, dtype=np.int64))
 
     def fit_in(self, to_fit: Mask) -> Mask:
         """Returns a mask that with the same size that defines at which coordinates
         the given mask fits entirely."""
-        return Mask.from_array(
-            binary_erosion(
-                self.array,
-                structure=to_fit.array,
-                origin=center_to_top_left(to_fit.size),
-            )
+        return Mask.wrap(
+            erosion(self.array, to_fit.array, center_to_top_left(to_fit.size))
         )
 
     def fit_in_touching_anchor(self, to_fit: Mask, anchor: Mask):
@@ -260,12 +341,16 @@ class Mask:
         given by an anchor."""
         check_masks_are_same_size(self, anchor)
         check_anchor_is_subset(self, anchor)
-        touches_anchor = binary_dilation(
-            anchor.array,
-            structure=np.flip(to_fit.array),
-            origin=center_to_bottom_right(to_fit.size),
-        )
-        return self.fit_in(to_fit) & Mask.from_array(touches_anchor)
+        result = self.fit_in(to_fit)
+        with scratch_pool().borrow(self.size) as touches_anchor:
+            dilation(
+                anchor.array,
+                np.flip(to_fit.array),
+                center_to_bottom_right(to_fit.size),
+                output=touches_anchor,
+            )
+            result.array &= touches_anchor
+        return result
 
     def fit_in_anchors_touching(self, to_fit: Mask, anchor: Mask, to_fit_anchor: Mask):
         """Same as fit_in_touching_anchor but the given the mask to fit comes with
@@ -274,9 +359,196 @@ class Mask:
         check_anchor_is_subset(self, anchor)
         check_masks_are_same_size(to_fit, to_fit_anchor)
         check_anchor_is_subset(to_fit, to_fit_anchor)
-        anchors_touching = binary_dilation(
-            anchor.array,
-            structure=np.flip(to_fit_anchor.array),
-            origin=center_to_bottom_right(to_fit_anchor.size),
-        )
-        return self.fit_in(to_fit) & Mask.from_array(anchors_touching)
+        result = self.fit_in(to_fit)
+        with scratch_pool().borrow(self.size) as anchors_touching:
+            dilation(
+                anchor.array,
+                np.flip(to_fit_anchor.array),
+                center_to_bottom_right(to_fit_anchor.size),
+                output=anchors_touching,
+            )
+            result.array &= anchors_touching
+        return result
+
+
+# Number of elements evaluated at once by a lazy mask. Blocks of rows this big keep
+# the operands of a whole expression in the cache.
+EVALUATION_BLOCK_SIZE = 1 << 16
+
+# Ufuncs computing a binary operation in place, keyed by the operation and
+# whether the right operand is inverted, so that the inversion is never stored.
+_FUSED_OPERATIONS = {
+    ("and", False): np.logical_and,
+    ("and", True): np.greater,
+    ("or", False): np.logical_or,
+    ("or", True): np.greater_equal,
+    ("xor", False): np.not_equal,
+    ("xor", True): np.equal,
+    ("sub", False): np.greater,
+    ("sub", True): np.logical_and,
+}
+
+
+class LazyMask(Mask):
+    """A mask defined by an expression of other masks. Operators on a lazy mask
+    build the expression instead of computing it. The expression is evaluated
+    once, when the array is first accessed, into a single new array. The operands
+    are read at that time, not when the expression is built."""
+
+    def __init__(self, operation: str, operands: tuple, size: Tuple[int, int]):
+        self._operation = operation
+        self._operands = operands
+        self._size = size
+        self._array = None
+
+    @staticmethod
+    def leaf(array: np.ndarray) -> LazyMask:
+        """Creates a lazy mask reading the given bool array."""
+        check_array_is_two_dimensional(array)
+        return LazyMask("leaf", (array,), array.shape)
+
+    @staticmethod
+    def _operand(mask: Mask) -> LazyMask:
+        if isinstance(mask, LazyMask):
+            return mask
+        return LazyMask.leaf(mask.array)
+
+    @property
+    def size(self) -> Tuple[int, int]:
+        return self._size
+
+    @property
+    def h(self) -> int:
+        return self._size[0]
+
+    @property
+    def w(self) -> int:
+        return self._size[1]
+
+    @property
+    def array(self) -> np.ndarray:
+        if self._array is None:
+            self._array = self._compute()
+            self._operands = ()
+        return self._array
+
+    @array.setter
+    def array(self, new_array: np.ndarray) -> None:
+        check_array_is_two_dimensional(new_array)
+        check_array_is_same_shape(self.array, new_array)
+        self._array = new_array
+
+    def is_evaluated(self) -> bool:
+        return self._array is not None
+
+    def evaluate(self) -> Mask:
+        """Returns the evaluated mask. It shares the array with this lazy mask."""
+        return Mask.view(self.array)
+
+    def lazy(self) -> LazyMask:
+        return self
+
+    def _binary(self, operation: str, other: Mask, reflected: bool = False):
+        check_masks_are_same_size(self, other)
+        operands = (self, LazyMask._operand(other))
+        if reflected:
+            operands = operands[::-1]
+        return LazyMask(operation, operands, self._size)
+
+    def __and__(self, other: Mask) -> LazyMask:
+        return self._binary("and", other)
+
+    def __rand__(self, other: Mask) -> LazyMask:
+        return self._binary("and", other, reflected=True)
+
+    def __or__(self, other: Mask) -> LazyMask:
+        return self._binary("or", other)
+
+    def __ror__(self, other: Mask) -> LazyMask:
+        return self._binary("or", other, reflected=True)
+
+    def __xor__(self, other: Mask) -> LazyMask:
+        return self._binary("xor", other)
+
+    def __rxor__(self, other: Mask) -> LazyMask:
+        return self._binary("xor", other, reflected=True)
+
+    def __sub__(self, other: Mask) -> LazyMask:
+        return self._binary("sub", other)
+
+    def __rsub__(self, other: Mask) -> LazyMask:
+        return self._binary("sub", other, reflected=True)
+
+    def __invert__(self) -> LazyMask:
+        if self._array is None and self._operation == "invert":
+            return self._operands[0]
+        return LazyMask("invert", (self,), self._size)
+
+    def _block(self, rows: slice) -> Tuple[np.ndarray, bool] | None:
+        """Returns the given rows of the expression if they can be read without
+        computing anything, together with whether they have to be inverted."""
+        if self._array is not None:
+            return self._array[rows], False
+        if self._operation == "leaf":
+            return self._operands[0][rows], False
+        if self._operation == "invert":
+            block = self._operands[0]._block(rows)
+            if block is not None:
+                return block[0], not block[1]
+        return None
+
+    def _evaluate_into(self, out: np.ndarray, rows: slice) -> None:
+        """Evaluates the given rows of the expression into the output. Only a
+        right operand that is itself a compound expression needs a scratch block."""
+        block = self._block(rows)
+        if block is not None:
+            if block[1]:
+                np.logical_not(block[0], out=out)
+            else:
+                np.copyto(out, block[0])
+            return
+        if self._operation == "invert":
+            self._operands[0]._evaluate_into(out, rows)
+            np.logical_not(out, out=out)
+            return
+        left, right = self._operands
+        left._evaluate_into(out, rows)
+        block = right._block(rows)
+        if block is None:
+            scratch = np.empty_like(out)
+            right._evaluate_into(scratch, rows)
+            block = (scratch, False)
+        _FUSED_OPERATIONS[self._operation, block[1]](out, block[0], out=out)
+
+    def _compute(self) -> np.ndarray:
+        result = np.empty(self._size, dtype=bool)
+        step = max(EVALUATION_BLOCK_SIZE // self._size[1], 1)
+        for start in range(0, self._size[0], step):
+            rows = slice(start, start + step)
+            self._evaluate_into(result[rows], rows)
+        return result
+
+
+@dataclass
+class MaskWithOrigin:
+    """A mask placed at an origin inside a larger area. Used for results that are
+    only non-empty inside a small window of the area."""
+
+    origin: Vector
+    object: Mask
+
+    def is_empty(self) -> bool:
+        return self.object.is_empty()
+
+    def sample_mask_coordinate(self) -> Vector:
+        """Samples a coordinate of a true value in the coordinates of the area."""
+        return self.origin + self.object.sample_mask_coordinate()
+
+    def sample_mask_coordinates(self, k: int) -> VectorArray:
+        """Samples k different coordinates of true values in the coordinates of the
+        area."""
+        return self.object.sample_mask_coordinates(k) + self.origin
+
+    def embed(self, size: Tuple[int, int]) -> Mask:
+        """Returns the mask inserted into an empty mask of the given size."""
+        return Mask.empty_mask(size).insert_shape(self.origin, self.object)
@@ -16,6 +16,15 @@ from hamingja_dungeon.utils.vector import Vector
 
 ROOM_MIN_SIZE = (3, 3)
 
+entrance_dt = np.dtype(
+    [
+        ("id", np.int64),
+        ("y", np.int32),
+        ("x", np.int32),
+        ("tile", tile_dt),
+    ]
+)
+
 
 class Room(Area):
     """Represent a room that can be inserted into dungeon area."""
@@ -38,26 +47,58 @@ class Room(Area):
         )
         self.draw_border(border_fill_value)
         self.entrypoints = self.border_without_corners()
-        self.entrances: list[int] = []
+        # Entrances are single tiles stored as records and drawn over the room
+        # when the children are drawn.
+        self.entrances = np.empty(0, dtype=entrance_dt)
+        # Number of entrances covering each tile. Kept up to date by
+        # place_entrance and remove_entrance so it never has to be rebuilt.
+        self._entrance_count = np.zeros(self.size, dtype=np.int16)
 
-    def place_entrance(self, origin: Vector, entrance: Area) -> int:
-        id = self.add_child(origin, entrance)
-        self.entrances.append(id)
+    def place_entrance(self, point: Vector, fill_value: np.ndarray = None) -> int:
+        """Places an entrance with the given fill value on the given point of the
+        room. Returns its new id."""
+        if fill_value is None:
+            fill_value = tile_types.floor
+        if fill_value.dtype != tile_dt:
+            raise ValueError("Fill value has to have the tile dtype.")
+        if not self.is_inside_bbox(point):
+            raise ValueError("The entrance has to be inside the room.")
+        id = next(self.id_generator)
+        record = np.array((id, point.y, point.x, fill_value), dtype=entrance_dt)
+        self.entrances = np.append(self.entrances, record)
+        self._entrance_count[point.y, point.x] += 1
         return id
 
     def remove_entrance(self, id: int) -> None:
-        if id not in self.entrances:
+        is_removed = self.entrances["id"] == id
+        if not np.any(is_removed):
             raise ValueError("Entrance with this id does not exist.")
-        self.remove_child(id)
-        self.entrances.remove(id)
+        removed = self.entrances[is_removed]
+        np.subtract.at(self._entrance_count, (removed["y"], removed["x"]), 1)
+        self.entrances = self.entrances[~is_removed]
 
-    def get_entrances_area(self) -> Mask:
-        result = Area.empty_mask(self.size)
-        for entrance_id in self.entrances:
-            entrance = self.get_child(entrance_id)
-            result.insert_shape(entrance.origin, entrance.object)
+    def _restore_entrances(self, records: np.ndarray) -> None:
+        """Puts removed entrance records back keeping the entrances ordered by
+        their ids."""
+        entrances = np.append(self.entrances, records)
+        self.entrances = entrances[np.argsort(entrances["id"], kind="stable")]
+        np.add.at(self._entrance_count, (records["y"], records["x"]), 1)
+
+    def entrances_bitmap(self) -> np.ndarray:
+        """Returns a boolean array marking the tiles covered by entrances. It is
+        derived from the entrance count, not rebuilt from the entrances."""
+        return self._entrance_count > 0
+
+    def draw_children(self) -> Area:
+        """Draws all of its children and then its entrances."""
+        result = super().draw_children()
+        tiles = result._own_tiles()
+        tiles[self.entrances["y"], self.entrances["x"]] = self.entrances["tile"]
         return result
 
+    def get_entrances_area(self) -> Mask:
+        return Mask.from_array(self.entrances_bitmap())
+
 class LRoom(Room):
     def __init__(
         self,
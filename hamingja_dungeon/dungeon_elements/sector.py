@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+import bisect
+import random
 from typing import Tuple
 
 import igraph as ig
@@ -7,10 +9,131 @@ import numpy as np
 
 from hamingja_dungeon import tile_types
 from hamingja_dungeon.dungeon_elements.area import Area, AreaWithOrigin
-from hamingja_dungeon.dungeon_elements.mask import Mask
+from hamingja_dungeon.dungeon_elements.mask import Mask, MaskWithOrigin
 from hamingja_dungeon.dungeon_elements.room import Room
+from hamingja_dungeon.utils.direction import Direction
 from hamingja_dungeon.utils.exceptions import EmptyFitArea
-from hamingja_dungeon.utils.vector import Vector
+from hamingja_dungeon.utils.free_space_pyramid import FreeSpacePyramid, square_levels
+from hamingja_dungeon.utils.utils import add_at_mask
+from hamingja_dungeon.utils.vector import Vector, VectorArray
+
+# Number of levels of the free space pyramid. The largest tracked free square has
+# the side of 2 ** (FREE_SQUARE_LEVELS - 1).
+FREE_SQUARE_LEVELS = 7
+# Free gaps at most this wide left between a placed room and the blocked tiles
+# are counted as slivers when scoring the origins of the room.
+SLIVER_WIDTH = 1
+# Weight of a sliver tile against a tile of contact in the score of an origin.
+SLIVER_PENALTY = 1.0
+
+
+def _outline_probes(mask: Mask) -> Tuple[np.ndarray, np.ndarray]:
+    """Returns the coordinates of the tiles in front of the outline of the mask,
+    of the shape (P, SLIVER_WIDTH + 1, 2). A probe starts at a tile of the mask
+    whose neighbour in some direction is outside the mask and steps from it in
+    that direction. Also returns which of the probed tiles fall back into the
+    mask."""
+    padded = np.pad(mask.array, 1)
+    steps = np.arange(1, SLIVER_WIDTH + 2)[:, np.newaxis]
+    probes = []
+    for direction in Direction.get_all_directions():
+        dy, dx = direction.unit_vector()
+        ahead = padded[1 + dy : 1 + dy + mask.h, 1 + dx : 1 + dx + mask.w]
+        facing = mask.array & ~ahead
+        probes.append(np.argwhere(facing)[:, np.newaxis, :] + steps * (dy, dx))
+    probes = np.concatenate(probes)
+    ys, xs = probes[..., 0], probes[..., 1]
+    in_bounds = (ys >= 0) & (ys < mask.h) & (xs >= 0) & (xs < mask.w)
+    inside = in_bounds & mask.array[
+        np.clip(ys, 0, mask.h - 1), np.clip(xs, 0, mask.w - 1)
+    ]
+    return probes, inside
+
+
+def _pack_column(values: list) -> tuple:
+    """Packs the values of one attribute of many areas. Arrays of one dtype and
+    plain masks are concatenated into one flat array with their shapes, other
+    values are kept in a list."""
+    first = values[0]
+    if isinstance(first, np.ndarray) and not first.dtype.hasobject:
+        if all(
+            isinstance(value, np.ndarray)
+            and value.dtype == first.dtype
+            and value.ndim == first.ndim
+            for value in values
+        ):
+            shapes = np.array([value.shape for value in values], dtype=np.int64)
+            flat = np.concatenate([value.ravel() for value in values])
+            return "array", flat, shapes.reshape(len(values), first.ndim)
+    if all(type(value) is Mask for value in values):
+        shapes = np.array([value.size for value in values], dtype=np.int64)
+        flat = np.concatenate([value.array.ravel() for value in values])
+        return "mask", flat, shapes
+    return "list", values
+
+
+def _unpack_column(column: tuple) -> list:
+    if column[0] == "list":
+        return column[1]
+    _, flat, shapes = column
+    ends = np.cumsum(np.prod(shapes, axis=1))
+    # Views into the flat array, each area gets its own part.
+    parts = np.split(flat, ends[:-1])
+    values = [part.reshape(shape) for part, shape in zip(parts, shapes.tolist())]
+    if column[0] == "mask":
+        return [Mask.wrap(value) for value in values]
+    return values
+
+
+def _pack_areas(areas: list[Area]) -> list[tuple]:
+    """Packs the states of the areas into columns per class, so a few large
+    arrays and a small description of the rest are pickled instead of every
+    area on its own."""
+    groups: dict[type, list[int]] = {}
+    for index, area in enumerate(areas):
+        groups.setdefault(type(area), []).append(index)
+    packed = []
+    for cls, indices in groups.items():
+        states = [areas[index].__getstate__() for index in indices]
+        names = list(states[0])
+        if any(list(state) != names for state in states):
+            packed.append((cls, indices, None, states))
+            continue
+        columns = [_pack_column([state[name] for state in states]) for name in names]
+        packed.append((cls, indices, names, columns))
+    return packed
+
+
+def _unpack_areas(packed: list[tuple]) -> list[Area]:
+    areas = [None] * sum(len(indices) for _, indices, _, _ in packed)
+    for cls, indices, names, columns in packed:
+        if names is None:
+            states = columns
+        else:
+            values = [_unpack_column(column) for column in columns]
+            states = [dict(zip(names, row)) for row in zip(*values)]
+        for index, state in zip(indices, states):
+            area = cls.__new__(cls)
+            area.__setstate__(state)
+            areas[index] = area
+    return areas
+
+
+def _rebuild_sector(
+    cls: type, state: dict, ids: list[int], origins: np.ndarray, packed: list[tuple]
+) -> Sector:
+    sector = cls.__new__(cls)
+    sector.__setstate__(state)
+    areas = _unpack_areas(packed)
+    sector.children = {
+        id: AreaWithOrigin(Vector(y, x), area)
+        for id, (y, x), area in zip(ids, origins.tolist(), areas)
+    }
+    sector._entrypoint_index = {}
+    sector._room_entrypoints = {}
+    for id, child in sector.get_rooms().items():
+        sector._index_entrypoints(id, child.origin, child.object)
+    return sector
 
 
 class Sector(Area):
@@ -20,7 +143,242 @@ class Sector(Area):
         if fill_value is None:
             fill_value = tile_types.wall
         super().__init__(size, fill_value=fill_value)
-        self.room_graph = ig.Graph()
+        self._room_graph = ig.Graph()
+        # Vertex index of each room in the room graph.
+        self._vertex_indices: dict[int, int] = {}
+        # Edges waiting to be added to the room graph in one batch.
+        self._pending_edges: list[Tuple[int, int]] = []
+        self._pending_edge_ids: list[dict[int, int]] = []
+        # Mirror of the room graph as adjacency lists of room ids.
+        self._adjacency: dict[int, list[int]] = {}
+        # Rooms within a number of hops of a room with their distances keyed by
+        # the room and the number of hops, and the keys each room is a part of.
+        self._hops_cache: dict[Tuple[int, int], dict[int, int]] = {}
+        self._hops_cache_keys: dict[int, set[Tuple[int, int]]] = {}
+        # Rooms with an entrypoint at a tile keyed by the tile packed as
+        # y * width + x, and the packed entrypoints of each room in row-major
+        # order.
+        self._entrypoint_index: dict[int, list[int]] = {}
+        self._room_entrypoints: dict[int, list[int]] = {}
+        # Number of children covering each tile.
+        self._occupancy = np.zeros(self.size, dtype=np.int16)
+        # Built on the first query and then updated with each child.
+        self._free_pyramid: FreeSpacePyramid | None = None
+
+    def __getstate__(self) -> dict:
+        """Leaves out the caches, they are rebuilt when needed."""
+        self._flush_edges()
+        state = super().__getstate__()
+        state["_free_pyramid"] = None
+        state["_hops_cache"] = {}
+        state["_hops_cache_keys"] = {}
+        return state
+
+    def __reduce__(self) -> tuple:
+        """Pickles the children packed into columns. Their arrays are then a few
+        large buffers that the pickle protocol 5 can pass out of band."""
+        state = self.__getstate__()
+        children = state.pop("children")
+        # Rebuilt from the rooms.
+        del state["_entrypoint_index"], state["_room_entrypoints"]
+        origins = np.array(
+            [(child.origin.y, child.origin.x) for child in children.values()],
+            dtype=np.int64,
+        ).reshape(-1, 2)
+        packed = _pack_areas([child.object for child in children.values()])
+        return _rebuild_sector, (type(self), state, list(children), origins, packed)
+
+    def _link_child(self, id: int, child: AreaWithOrigin) -> None:
+        super()._link_child(id, child)
+        add_at_mask(self._occupancy, child.origin, child.object.array, 1)
+        self._update_free_pyramid(child.origin, child.object.size)
+        if isinstance(child.object, Room):
+            self._index_entrypoints(id, child.origin, child.object)
+
+    def _unlink_child(self, id: int) -> AreaWithOrigin:
+        child = super()._unlink_child(id)
+        add_at_mask(self._occupancy, child.origin, child.object.array, -1)
+        self._update_free_pyramid(child.origin, child.object.size)
+        for key in self._room_entrypoints.pop(id, []):
+            self._entrypoint_index[key].remove(id)
+            if not self._entrypoint_index[key]:
+                del self._entrypoint_index[key]
+        return child
+
+    def _index_entrypoints(self, id: int, origin: Vector, room: Room) -> None:
+        """Adds the entrypoints of a newly added room to the entrypoint index."""
+        coordinates = np.argwhere(room.entrypoints.array) + (origin.y, origin.x)
+        inside = (coordinates[:, 0] < self.h) & (coordinates[:, 1] < self.w)
+        keys = (coordinates[inside, 0] * self.w + coordinates[inside, 1]).tolist()
+        self._room_entrypoints[id] = keys
+        for key in keys:
+            # Ids only grow, so this appends unless a removed room is put back.
+            bisect.insort(self._entrypoint_index.setdefault(key, []), id)
+
+    def _unpack(self, keys: list[int]) -> VectorArray:
+        """Returns packed tiles as a batch of coordinates."""
+        return VectorArray(
+            np.stack(np.divmod(np.array(keys, dtype=np.int64), self.w), axis=-1)
+        )
+
+    def rooms_sharing_entrypoints(self, room_id: int) -> dict[int, VectorArray]:
+        """Returns the rooms whose entrypoints share tiles with the entrypoints of
+        the given room along with the coordinates of the shared tiles in row-major
+        order. Costs time proportional to the room's entrypoints."""
+        if room_id not in self._room_entrypoints:
+            raise ValueError("The room of this id is not in the sector.")
+        shared: dict[int, list[int]] = {}
+        for key in self._room_entrypoints[room_id]:
+            for id in self._entrypoint_index[key]:
+                if id != room_id:
+                    shared.setdefault(id, []).append(key)
+        return {id: self._unpack(keys) for id, keys in shared.items()}
+
+    def shared_entrypoints(self, first_id: int, second_id: int) -> VectorArray:
+        """Returns the coordinates of the tiles where the entrypoints of the two
+        rooms meet in row-major order."""
+        shared = self.rooms_sharing_entrypoints(first_id).get(second_id)
+        if shared is None:
+            return VectorArray(np.empty((0, 2)))
+        return shared
+
+    def in_childless_area(self, point: Vector) -> bool:
+        return self.is_inside_mask(point) and bool(
+            self._occupancy[point.y, point.x] == 0
+        )
+
+    def children_shapes(self, without: [int] = None) -> Mask:
+        if without:
+            return super().children_shapes(without)
+        return Mask.from_array(self._occupancy > 0)
+
+    def _free_space(self, origin: Vector, size: Tuple[int, int]) -> Mask:
+        """Returns the space inside the sector that is not occupied by children,
+        cropped from the given origin by the size."""
+        window = (
+            slice(origin.y, origin.y + size[0]),
+            slice(origin.x, origin.x + size[1]),
+        )
+        free = self._occupancy[window] == 0
+        free &= self.array[window]
+        return Mask.wrap(free)
+
+    def _update_free_pyramid(self, origin: Vector, size: Tuple[int, int]) -> None:
+        """Recomputes the free space pyramid in the window affected by a change of
+        the given area."""
+        if self._free_pyramid is None:
+            return
+        reach = self._free_pyramid.reach
+        top_left, bottom_right = self._fit_window(origin, size, (reach, reach))
+        window_size = bottom_right - top_left
+        if window_size.y <= 0 or window_size.x <= 0:
+            return
+        free = self._free_space(
+            top_left, (window_size.y + reach - 1, window_size.x + reach - 1)
+        )
+        self._free_pyramid.update(top_left, tuple(window_size), free.array)
+
+    @property
+    def free_pyramid(self) -> FreeSpacePyramid:
+        if self._free_pyramid is None:
+            self._free_pyramid = FreeSpacePyramid(
+                self._free_space(Vector(0, 0), self.size).array, FREE_SQUARE_LEVELS
+            )
+        return self._free_pyramid
+
+    def room_may_fit(self, room: Room, neighbour_id: int = None) -> bool:
+        """Quickly checks whether the room might fit anywhere in the sector or next
+        to the given neighbour. False means it surely does not fit. Rooms share only
+        their walls, so the inside of the room has to fit into the free space."""
+        needed = square_levels(room.inner_shape().array, FREE_SQUARE_LEVELS).max()
+        if needed == 0:
+            return True
+        if neighbour_id is None:
+            return self.free_pyramid.largest_level() >= needed
+        neighbour = self.get_child(neighbour_id)
+        origin = neighbour.origin - Vector(room.h - 1, room.w - 1)
+        size = (
+            neighbour.object.h + 2 * room.h - 2,
+            neighbour.object.w + 2 * room.w - 2,
+        )
+        return self.free_pyramid.largest_level(origin, size) >= needed
+
+    def fit_room(self, to_fit: Mask) -> Mask:
+        """Returns a mask of the origins at which the given room fits into the free
+        space of the sector."""
+        return self._free_space(Vector(0, 0), self.size).fit_in(to_fit)
+
+    @property
+    def room_graph(self) -> ig.Graph:
+        """Graph of the rooms connected by entrances. Pending edges are added
+        before it is returned."""
+        self._flush_edges()
+        return self._room_graph
+
+    def _flush_edges(self) -> None:
+        """Adds all pending edges to the room graph in one batch."""
+        if not self._pending_edges:
+            return
+        self._room_graph.add_edges(
+            self._pending_edges, attributes={"ids": self._pending_edge_ids}
+        )
+        self._pending_edges = []
+        self._pending_edge_ids = []
+
+    def vertex_index(self, room_id: int) -> int:
+        """Returns the index of the room's vertex in the room graph."""
+        if room_id not in self._vertex_indices:
+            raise ValueError("The room of this id is not in the room graph.")
+        return self._vertex_indices[room_id]
+
+    def room_distances(
+        self, source_ids: list[int], target_ids: list[int]
+    ) -> np.ndarray:
+        """Returns the matrix of graph distances from the source rooms to the target
+        rooms computed in one batched query. Unreachable rooms have an infinite
+        distance."""
+        return np.array(
+            self.room_graph.distances(
+                source=[self.vertex_index(id) for id in source_ids],
+                target=[self.vertex_index(id) for id in target_ids],
+            ),
+            dtype=float,
+        )
+
+    def _invalidate_hops(self, room_id: int) -> None:
+        """Drops the cached results that contain the given room."""
+        for key in self._hops_cache_keys.pop(room_id, ()):
+            self._hops_cache.pop(key, None)
+
+    def rooms_within_hops(self, room_id: int, hops: int) -> dict[int, int]:
+        """Returns the rooms reachable from the given room in at most the given
+        number of hops along with their distances. Uses a breadth first search
+        limited by the depth and caches the result until an edge changes inside
+        it."""
+        key = (room_id, hops)
+        if key in self._hops_cache:
+            return self._hops_cache[key]
+        if room_id not in self._adjacency:
+            raise ValueError("The room of this id is not in the room graph.")
+        result = {room_id: 0}
+        frontier = [room_id]
+        for depth in range(1, hops + 1):
+            next_frontier = []
+            for current in frontier:
+                for neighbour in self._adjacency[current]:
+                    if neighbour not in result:
+                        result[neighbour] = depth
+                        next_frontier.append(neighbour)
+            frontier = next_frontier
+        self._hops_cache[key] = result
+        for id in result:
+            self._hops_cache_keys.setdefault(id, set()).add(key)
+        return result
+
+    def is_within_hops(self, first_id: int, second_id: int, hops: int) -> bool:
+        """Checks whether the second room is at most the given number of hops away
+        from the first one in the room graph."""
+        return second_id in self.rooms_within_hops(first_id, hops)
 
     def get_rooms(self) -> dict[int, AreaWithOrigin]:
         result = {}
@@ -29,9 +387,10 @@ class Sector(Area):
                 result[id] = child
         return result
 
-    def fit_room_adjacent(self, to_fit: Room, neighbour_id: int) -> np.array:
+    def fit_room_adjacent(self, to_fit: Room, neighbour_id: int) -> MaskWithOrigin:
         """Fits a room next to one already in the sector. Rooms will share a
-        border and will be fitted with respect to their room_anchor."""
+        border and will be fitted with respect to their room_anchor. The result
+        covers only the window around the neighbour where the room can be fitted."""
         if neighbour_id not in self.children:
             raise ValueError(
                 "The neighbour of the room to fit has to be a child of this sector."
@@ -40,40 +399,103 @@ class Sector(Area):
         if not isinstance(neighbour.object, Room):
             raise ValueError("The neighbour of the room has to be a room.")
 
-        anchor = Mask.empty_mask(self.size).insert_shape(
-            neighbour.origin, neighbour.object.entrypoints
-        )
-        without_children = (~self.children_shapes()).insert_shape(
-            neighbour.origin, neighbour.object.border()
-        )
-        return without_children.fit_in_anchors_touching(
-            to_fit, anchor=anchor, to_fit_anchor=to_fit.entrypoints
+        return self._fit_touching_neighbour(
+            to_fit, to_fit.entrypoints, neighbour, neighbour.object.entrypoints
         )
 
     def add_room(self, origin: Vector, room: Room) -> int:
         """Adds a new room at the given origin. Returns its new id."""
         id = self.add_child(origin, room)
-        self.room_graph.add_vertex(id=id)
+        self._vertex_indices[id] = self._room_graph.vcount()
+        self._room_graph.add_vertex(id=id)
+        self._adjacency[id] = []
+        self._record("add_room", id)
         return id
 
     def remove_room(self, to_remove_id) -> None:
-        to_remove_index = self.room_graph.vs.find(id=to_remove_id)
+        to_remove_index = self.vertex_index(to_remove_id)
         edge_indexes = self.room_graph.incident(to_remove_index)
+        room_ids = self._room_graph.vs["id"]
+        edges = []
+        entrances = []
         for index in edge_indexes:
-            edge = self.room_graph.es[index]
+            edge = self._room_graph.es[index]
             entrance_ids = edge["ids"]
+            edges.append((room_ids[edge.source], room_ids[edge.target], entrance_ids))
             for room_id, entrance_id in entrance_ids.items():
-                self.get_child(room_id).object.remove_entrance(entrance_id)
-        self.room_graph.delete_vertices([to_remove_index])
+                room = self.get_child(room_id).object
+                entrances.append(
+                    (room, room.entrances[room.entrances["id"] == entrance_id])
+                )
+                room.remove_entrance(entrance_id)
+        self._delete_vertex(to_remove_index)
+        adjacency = {to_remove_id: self._adjacency.pop(to_remove_id)}
+        for neighbour_id in adjacency[to_remove_id]:
+            adjacency.setdefault(neighbour_id, self._adjacency[neighbour_id])
+            self._adjacency[neighbour_id] = [
+                id for id in self._adjacency[neighbour_id] if id != to_remove_id
+            ]
+        self._invalidate_hops(to_remove_id)
+        self._record("remove_room", to_remove_id, edges, entrances, adjacency)
         self.remove_child(to_remove_id)
 
-    def add_room_adjacent(self, room: Room, neighbour_id: int) -> int:
+    def _delete_vertex(self, index: int) -> None:
+        self._room_graph.delete_vertices([index])
+        # Deleting a vertex shifts the indices of all the following ones.
+        self._vertex_indices = dict(
+            zip(self._room_graph.vs["id"], range(self._room_graph.vcount()))
+        )
+
+    def placement_scores(self, room: Mask, origins: VectorArray) -> np.ndarray:
+        """Scores the origins at which the room could be placed, higher is better.
+        Each side of an outline tile facing a blocked tile adds one for the
+        contact. Each free tile of a gap at most SLIVER_WIDTH wide left between
+        the room and the blocked tiles subtracts SLIVER_PENALTY. All the origins
+        are scored at once from the occupancy."""
+        probes, inside = _outline_probes(room)
+        coordinates = origins.array[:, np.newaxis, np.newaxis, :] + probes
+        ys, xs = coordinates[..., 0], coordinates[..., 1]
+        in_bounds = (ys >= 0) & (ys < self.h) & (xs >= 0) & (xs < self.w)
+        ys, xs = np.clip(ys, 0, self.h - 1), np.clip(xs, 0, self.w - 1)
+        blocked = ~in_bounds | (self._occupancy[ys, xs] > 0) | ~self.array[ys, xs]
+        blocked |= inside
+        contact = blocked[..., 0].sum(axis=1)
+        # Length of the run of free tiles in front of the outline. Runs that do
+        # not end within the probe are wide enough to be used.
+        run = np.argmax(blocked, axis=2)
+        sliver = np.where(blocked.any(axis=2), run, 0).sum(axis=1)
+        return contact - SLIVER_PENALTY * sliver
+
+    def add_room_adjacent(
+        self, room: Room, neighbour_id: int, candidates: int = 1
+    ) -> int:
         """Adds a new room that will be adjacent to its given neighbour.
-        They will share a wall. Returns its new id."""
+        They will share a wall. The origin is sampled from the fit. With more
+        candidates, that many origins are sampled from the same fit and the one
+        with the best placement score is used. Returns its new id."""
+        if candidates < 1:
+            raise ValueError("The number of candidates has to be positive.")
+        if not self.room_may_fit(room, neighbour_id=neighbour_id):
+            raise EmptyFitArea("The new room cannot be fitted.")
         fit_area = self.fit_room_adjacent(room, neighbour_id=neighbour_id)
+        return self.add_room_at_fit(room, fit_area, candidates=candidates)
+
+    def add_room_at_fit(
+        self, room: Room, fit_area: MaskWithOrigin, candidates: int = 1
+    ) -> int:
+        """Adds a new room at an origin sampled from the given fit like
+        add_room_adjacent does. Returns its new id."""
+        if candidates < 1:
+            raise ValueError("The number of candidates has to be positive.")
         if fit_area.is_empty():
             raise EmptyFitArea("The new room cannot be fitted.")
-        origin = fit_area.sample_mask_coordinate()
+        if candidates == 1:
+            origin = fit_area.sample_mask_coordinate()
+        else:
+            origins = fit_area.sample_mask_coordinates(
+                min(candidates, fit_area.object.volume())
+            )
+            origin = origins[int(np.argmax(self.placement_scores(room, origins)))]
         id = self.add_room(origin, room)
         return id
 
@@ -81,8 +503,8 @@ class Sector(Area):
         self, first_id: int, second_id: int, fill_value: np.ndarray = None
     ) -> None:
         """Make entrance between two already placed room given by their ids. The
-        entrance will be a new child inserted into both room and will have the given
-        fill value."""
+        entrance will be recorded in both rooms and will have the given fill
+        value."""
         if fill_value is None:
             fill_value = tile_types.floor
         if fill_value.dtype != tile_types.tile_dt:
@@ -96,31 +518,124 @@ class Sector(Area):
         if not isinstance(first_room, Room) or not isinstance(second_room, Room):
             raise ValueError("Can make entrances only between rooms.")
 
-        border_intersection = self.intersection(
-            first.origin,
-            first_room.entrypoints,
-            second.origin,
-            second_room.entrypoints,
-        )
-        if border_intersection.is_empty():
+        border_intersection = self.shared_entrypoints(first_id, second_id)
+        if len(border_intersection) == 0:
             raise EmptyFitArea(
                 "Cannot make entrance between two rooms that do not share a border."
             )
         # TODO support entrances of larger size.
-        entrance_point = border_intersection.sample_mask_coordinate()
-        entrance = Area((1, 1), fill_value=fill_value)
+        entrance_point = random.choice(border_intersection)
         first_entrance_id = first_room.place_entrance(
-            entrance_point - first.origin, entrance
+            entrance_point - first.origin, fill_value
         )
         second_entrance_id = second_room.place_entrance(
-            entrance_point - second.origin, entrance
+            entrance_point - second.origin, fill_value
+        )
+        self._record(
+            "entrances",
+            [(first_room, first_entrance_id), (second_room, second_entrance_id)],
         )
 
-        first_index = self.room_graph.vs.find(id=first_id).index
-        second_index = self.room_graph.vs.find(id=second_id).index
+        self._add_edge(
+            first_id,
+            second_id,
+            {first_id: first_entrance_id, second_id: second_entrance_id},
+        )
 
-        self.room_graph.add_edge(
-            first_index,
-            second_index,
-            ids={first_id: first_entrance_id, second_id: second_entrance_id},
+    def _add_edge(
+        self, first_id: int, second_id: int, entrance_ids: dict[int, int]
+    ) -> None:
+        """Connects two rooms in the room graph by the entrances given by their ids
+        keyed by the room ids."""
+        self._pending_edges.append(
+            (self.vertex_index(first_id), self.vertex_index(second_id))
         )
+        self._pending_edge_ids.append(entrance_ids)
+        self._adjacency[first_id].append(second_id)
+        self._adjacency[second_id].append(first_id)
+        self._invalidate_hops(first_id)
+        self._invalidate_hops(second_id)
+        self._record("edge", first_id, second_id, entrance_ids)
+
+    def _undo(self, entry: tuple) -> None:
+        kind = entry[0]
+        if kind == "add_room":
+            self._undo_add_room(entry[1])
+        elif kind == "remove_room":
+            self._undo_remove_room(*entry[1:])
+        elif kind == "edge":
+            self._undo_edge(*entry[1:])
+        elif kind == "entrances":
+            for room, entrance_id in entry[1]:
+                room.remove_entrance(entrance_id)
+        else:
+            super()._undo(entry)
+
+    def _undo_add_room(self, id: int) -> None:
+        # The later edges of the room were undone before, so it is isolated.
+        self._flush_edges()
+        self._delete_vertex(self.vertex_index(id))
+        del self._adjacency[id]
+        self._invalidate_hops(id)
+
+    def _undo_remove_room(
+        self,
+        id: int,
+        edges: list[Tuple[int, int, dict[int, int]]],
+        entrances: list[Tuple[Room, np.ndarray]],
+        adjacency: dict[int, list[int]],
+    ) -> None:
+        """Puts the vertex of a removed room back at the end of the room graph
+        together with its edges and entrances."""
+        self._flush_edges()
+        self._vertex_indices[id] = self._room_graph.vcount()
+        self._room_graph.add_vertex(id=id)
+        for first_id, second_id, entrance_ids in edges:
+            self._pending_edges.append(
+                (self.vertex_index(first_id), self.vertex_index(second_id))
+            )
+            self._pending_edge_ids.append(entrance_ids)
+        for room, records in entrances:
+            room._restore_entrances(records)
+        self._adjacency.update(adjacency)
+        for room_id in adjacency:
+            self._invalidate_hops(room_id)
+
+    def _undo_edge(
+        self, first_id: int, second_id: int, entrance_ids: dict[int, int]
+    ) -> None:
+        """Removes an edge added after the snapshot. Entrance ids are unique, so
+        they identify the edge."""
+        if entrance_ids in self._pending_edge_ids:
+            i = self._pending_edge_ids.index(entrance_ids)
+            del self._pending_edges[i]
+            del self._pending_edge_ids[i]
+        else:
+            for index in self._room_graph.incident(self.vertex_index(first_id)):
+                if self._room_graph.es[index]["ids"] == entrance_ids:
+                    self._room_graph.delete_edges([index])
+                    break
+        for room_id, neighbour_id in ((first_id, second_id), (second_id, first_id)):
+            neighbours = self._adjacency[room_id]
+            # Drop the last occurrence, the one added with the edge.
+            del neighbours[len(neighbours) - 1 - neighbours[::-1].index(neighbour_id)]
+            self._invalidate_hops(room_id)
+
+    def add_sector(self, origin: Vector, other: Sector) -> dict[int, int]:
+        """Adds the rooms of another sector placed at the given origin together
+        with the connections between them. The rooms are not copied. Returns the
+        new ids of the rooms keyed by their ids in the other sector."""
+        ids = {}
+        for id, room in other.get_rooms().items():
+            ids[id] = self.add_room(origin + room.origin, room.object)
+        if not ids:
+            return ids
+        graph = other.room_graph
+        room_ids = graph.vs["id"]
+        for edge in graph.es:
+            self._add_edge(
+                ids[room_ids[edge.source]],
+                ids[room_ids[edge.target]],
+                {ids[id]: entrance_id for id, entrance_id in edge["ids"].items()},
+            )
+        return ids
@@ -21,7 +21,7 @@ def get_all_actions() -> dict[str, HallwayAction]:
         designer: HallwayDesigner, head: Vector, direction: Direction = None
     ) -> None:
         """Set the designers parameters correctly after a moving action."""
-        designer.points.append(head)
+        designer.add_point(head)
         designer.head_point = head
         if direction is not None:
             designer.direction = direction
@@ -8,7 +8,7 @@ from hamingja_dungeon.hallway_designers.hallway_action import (
     HallwayAction,
     get_all_actions,
 )
-from hamingja_dungeon.utils.vector import Vector
+from hamingja_dungeon.utils.vector import Vector, VectorArray
 from hamingja_dungeon.dungeon_elements.hallway import Hallway
 from hamingja_dungeon.utils.direction import Direction
 
@@ -87,21 +87,20 @@ class HallwayDesigner:
     def valid_head(self, head: Vector, direction: Direction) -> bool:
         """Checks if the new head of the drawing process is valid; i.e. it's inside
         the area, it doesn't collide with itself e.g."""
-        neighbours = head.neighbours()
-        for neighbour in neighbours:
-            if not self.dungeon_area.is_inside_mask(neighbour):
-                return False
+        neighbours = VectorArray((head.y, head.x)).neighbours()
+        if not self.dungeon_area.is_inside_mask(neighbours).all():
+            return False
         # TODO childless area without child borders in the future.
         if not self.dungeon_area.in_childless_area(head):
             return False
-        if head in self.points:
+        if head in self._point_set:
             return False
         front = head + direction.unit_vector()
         front_left = front + direction.left().unit_vector()
         front_right = front + direction.right().unit_vector()
         front_neighbours = [front, front_left, front_right]
         for front_neighbour in front_neighbours:
-            if front_neighbour in self.points:
+            if front_neighbour in self._point_set:
                 return False
         return True
 
@@ -140,22 +139,16 @@ class HallwayDesigner:
     def _create_hallway(self) -> Tuple[Vector, Hallway]:
         """Creates a new hallway from the list of drawn hallway points and returns it
         along with its new origin on the dungeon area."""
-        ys = list(map(lambda p: p.y, self.points))
-        xs = list(map(lambda p: p.x, self.points))
-        min_y, min_x, max_y, max_x = min(ys), min(xs), max(ys), max(xs)
-        origin = Vector(min_y, min_x)
-        size = (max_y - min_y + 1, max_x - min_x + 1)
+        points = VectorArray.from_vectors(self.points)
+        origin = points.min()
+        size = tuple(points.max() - origin + Vector(1, 1))
         path = np.zeros(size).astype(bool)
 
-        hallway_points = [p - origin for p in self.points]
-
-        for point in hallway_points:
-            path[point.y, point.x] = True
+        hallway_points = points - origin
+        path[hallway_points.ys, hallway_points.xs] = True
 
         hallway = Hallway(path)
-        origin.y -= 1
-        origin.x -= 1
-        return origin, hallway
+        return origin - Vector(1, 1), hallway
 
     def _setup(
         self,
@@ -173,7 +166,7 @@ class HallwayDesigner:
             raise DesignerError()
         initial_direction = random.choice(directions)
         self.head_point = start_point + initial_direction.unit_vector()
-        self.points.append(self.head_point)
+        self.add_point(self.head_point)
         self.direction = initial_direction
         self.length = 3
 
@@ -183,8 +176,14 @@ class HallwayDesigner:
         self.length = 0
         self.head_point = None
         self.points = []
+        self._point_set = set()
         self.direction = None
 
+    def add_point(self, point: Vector) -> None:
+        """Adds a new point to the drawn hallway."""
+        self.points.append(point)
+        self._point_set.add(point)
+
     def design_hallway(
         self,
         start_point: Vector,
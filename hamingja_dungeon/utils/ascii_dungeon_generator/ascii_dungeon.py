@@ -1,3 +1,11 @@
+import os
+
+import numpy as np
+
+# Rows of the text of a rendered console are separated by a new line and a space.
+ROW_SEPARATOR = "\n "
+
+
 class ASCIIDungeon:
     def __init__(self, content: str, name: str = "new_dungeon"):
         self.name = name
@@ -6,9 +14,34 @@ class ASCIIDungeon:
     def __str__(self):
         return self.content
 
+    def to_array(self) -> np.ndarray:
+        """Returns the characters as an array of the shape (height, width)."""
+        rows = self.content.split(ROW_SEPARATOR)
+        return np.array([list(row) for row in rows], dtype="U1")
+
+    @staticmethod
+    def from_array(array: np.ndarray, name: str = "new_dungeon") -> "ASCIIDungeon":
+        rows = ("".join(row) for row in array.tolist())
+        return ASCIIDungeon(ROW_SEPARATOR.join(rows), name)
+
+    def to_codes(self) -> tuple[np.ndarray, str]:
+        """Returns the tiles as uint8 codes of the shape (height, width) together
+        with the characters the codes stand for."""
+        array = self.to_array()
+        glyphs, codes = np.unique(array, return_inverse=True)
+        if len(glyphs) > 256:
+            raise ValueError("The dungeon has too many characters for uint8 codes.")
+        return codes.reshape(array.shape).astype(np.uint8), "".join(glyphs)
+
+    @staticmethod
+    def from_codes(
+        codes: np.ndarray, glyphs: str, name: str = "new_dungeon"
+    ) -> "ASCIIDungeon":
+        return ASCIIDungeon.from_array(np.array(list(glyphs))[codes], name)
+
     def save_as(self, output_file: str):
         with open(output_file, "w+") as f:
             f.write(self.content)
 
     def save(self, output_dir: str):
-        self.save_as(output_dir + "//" + self.name + ".txt")
+        self.save_as(os.path.join(output_dir, self.name + ".txt"))
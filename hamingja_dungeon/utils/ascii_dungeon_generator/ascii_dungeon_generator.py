@@ -1,3 +1,10 @@
+import itertools
+import os
+import random
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator
+
 from tcod import tcod
 
 from hamingja_dungeon.dungeon_elements.sector import Sector
@@ -6,17 +13,24 @@ from hamingja_dungeon.utils.ascii_dungeon_generator.ascii_dungeon import ASCIIDu
 from hamingja_dungeon.utils.ascii_dungeon_generator.config.ascii_dungeon_config import (
     ASCIIDungeonConfig,
 )
+from hamingja_dungeon.utils.ascii_dungeon_generator.dungeon_cache import (
+    DungeonCache,
+    dungeon_key,
+    is_cacheable,
+)
 from hamingja_dungeon.utils.ascii_dungeon_generator.dungeon_renderer.renderer import (
     Renderer,
 )
 
 
 class ASCIIDungeonGenerator:
-    def __init__(self, dungeon_config: ASCIIDungeonConfig):
+    def __init__(self, dungeon_config: ASCIIDungeonConfig, cache: DungeonCache = None):
         self.config = dungeon_config
         self.generated_count = 1
+        # Dungeons generated with a seed are looked up in and stored to the cache.
+        self.cache = cache
 
-    def generate(self):
+    def _render(self) -> str:
         dungeon_area = Sector(self.config.dungeon_area.size)
 
         generator = PrototypeDesigner(self.config.dungeon_area)
@@ -29,10 +43,67 @@ class ASCIIDungeonGenerator:
         renderer.render_console(root_console)
 
         raw_output = root_console.__str__()
-        raw_output = raw_output[1:-1]
+        return raw_output[1:-1]
+
+    def _render_seeded(self, seed: int) -> str:
+        state = random.getstate()
+        random.seed(seed)
+        try:
+            return self._render()
+        finally:
+            random.setstate(state)
+
+    def generate(self, seed: int = None):
+        """Generates a dungeon. A dungeon of the given seed is always the same
+        and is served from the cache if there is one, unless a time budget of the
+        config makes it depend on the wall clock."""
+        if seed is None:
+            raw_output = self._render()
+        elif self.cache is None or not is_cacheable(self.config):
+            raw_output = self._render_seeded(seed)
+        else:
+            key = dungeon_key(self.config, seed)
+            raw_output = self.cache.get(key)
+            if raw_output is None:
+                raw_output = self._render_seeded(seed)
+                self.cache.put(key, raw_output)
 
         dungeon = ASCIIDungeon(
             raw_output, self.config.base_name + "_" + str(self.generated_count)
         )
         self.generated_count = self.generated_count + 1
         return dungeon
+
+
+def dungeon_name(config: ASCIIDungeonConfig, seed: int) -> str:
+    return f"{config.base_name}_{seed:016x}"
+
+
+def generate_dungeon(config: ASCIIDungeonConfig, seed: int) -> ASCIIDungeon:
+    """Generates the dungeon of the given seed named after it. Runs in the worker
+    processes."""
+    dungeon = ASCIIDungeonGenerator(config).generate(seed)
+    dungeon.name = dungeon_name(config, seed)
+    return dungeon
+
+
+def generate_batch(
+    config: ASCIIDungeonConfig, seeds: Iterable[int], workers: int = None
+) -> Iterator[ASCIIDungeon]:
+    """Generates the dungeons of the seeds in worker processes and yields them in
+    the order of the seeds. Only a few generations per worker run ahead of the
+    consumer, so the seeds can be an endless iterator."""
+    if workers is None:
+        workers = os.cpu_count()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        ahead = 2 * workers
+        seeds = iter(seeds)
+        pending = deque(
+            executor.submit(generate_dungeon, config, seed)
+            for seed in itertools.islice(seeds, ahead)
+        )
+        while pending:
+            dungeon = pending.popleft().result()
+            for seed in itertools.islice(seeds, 1):
+                pending.append(executor.submit(generate_dungeon, config, seed))
+            yield dungeon
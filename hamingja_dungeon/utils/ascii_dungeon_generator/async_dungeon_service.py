@@ -0,0 +1,228 @@
+from __future__ import annotations
+
+import asyncio
+import functools
+import random
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from hamingja_dungeon.utils.ascii_dungeon_generator.ascii_dungeon import ASCIIDungeon
+from hamingja_dungeon.utils.ascii_dungeon_generator.ascii_dungeon_generator import (
+    dungeon_name,
+    generate_dungeon,
+)
+from hamingja_dungeon.utils.ascii_dungeon_generator.config.ascii_dungeon_config import (
+    ASCIIDungeonConfig,
+)
+from hamingja_dungeon.utils.ascii_dungeon_generator.dungeon_cache import config_key
+
+# Number of ready dungeons kept for each config.
+PREFETCH_SIZE = 4
+# Number of the latest samples the latency statistics are computed from.
+LATENCY_WINDOW = 1024
+
+# Put on the queues of a closed service to wake the waiting requests.
+_CLOSED = object()
+
+
+@dataclass
+class LatencyStats:
+    """Statistics of the latest latencies in seconds."""
+
+    count: int = 0
+    mean: float = 0.0
+    p50: float = 0.0
+    p95: float = 0.0
+    max: float = 0.0
+
+    @staticmethod
+    def of(samples: deque[float]) -> LatencyStats:
+        if not samples:
+            return LatencyStats()
+        array = np.fromiter(samples, dtype=float, count=len(samples))
+        p50, p95 = np.percentile(array, (50, 95))
+        return LatencyStats(
+            len(array), float(array.mean()), float(p50), float(p95), float(array.max())
+        )
+
+
+@dataclass
+class ServiceMetrics:
+    """Snapshot of the metrics of a dungeon service."""
+
+    # Ready dungeons and dungeons being generated for each config key.
+    queue_depths: dict[str, int] = field(default_factory=dict)
+    in_flight: dict[str, int] = field(default_factory=dict)
+    requests: int = 0
+    # Requests served by a dungeon that was ready when they came.
+    prefetch_hits: int = 0
+    get_latency: LatencyStats = field(default_factory=LatencyStats)
+    generation_latency: LatencyStats = field(default_factory=LatencyStats)
+
+
+class _Prefetcher:
+    """Keeps the queue of ready dungeons of one config filled."""
+
+    def __init__(self, size: int):
+        self.queue: asyncio.Queue = asyncio.Queue()
+        # Counts the dungeons that are ready or being generated.
+        self.slots = asyncio.Semaphore(size)
+        self.in_flight = 0
+        self.task: asyncio.Task | None = None
+        self.producers: set[asyncio.Task] = set()
+
+
+class AsyncDungeonService:
+    """Serves generated dungeons to asyncio code without blocking the event loop.
+    Dungeons are generated in a process pool. For each requested config a number
+    of dungeons with random seeds are generated in advance and refilled in the
+    background as they are taken. Dungeons of a given seed are generated on
+    request.
+
+    Use it as an async context manager or close it when done."""
+
+    def __init__(
+        self,
+        prefetch: int = PREFETCH_SIZE,
+        workers: int = None,
+        executor: Executor = None,
+        seed: int = None,
+    ):
+        if prefetch < 0:
+            raise ValueError("The prefetch size cannot be negative.")
+        self.prefetch = prefetch
+        self._owns_executor = executor is None
+        self._executor = (
+            ProcessPoolExecutor(max_workers=workers) if executor is None else executor
+        )
+        # Draws the seeds of the prefetched dungeons.
+        self._seeds = random.Random(seed)
+        self._prefetchers: dict[str, _Prefetcher] = {}
+        self._requests = 0
+        self._prefetch_hits = 0
+        self._get_latencies: deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self._generation_latencies: deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self._closed = False
+
+    async def __aenter__(self) -> AsyncDungeonService:
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        """Stops the prefetching and shuts the process pool down. Requests waiting
+        for a prefetched dungeon raise ValueError."""
+        if self._closed:
+            return
+        self._closed = True
+        tasks = []
+        for prefetcher in self._prefetchers.values():
+            if prefetcher.task is not None:
+                tasks.append(prefetcher.task)
+            tasks.extend(prefetcher.producers)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for prefetcher in self._prefetchers.values():
+            prefetcher.queue.put_nowait(_CLOSED)
+        if self._owns_executor:
+            await asyncio.to_thread(
+                functools.partial(
+                    self._executor.shutdown, wait=True, cancel_futures=True
+                )
+            )
+
+    async def _generate(self, config: ASCIIDungeonConfig, seed: int) -> ASCIIDungeon:
+        start = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        dungeon = await loop.run_in_executor(
+            self._executor, generate_dungeon, config, seed
+        )
+        self._generation_latencies.append(time.perf_counter() - start)
+        return dungeon
+
+    async def _produce(
+        self, config: ASCIIDungeonConfig, prefetcher: _Prefetcher
+    ) -> None:
+        """Generates one dungeon into the queue together with its seed. A failure
+        is queued too and raised by the request that takes it."""
+        prefetcher.in_flight += 1
+        seed = self._seeds.getrandbits(64)
+        try:
+            result = seed, await self._generate(config, seed)
+        except asyncio.CancelledError:
+            raise
+        except Exception as error:
+            result = error
+        finally:
+            prefetcher.in_flight -= 1
+        prefetcher.queue.put_nowait(result)
+
+    async def _refill(
+        self, config: ASCIIDungeonConfig, prefetcher: _Prefetcher
+    ) -> None:
+        """Starts a new generation whenever a slot in the queue frees up. The
+        producers are cancelled by close."""
+        producers = prefetcher.producers
+        while True:
+            await prefetcher.slots.acquire()
+            producer = asyncio.create_task(self._produce(config, prefetcher))
+            producers.add(producer)
+            producer.add_done_callback(producers.discard)
+
+    def _prefetcher(self, config: ASCIIDungeonConfig) -> _Prefetcher:
+        key = config_key(config)
+        prefetcher = self._prefetchers.get(key)
+        if prefetcher is None:
+            prefetcher = self._prefetchers[key] = _Prefetcher(self.prefetch)
+            prefetcher.task = asyncio.create_task(self._refill(config, prefetcher))
+        return prefetcher
+
+    async def get(self, config: ASCIIDungeonConfig, seed: int = None) -> ASCIIDungeon:
+        """Returns a dungeon of the config. Without a seed a prefetched one is
+        returned and the prefetching of the config starts on its first request.
+        With a seed the dungeon is generated on request and is always the same
+        for the same config and seed."""
+        if self._closed:
+            raise ValueError("The service is closed.")
+        start = time.perf_counter()
+        self._requests += 1
+        if seed is not None or self.prefetch == 0:
+            if seed is None:
+                seed = self._seeds.getrandbits(64)
+            dungeon = await self._generate(config, seed)
+        else:
+            prefetcher = self._prefetcher(config)
+            if not prefetcher.queue.empty():
+                self._prefetch_hits += 1
+            result = await prefetcher.queue.get()
+            if result is _CLOSED:
+                # Left for the other waiting requests.
+                prefetcher.queue.put_nowait(_CLOSED)
+                raise ValueError("The service is closed.")
+            prefetcher.slots.release()
+            if isinstance(result, Exception):
+                raise result
+            seed, dungeon = result
+            # The queue is shared by the configs generating the same dungeons,
+            # which may still name them differently.
+            dungeon.name = dungeon_name(config, seed)
+        self._get_latencies.append(time.perf_counter() - start)
+        return dungeon
+
+    def metrics(self) -> ServiceMetrics:
+        return ServiceMetrics(
+            queue_depths={
+                key: p.queue.qsize() for key, p in self._prefetchers.items()
+            },
+            in_flight={key: p.in_flight for key, p in self._prefetchers.items()},
+            requests=self._requests,
+            prefetch_hits=self._prefetch_hits,
+            get_latency=LatencyStats.of(self._get_latencies),
+            generation_latency=LatencyStats.of(self._generation_latencies),
+        )
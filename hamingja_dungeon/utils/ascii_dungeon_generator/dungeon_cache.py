@@ -0,0 +1,164 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from hamingja_dungeon import __version__
+from hamingja_dungeon.dungeon_designers.config.dungeon_area_config import (
+    DungeonAreaConfig,
+)
+from hamingja_dungeon.utils.ascii_dungeon_generator.config.ascii_dungeon_config import (
+    ASCIIDungeonConfig,
+)
+
+# Size of the stored dungeons in bytes after which the least recently used ones
+# are evicted.
+DUNGEON_CACHE_SIZE = 256 * 1024 * 1024
+SUFFIX = ".txt"
+# Budgets making the generated dungeon depend on the wall clock.
+TIME_BUDGETS = ("time_budget", "cleanup_time_budget")
+# Parameters of the room sizes of each method.
+ROOM_SIZE_FIELDS = {
+    "fixed": "fixed_room_size",
+    "range": "range_room_size",
+    "factor": "factor_room_size",
+}
+
+
+def _area_config(config: ASCIIDungeonConfig | DungeonAreaConfig) -> DungeonAreaConfig:
+    if isinstance(config, ASCIIDungeonConfig):
+        return config.dungeon_area
+    return config
+
+
+def is_cacheable(config: ASCIIDungeonConfig | DungeonAreaConfig) -> bool:
+    """Checks whether the dungeons of the config are determined by their seeds.
+    With a time budget they depend on how fast they are generated."""
+    area = _area_config(config)
+    return all(getattr(area, budget) is None for budget in TIME_BUDGETS)
+
+
+def generation_fields(config: ASCIIDungeonConfig | DungeonAreaConfig) -> dict:
+    """Returns the fields of the config deciding the generated dungeon. The name
+    of the output and the room sizes of the unused methods are left out."""
+    area = _area_config(config)
+    unused = {
+        field
+        for method, field in ROOM_SIZE_FIELDS.items()
+        if method != area.room_size_method
+    }
+    return area.model_dump(mode="json", exclude=unused)
+
+
+def _canonical_key(*parts) -> str:
+    canonical = json.dumps([*parts, __version__], sort_keys=True, separators=(",", ":"))
+    return hashlib.blake2b(canonical.encode(), digest_size=16).hexdigest()
+
+
+def config_key(config: ASCIIDungeonConfig | DungeonAreaConfig) -> str:
+    """Returns a key determined by the generation fields of the config and the
+    library version, the same for configs generating the same dungeons."""
+    return _canonical_key(generation_fields(config))
+
+
+def dungeon_key(config: ASCIIDungeonConfig | DungeonAreaConfig, seed: int) -> str:
+    """Returns a key determined by the generation fields of the config, the seed
+    and the library version. The fields are canonicalized, so equal configs give
+    the same key however they were written."""
+    return _canonical_key(generation_fields(config), seed)
+
+
+class DungeonCache:
+    """Stores the content of generated dungeons in a directory, a file per key.
+    Files are written atomically, so the directory can be shared by several
+    processes. When the stored size exceeds the limit the least recently used
+    dungeons are removed. The use is tracked by the modification times of the
+    files and the size is read from the directory when evicting, so the limit
+    holds for all the processes sharing it and survives restarts."""
+
+    def __init__(self, directory: Path | str, max_bytes: int = DUNGEON_CACHE_SIZE):
+        if max_bytes <= 0:
+            raise ValueError("The size of the cache has to be positive.")
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / (key + SUFFIX)
+
+    def _entries(self) -> list[tuple[int, str, int]]:
+        """Returns the modification time, key and size of the stored dungeons
+        from the least recently used."""
+        entries = []
+        with os.scandir(self.directory) as scan:
+            for entry in scan:
+                if not entry.name.endswith(SUFFIX):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                key = entry.name[: -len(SUFFIX)]
+                entries.append((stat.st_mtime_ns, key, stat.st_size))
+        return sorted(entries)
+
+    @property
+    def size(self) -> int:
+        """Size of the stored dungeons in bytes."""
+        return sum(size for _, _, size in self._entries())
+
+    def __len__(self) -> int:
+        return len(self._entries())
+
+    def __contains__(self, key: str) -> bool:
+        return self._path(key).exists()
+
+    @staticmethod
+    def _touch(path: Path) -> None:
+        # The clock of the file system can be too coarse to order quick uses.
+        now = time.time_ns()
+        os.utime(path, ns=(now, now))
+
+    def get(self, key: str) -> str | None:
+        """Returns the stored content or None if it is not stored."""
+        path = self._path(key)
+        try:
+            content = path.read_text(encoding="utf-8")
+            self._touch(path)
+        except FileNotFoundError:
+            return None
+        return content
+
+    def put(self, key: str, content: str) -> None:
+        """Stores the content under the key and evicts the least recently used
+        dungeons over the size limit."""
+        data = content.encode("utf-8")
+        descriptor, temporary = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(descriptor, "wb") as file:
+                file.write(data)
+            self._touch(temporary)
+            os.replace(temporary, self._path(key))
+        except BaseException:
+            os.unlink(temporary)
+            raise
+        with self._lock:
+            entries = self._entries()
+            size = sum(entry_size for _, _, entry_size in entries)
+            for _, old_key, old_size in entries[:-1]:
+                if size <= self.max_bytes:
+                    break
+                if old_key == key:
+                    continue
+                self._path(old_key).unlink(missing_ok=True)
+                size -= old_size
+
+    def clear(self) -> None:
+        for _, key, _ in self._entries():
+            self._path(key).unlink(missing_ok=True)
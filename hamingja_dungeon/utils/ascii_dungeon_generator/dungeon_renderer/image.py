@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import struct
+import zlib
+from pathlib import Path
+
+import numpy as np
+
+from hamingja_dungeon.dungeon_elements.area import Area
+from hamingja_dungeon.tile_types import bg
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+# Compression level of the image data. The images are mostly flat colours, which
+# compress well already at the fastest level.
+PNG_COMPRESSION = 1
+
+
+def to_rgb(area: Area, layer: str = "bg", scale: int = 1) -> np.ndarray:
+    """Returns an image of the area with its children drawn, colouring every tile
+    by the foreground or background colour of its dark graphic. Tiles outside the
+    shape are coloured like the renderer does. Each tile becomes a square of scale
+    pixels. The image is a uint8 array of the shape (height, width, 3)."""
+    return drawn_to_rgb(area.draw_children(), layer, scale)
+
+
+def drawn_to_rgb(drawn: Area, layer: str = "bg", scale: int = 1) -> np.ndarray:
+    """Returns the image of an area whose children are already drawn, see
+    to_rgb."""
+    if layer not in ("fg", "bg"):
+        raise ValueError("The layer has to be either fg or bg.")
+    if scale < 1:
+        raise ValueError("The scale has to be positive.")
+    array = np.asarray(drawn.array)
+    colours = np.asarray(drawn.tiles)["dark"][layer]
+    image = np.where(array[..., np.newaxis], colours, bg["dark"][layer])
+    if scale > 1:
+        image = np.repeat(np.repeat(image, scale, axis=0), scale, axis=1)
+    return image.astype(np.uint8, copy=False)
+
+
+def _chunk(kind: bytes, data: bytes) -> bytes:
+    crc = zlib.crc32(data, zlib.crc32(kind))
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", crc)
+
+
+def encode_png(image: np.ndarray, compression: int = PNG_COMPRESSION) -> bytes:
+    """Encodes an RGB image of the shape (height, width, 3) as a PNG."""
+    if image.ndim != 3 or image.shape[2] != 3 or 0 in image.shape:
+        raise ValueError("The image has to have the shape (height, width, 3).")
+    h, w, _ = image.shape
+    # Every row starts with the byte of its filter, 0 leaves the row unfiltered.
+    rows = np.zeros((h, 1 + 3 * w), dtype=np.uint8)
+    rows[:, 1:] = image.reshape(h, 3 * w)
+    header = struct.pack(">IIBBBBB", w, h, 8, 2, 0, 0, 0)
+    return (
+        PNG_SIGNATURE
+        + _chunk(b"IHDR", header)
+        + _chunk(b"IDAT", zlib.compress(rows.tobytes(), compression))
+        + _chunk(b"IEND", b"")
+    )
+
+
+def save_png(area: Area, path: Path | str, layer: str = "bg", scale: int = 1) -> None:
+    """Writes an image of the area made by to_rgb as a PNG file."""
+    with open(path, "wb") as file:
+        file.write(encode_png(to_rgb(area, layer, scale)))
@@ -3,6 +3,9 @@ from tcod.console import Console
 
 from hamingja_dungeon.dungeon_elements.area import Area
 from hamingja_dungeon.tile_types import bg
+from hamingja_dungeon.utils.ascii_dungeon_generator.dungeon_renderer.image import (
+    drawn_to_rgb,
+)
 
 
 class Renderer:
@@ -21,3 +24,8 @@ class Renderer:
         console.rgb[0 : console.height, 0 : console.width] = np.where(
             array, tiles["dark"], bg["dark"]
         )
+
+    def render_image(self, layer: str = "bg", scale: int = 1) -> np.ndarray:
+        """Returns an RGB image of the tile colours, see to_rgb."""
+        self.update()
+        return drawn_to_rgb(self.dungeon_object, layer, scale)
@@ -0,0 +1,293 @@
+from __future__ import annotations
+
+import io
+import json
+import queue
+import tarfile
+import threading
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any, Iterable
+
+import numpy as np
+
+from hamingja_dungeon.utils.ascii_dungeon_generator.ascii_dungeon import ASCIIDungeon
+
+# Number of dungeons in one shard.
+SHARD_SIZE = 1000
+# Number of dungeons waiting to be written after which writing blocks.
+SINK_QUEUE_SIZE = 64
+
+_FLUSH = object()
+_CLOSE = object()
+
+
+class DungeonSink(ABC):
+    """Appends dungeons to numbered shard files in a directory. The dungeons are
+    written by a background thread, so producing them is not held up by the disk.
+    Every written dungeon gets a line in the JSON lines index file telling its
+    shard and position, from which it can be read back with read. An index line
+    is written only once its dungeon is in the shard file.
+
+    The directory has to have no index of the prefix yet, an existing set of
+    shards is never overwritten. Use it as a context manager or close it when
+    done."""
+
+    suffix = ""
+    # True if the dungeons reach the shard file only when the shard is closed.
+    writes_on_close = False
+
+    def __init__(
+        self,
+        directory: Path | str,
+        prefix: str = "dungeons",
+        shard_size: int = SHARD_SIZE,
+        queue_size: int = SINK_QUEUE_SIZE,
+    ):
+        if shard_size <= 0 or queue_size <= 0:
+            raise ValueError("The shard and queue sizes have to be positive.")
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.prefix = prefix
+        self.shard_size = shard_size
+        self.index_path = self.directory / f"{prefix}.index.jsonl"
+        self.written = 0
+        try:
+            self._index = open(self.index_path, "x", encoding="utf-8")
+        except FileExistsError:
+            raise ValueError(
+                f"The directory already has dungeons of the prefix {prefix}."
+            ) from None
+        # Index lines of the open shard waiting for it to be written.
+        self._held_entries: list[str] = []
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._error: BaseException | None = None
+        self._shard = None
+        self._shard_path: Path | None = None
+        self._shard_count = 0
+        self._in_shard = 0
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def __enter__(self) -> DungeonSink:
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def _check(self) -> None:
+        if self._error is not None:
+            raise self._error
+
+    def write(self, dungeon: ASCIIDungeon, metadata: dict[str, Any] = None) -> None:
+        """Queues the dungeon to be written. The metadata is stored in the index
+        and has to be serializable to JSON."""
+        if self._thread is None:
+            raise ValueError("The sink is closed.")
+        self._check()
+        self._queue.put((dungeon, metadata))
+
+    def write_all(self, dungeons: Iterable[ASCIIDungeon]) -> None:
+        """Writes the dungeons of any iterable, for example of generate_batch."""
+        for dungeon in dungeons:
+            self.write(dungeon)
+
+    def flush(self) -> None:
+        """Waits until the queued dungeons are written and flushed to the files.
+        Sinks writing on close close the open shard, the next dungeons go to a
+        new one."""
+        if self._thread is None:
+            return
+        self._queue.put(_FLUSH)
+        self._queue.join()
+        self._check()
+
+    def close(self) -> None:
+        """Writes the queued dungeons and closes the last shard and the index."""
+        if self._thread is None:
+            return
+        self._queue.put(_CLOSE)
+        self._thread.join()
+        self._thread = None
+        self._check()
+
+    def _run(self) -> None:
+        try:
+            while True:
+                item = self._queue.get()
+                try:
+                    if item is _CLOSE:
+                        break
+                    if item is _FLUSH:
+                        self._flush_files()
+                    elif self._error is None:
+                        self._store(*item)
+                except BaseException as error:
+                    # Reported to the writers, the rest of the queue is skipped.
+                    self._error = error
+                finally:
+                    self._queue.task_done()
+            if self._error is None:
+                self._finish_shard()
+        except BaseException as error:
+            self._error = error
+        finally:
+            self._index.close()
+
+    def _flush_files(self) -> None:
+        if self.writes_on_close:
+            self._finish_shard()
+            return
+        if self._shard is not None:
+            self._flush_shard(self._shard)
+        self._index.flush()
+
+    def _finish_shard(self) -> None:
+        if self._shard is not None:
+            self._close_shard(self._shard)
+            self._shard = None
+        self._index.writelines(self._held_entries)
+        self._held_entries = []
+        self._index.flush()
+
+    def _store(self, dungeon: ASCIIDungeon, metadata: dict[str, Any] | None) -> None:
+        if self._shard is None or self._in_shard == self.shard_size:
+            self._finish_shard()
+            name = f"{self.prefix}-{self._shard_count:05d}{self.suffix}"
+            self._shard_path = self.directory / name
+            self._shard = self._open_shard(self._shard_path)
+            self._shard_count += 1
+            self._in_shard = 0
+        location = self._append(self._shard, dungeon, metadata)
+        entry = {"name": dungeon.name, "shard": self._shard_path.name, **location}
+        if metadata:
+            entry["metadata"] = metadata
+        line = json.dumps(entry) + "\n"
+        if self.writes_on_close:
+            self._held_entries.append(line)
+        else:
+            self._index.write(line)
+        self._in_shard += 1
+        self.written += 1
+
+    @abstractmethod
+    def _open_shard(self, path: Path) -> Any:
+        pass
+
+    @abstractmethod
+    def _append(
+        self, shard: Any, dungeon: ASCIIDungeon, metadata: dict[str, Any] | None
+    ) -> dict[str, Any]:
+        """Appends the dungeon to the shard. Returns where it is in the shard."""
+
+    def _flush_shard(self, shard: Any) -> None:
+        shard.flush()
+
+    def _close_shard(self, shard: Any) -> None:
+        shard.close()
+
+    @staticmethod
+    def read_index(directory: Path | str, prefix: str = "dungeons") -> list[dict]:
+        path = Path(directory) / f"{prefix}.index.jsonl"
+        with open(path, encoding="utf-8") as file:
+            return [json.loads(line) for line in file]
+
+    @staticmethod
+    @abstractmethod
+    def read(directory: Path | str, entry: dict[str, Any]) -> ASCIIDungeon:
+        """Reads the dungeon given by its index entry."""
+
+
+class TarSink(DungeonSink):
+    """Stores the dungeons as text files in uncompressed tar shards. The index
+    holds the offsets of the texts, so they are read without scanning the
+    archive."""
+
+    suffix = ".tar"
+
+    def _open_shard(self, path: Path) -> tarfile.TarFile:
+        return tarfile.open(path, "w")
+
+    def _append(
+        self, shard: tarfile.TarFile, dungeon: ASCIIDungeon, metadata: dict | None
+    ) -> dict[str, Any]:
+        data = dungeon.content.encode("utf-8")
+        info = tarfile.TarInfo(dungeon.name + ".txt")
+        info.size = len(data)
+        info.mtime = int(time.time())
+        header = info.tobuf(shard.format, shard.encoding, shard.errors)
+        offset = shard.offset + len(header)
+        shard.addfile(info, io.BytesIO(data))
+        return {"member": info.name, "offset": offset, "size": len(data)}
+
+    def _flush_shard(self, shard: tarfile.TarFile) -> None:
+        shard.fileobj.flush()
+
+    @staticmethod
+    def read(directory: Path | str, entry: dict[str, Any]) -> ASCIIDungeon:
+        with open(Path(directory) / entry["shard"], "rb") as file:
+            file.seek(entry["offset"])
+            content = file.read(entry["size"]).decode("utf-8")
+        return ASCIIDungeon(content, entry["name"])
+
+
+class JsonlSink(DungeonSink):
+    """Stores the dungeons with their metadata as JSON lines. The index holds the
+    byte offsets of the lines."""
+
+    suffix = ".jsonl"
+
+    def _open_shard(self, path: Path) -> io.BufferedWriter:
+        return open(path, "wb")
+
+    def _append(
+        self, shard: io.BufferedWriter, dungeon: ASCIIDungeon, metadata: dict | None
+    ) -> dict[str, Any]:
+        record = {"name": dungeon.name, "content": dungeon.content}
+        if metadata:
+            record["metadata"] = metadata
+        line = (json.dumps(record) + "\n").encode("utf-8")
+        offset = shard.tell()
+        shard.write(line)
+        return {"offset": offset, "size": len(line)}
+
+    @staticmethod
+    def read(directory: Path | str, entry: dict[str, Any]) -> ASCIIDungeon:
+        with open(Path(directory) / entry["shard"], "rb") as file:
+            file.seek(entry["offset"])
+            record = json.loads(file.read(entry["size"]))
+        return ASCIIDungeon(record["content"], record["name"])
+
+
+class NpzSink(DungeonSink):
+    """Stores the dungeons as uint8 code rasters in compressed npz shards. The
+    index holds the characters the codes of each dungeon stand for. An npz file
+    cannot be appended to, so a shard is kept in memory until it is full, the
+    sink is flushed or closed and then written at once. The dungeons of the open
+    shard are not in the index until then."""
+
+    suffix = ".npz"
+    writes_on_close = True
+
+    def _open_shard(self, path: Path) -> dict[str, Any]:
+        return {"path": path, "arrays": {}}
+
+    def _append(
+        self, shard: dict[str, Any], dungeon: ASCIIDungeon, metadata: dict | None
+    ) -> dict[str, Any]:
+        key = f"dungeon_{len(shard['arrays'])}"
+        shard["arrays"][key], glyphs = dungeon.to_codes()
+        return {"key": key, "glyphs": glyphs}
+
+    def _close_shard(self, shard: dict[str, Any]) -> None:
+        temporary = shard["path"].with_suffix(".tmp")
+        with open(temporary, "wb") as file:
+            np.savez_compressed(file, **shard["arrays"])
+        temporary.replace(shard["path"])
+
+    @staticmethod
+    def read(directory: Path | str, entry: dict[str, Any]) -> ASCIIDungeon:
+        with np.load(Path(directory) / entry["shard"]) as shard:
+            codes = shard[entry["key"]]
+        return ASCIIDungeon.from_codes(codes, entry["glyphs"], entry["name"])
@@ -0,0 +1,200 @@
+from __future__ import annotations
+
+import shutil
+import tempfile
+import weakref
+from collections import OrderedDict
+from pathlib import Path
+from typing import Iterator, Tuple
+
+import numpy as np
+
+# Side of the chunks the array is split into.
+CHUNK_SIZE = (256, 256)
+# Number of chunks kept mapped in memory at once.
+MAX_RESIDENT_CHUNKS = 64
+
+
+class ChunkedArray:
+    """A two dimensional array stored in fixed size chunks, each in its own memory
+    mapped file. Only the recently used chunks stay mapped. Chunks that were never
+    written are not stored at all and read as the fill value.
+
+    Windows given by slices are read into new arrays and written across the
+    chunks. Other keys fall back to reading the whole array.
+
+    Without a path the chunks are stored in a temporary directory, which is
+    removed when the array is closed or garbage collected."""
+
+    ndim = 2
+
+    def __init__(
+        self,
+        shape: Tuple[int, int],
+        dtype,
+        fill_value,
+        path: Path | str = None,
+        chunk_size: Tuple[int, int] = CHUNK_SIZE,
+        max_resident: int = MAX_RESIDENT_CHUNKS,
+    ):
+        if shape[0] <= 0 or shape[1] <= 0:
+            raise ValueError("The size has to be positive.")
+        if chunk_size[0] <= 0 or chunk_size[1] <= 0 or max_resident <= 0:
+            raise ValueError("Chunk size and resident chunks have to be positive.")
+        self._remove_directory = None
+        if path is None:
+            path = tempfile.mkdtemp(prefix="hamingja_chunks_")
+            self._remove_directory = weakref.finalize(
+                self, shutil.rmtree, path, ignore_errors=True
+            )
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.shape = (int(shape[0]), int(shape[1]))
+        self.dtype = np.dtype(dtype)
+        self.fill_value = np.asarray(fill_value, dtype=self.dtype)
+        self.chunk_size = (int(chunk_size[0]), int(chunk_size[1]))
+        self.max_resident = max_resident
+        self._resident: OrderedDict[Tuple[int, int], np.memmap] = OrderedDict()
+
+    def _chunk_path(self, key: Tuple[int, int]) -> Path:
+        return self.path / f"{key[0]}_{key[1]}.chunk"
+
+    def _chunk_shape(self, key: Tuple[int, int]) -> Tuple[int, int]:
+        return (
+            min(self.chunk_size[0], self.shape[0] - key[0] * self.chunk_size[0]),
+            min(self.chunk_size[1], self.shape[1] - key[1] * self.chunk_size[1]),
+        )
+
+    def _chunk(self, key: Tuple[int, int], create: bool) -> np.memmap | None:
+        """Returns the mapped chunk. A chunk that is not stored is created filled
+        with the fill value if asked to, otherwise None is returned."""
+        chunk = self._resident.get(key)
+        if chunk is not None:
+            self._resident.move_to_end(key)
+            return chunk
+        path = self._chunk_path(key)
+        shape = self._chunk_shape(key)
+        if path.exists():
+            chunk = np.memmap(path, dtype=self.dtype, mode="r+", shape=shape)
+        elif create:
+            chunk = np.memmap(path, dtype=self.dtype, mode="w+", shape=shape)
+            chunk[...] = self.fill_value
+        else:
+            return None
+        self._resident[key] = chunk
+        while len(self._resident) > self.max_resident:
+            _, evicted = self._resident.popitem(last=False)
+            evicted.flush()
+        return chunk
+
+    @property
+    def resident_chunks(self) -> list[Tuple[int, int]]:
+        """Keys of the mapped chunks from the least recently used."""
+        return list(self._resident)
+
+    def _window(self, key) -> Tuple[int, int, int, int, tuple] | None:
+        """Returns the bounds of a window given by slices or integers and the
+        indices to drop the integer axes from it. None if the key is not a
+        window."""
+        if key is Ellipsis:
+            key = (slice(None), slice(None))
+        if not isinstance(key, tuple) or len(key) != 2:
+            return None
+        bounds = []
+        squeeze = []
+        for index, length in zip(key, self.shape):
+            if isinstance(index, (int, np.integer)):
+                index = int(index)
+                if index < 0:
+                    index += length
+                if not 0 <= index < length:
+                    raise IndexError("Index out of the array.")
+                bounds += [index, index + 1]
+                squeeze.append(0)
+            elif isinstance(index, slice) and index.step in (None, 1):
+                start, stop, _ = index.indices(length)
+                bounds += [start, max(start, stop)]
+                squeeze.append(slice(None))
+            else:
+                return None
+        return bounds[0], bounds[1], bounds[2], bounds[3], tuple(squeeze)
+
+    def _parts(
+        self, y0: int, y1: int, x0: int, x1: int
+    ) -> Iterator[Tuple[Tuple[int, int], tuple, tuple]]:
+        """Yields the chunks overlapping the window with the overlap in the
+        coordinates of the chunk and of the window."""
+        ch, cw = self.chunk_size
+        for cy in range(y0 // ch, (y1 + ch - 1) // ch):
+            for cx in range(x0 // cw, (x1 + cw - 1) // cw):
+                top, left = max(y0, cy * ch), max(x0, cx * cw)
+                bottom, right = min(y1, (cy + 1) * ch), min(x1, (cx + 1) * cw)
+                yield (
+                    (cy, cx),
+                    (
+                        slice(top - cy * ch, bottom - cy * ch),
+                        slice(left - cx * cw, right - cx * cw),
+                    ),
+                    (slice(top - y0, bottom - y0), slice(left - x0, right - x0)),
+                )
+
+    def read(self, y0: int, y1: int, x0: int, x1: int) -> np.ndarray:
+        """Reads the window into a new array. Only the chunks overlapping the
+        window are mapped."""
+        result = np.empty((y1 - y0, x1 - x0), dtype=self.dtype)
+        for key, in_chunk, in_window in self._parts(y0, y1, x0, x1):
+            chunk = self._chunk(key, create=False)
+            result[in_window] = self.fill_value if chunk is None else chunk[in_chunk]
+        return result
+
+    def write(self, y0: int, y1: int, x0: int, x1: int, value) -> None:
+        """Writes the value broadcast to the window across the chunks."""
+        value = np.broadcast_to(np.asarray(value, dtype=self.dtype), (y1 - y0, x1 - x0))
+        for key, in_chunk, in_window in self._parts(y0, y1, x0, x1):
+            self._chunk(key, create=True)[in_chunk] = value[in_window]
+
+    def __getitem__(self, key) -> np.ndarray:
+        window = self._window(key)
+        if window is None:
+            return np.asarray(self)[key]
+        y0, y1, x0, x1, squeeze = window
+        return self.read(y0, y1, x0, x1)[squeeze]
+
+    def __setitem__(self, key, value) -> None:
+        window = self._window(key)
+        if window is not None:
+            y0, y1, x0, x1, _ = window
+            self.write(y0, y1, x0, x1, value)
+            return
+        if not (isinstance(key, np.ndarray) and key.dtype == bool):
+            raise ValueError("Only windows and boolean masks can be written.")
+        if key.shape != self.shape or np.ndim(value) != 0:
+            raise ValueError("A boolean mask has to cover the array with one value.")
+        parts = self._parts(0, self.shape[0], 0, self.shape[1])
+        for chunk_key, in_chunk, in_window in parts:
+            selected = key[in_window]
+            if selected.any():
+                self._chunk(chunk_key, create=True)[in_chunk][selected] = value
+
+    def __array__(self, dtype=None, copy=None) -> np.ndarray:
+        result = self.read(0, self.shape[0], 0, self.shape[1])
+        return result if dtype is None else result.astype(dtype)
+
+    def flush(self) -> None:
+        """Writes the mapped chunks to their files."""
+        for chunk in self._resident.values():
+            chunk.flush()
+
+    def __enter__(self) -> ChunkedArray:
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Unmaps the chunks after writing them to their files. A temporary
+        directory is removed with the chunks."""
+        self.flush()
+        self._resident.clear()
+        if self._remove_directory is not None:
+            self._remove_directory()
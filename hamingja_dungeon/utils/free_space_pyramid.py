@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+from typing import Tuple
+
+import numpy as np
+
+from hamingja_dungeon.utils.vector import Vector
+
+
+def _shifted(array: np.array, dy: int, dx: int) -> np.array:
+    """Returns the array moved so that the value at (y + dy, x + dx) is at (y, x).
+    Values coming from outside of the array are false."""
+    result = np.zeros_like(array)
+    if dy < array.shape[0] and dx < array.shape[1]:
+        result[0 : array.shape[0] - dy, 0 : array.shape[1] - dx] = array[dy:, dx:]
+    return result
+
+
+def _max_pool(array: np.array) -> np.array:
+    """Returns the maximums of 2x2 blocks. Odd sized arrays are padded by zeros."""
+    h, w = array.shape
+    padded = np.zeros(((h + 1) // 2 * 2, (w + 1) // 2 * 2), dtype=array.dtype)
+    padded[0:h, 0:w] = array
+    return padded.reshape(padded.shape[0] // 2, 2, padded.shape[1] // 2, 2).max(
+        axis=(1, 3)
+    )
+
+
+def square_levels(free: np.array, max_level: int) -> np.array:
+    """Returns for each coordinate the level of the largest free square with the top
+    left corner at the coordinate. Level n means a square of side 2 ** (n - 1) is
+    free, zero means the coordinate itself is not free. Levels are capped by
+    max_level and the space outside the array is not free."""
+    result = np.zeros(free.shape, dtype=np.int8)
+    squares = np.array(free, dtype=bool)
+    side = 1
+    for _ in range(max_level):
+        if not squares.any():
+            break
+        result += squares
+        # A square of double side is made of four squares of the current side.
+        squares = (
+            squares
+            & _shifted(squares, side, 0)
+            & _shifted(squares, 0, side)
+            & _shifted(squares, side, side)
+        )
+        side *= 2
+    return result
+
+
+def square_level(side: int) -> int:
+    """Returns the level of the largest power of two square inside a square of the
+    given side."""
+    return max(int(side), 0).bit_length()
+
+
+class FreeSpacePyramid:
+    """Max-pool pyramid over the square levels of a free space. Answers whether a
+    free square of a given side exists in the whole space or in a window by reading
+    a few cells of a coarse level, so impossible fits can be rejected before any
+    morphology runs."""
+
+    def __init__(self, free: np.array, max_level: int):
+        self.max_level = max_level
+        self.levels = [square_levels(free, max_level)]
+        while max(self.levels[-1].shape) > 1:
+            self.levels.append(_max_pool(self.levels[-1]))
+
+    @property
+    def reach(self) -> int:
+        """The side of the largest tracked square."""
+        return 2 ** (self.max_level - 1)
+
+    def update(self, origin: Vector, size: Tuple[int, int], free: np.array) -> None:
+        """Recomputes the window given by the origin and size. The free space has to
+        start at the origin and reach reach - 1 past the window or up to the end of
+        the space."""
+        y0, x0 = origin.y, origin.x
+        y1, x1 = y0 + size[0], x0 + size[1]
+        self.levels[0][y0:y1, x0:x1] = square_levels(free, self.max_level)[
+            0 : size[0], 0 : size[1]
+        ]
+        for k in range(1, len(self.levels)):
+            y0, x0, y1, x1 = y0 // 2, x0 // 2, (y1 + 1) // 2, (x1 + 1) // 2
+            self.levels[k][y0:y1, x0:x1] = _max_pool(
+                self.levels[k - 1][2 * y0 : 2 * y1, 2 * x0 : 2 * x1]
+            )
+
+    def largest_level(self, origin: Vector = None, size: Tuple[int, int] = None) -> int:
+        """Returns the level of the largest free square in the whole space or with
+        the top left corner in the given window. The window is rounded outwards to
+        the cells of a coarse level so the result can be an overestimate, never an
+        underestimate."""
+        if origin is None:
+            return int(self.levels[-1][0, 0])
+        base = self.levels[0]
+        y0, x0 = max(origin.y, 0), max(origin.x, 0)
+        y1 = min(origin.y + size[0], base.shape[0])
+        x1 = min(origin.x + size[1], base.shape[1])
+        if y0 >= y1 or x0 >= x1:
+            return 0
+        k = min(int(min(y1 - y0, x1 - x0)).bit_length() - 1, len(self.levels) - 1)
+        return int(
+            self.levels[k][y0 >> k : ((y1 - 1) >> k) + 1, x0 >> k : ((x1 - 1) >> k) + 1]
+            .max()
+        )
+
+    def has_free_square(
+        self, side: int, origin: Vector = None, size: Tuple[int, int] = None
+    ) -> bool:
+        """Checks whether a free square of the given side might exist in the whole
+        space or with the top left corner in the given window. False means it surely
+        does not."""
+        needed = min(square_level(side), self.max_level)
+        return needed == 0 or self.largest_level(origin, size) >= needed
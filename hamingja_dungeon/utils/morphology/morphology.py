@@ -1,31 +1,87 @@
-from copy import deepcopy
-
 import numpy as np
-from scipy.ndimage import binary_hit_or_miss
+from scipy.ndimage import binary_dilation, binary_erosion, binary_hit_or_miss
 
+from hamingja_dungeon.utils.morphology.scratch import scratch_pool
 from hamingja_dungeon.utils.morphology.structure_elements.structure_elements import ENDPOINTS
 
 
+def _output(array: np.array, output: np.array) -> np.array:
+    if output is None:
+        return scratch_pool().allocate(array.shape)
+    return output
+
+
+def erosion(
+    array: np.array,
+    structure: np.array,
+    origin=0,
+    iterations: int = 1,
+    output: np.array = None,
+) -> np.array:
+    """Binary erosion written into the output. A new array is allocated if no
+    output is given."""
+    output = _output(array, output)
+    binary_erosion(
+        array, structure=structure, origin=origin, iterations=iterations, output=output
+    )
+    return output
+
+
+def dilation(
+    array: np.array, structure: np.array, origin=0, output: np.array = None
+) -> np.array:
+    """Binary dilation written into the output. A new array is allocated if no
+    output is given."""
+    output = _output(array, output)
+    binary_dilation(array, structure=structure, origin=origin, output=output)
+    return output
+
+
+def hit_or_miss(
+    array: np.array,
+    structure1: np.array,
+    structure2: np.array = None,
+    origin1=0,
+    output: np.array = None,
+) -> np.array:
+    """Binary hit or miss written into the output. A new array is allocated if no
+    output is given."""
+    output = _output(array, output)
+    binary_hit_or_miss(
+        array,
+        structure1=structure1,
+        structure2=structure2,
+        origin1=origin1,
+        output=output,
+    )
+    return output
+
+
 def prune(array: np.array, iterations: int = 1) -> np.array:
     """Removes endpoints from an array."""
     if iterations < 0:
         raise ValueError("Iteration cannot be negative.")
 
-    result = deepcopy(array)
-    for _ in range(iterations):
-        endpoints = get_endpoints(result)
-        result ^= endpoints
+    result = np.array(array, dtype=bool)
+    with scratch_pool().borrow(result.shape) as endpoints:
+        for _ in range(iterations):
+            get_endpoints(result, output=endpoints)
+            result ^= endpoints
     return result
 
 
-def get_endpoints(array: np.array) -> np.array:
+def get_endpoints(array: np.array, output: np.array = None) -> np.array:
     """Returns all endpoints of an array"""
-    result = np.zeros(array.shape).astype(bool)
-    for structure in ENDPOINTS.values():
-        result = result | binary_hit_or_miss(
-            array,
-            structure1=structure.fg,
-            structure2=structure.bg,
-            origin1=structure.origin,
-        )
+    result = _output(array, output)
+    result.fill(False)
+    with scratch_pool().borrow(array.shape) as endpoints:
+        for structure in ENDPOINTS.values():
+            hit_or_miss(
+                array,
+                structure1=structure.fg,
+                structure2=structure.bg,
+                origin1=structure.origin,
+                output=endpoints,
+            )
+            result |= endpoints
     return result
@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Iterator, Tuple
+
+import numpy as np
+
+# Number of different shapes and dtypes a pool keeps buffers for.
+SCRATCH_POOL_KEYS = 32
+# Number of free buffers kept for a single shape and dtype.
+SCRATCH_BUFFERS_PER_KEY = 4
+
+
+@dataclass
+class AllocationCounter:
+    """Counts the arrays given out for morphology results and temporaries."""
+
+    allocated_bytes: int = 0
+    allocations: int = 0
+    reused_bytes: int = 0
+    reuses: int = 0
+
+    def add(self, other: AllocationCounter) -> None:
+        self.allocated_bytes += other.allocated_bytes
+        self.allocations += other.allocations
+        self.reused_bytes += other.reused_bytes
+        self.reuses += other.reuses
+
+
+class ScratchPool:
+    """Free arrays for temporaries of a single thread, keyed by their shape and
+    dtype. Buffers are returned dirty, the user has to overwrite them."""
+
+    def __init__(self):
+        self._free: OrderedDict[tuple, list[np.ndarray]] = OrderedDict()
+        self.counters: list[AllocationCounter] = []
+
+    def _record(self, nbytes: int, reused: bool) -> None:
+        for counter in self.counters:
+            if reused:
+                counter.reused_bytes += nbytes
+                counter.reuses += 1
+            else:
+                counter.allocated_bytes += nbytes
+                counter.allocations += 1
+
+    def merge(self, counter: AllocationCounter) -> None:
+        """Adds the counts made in another thread to the active counters."""
+        for active in self.counters:
+            active.add(counter)
+
+    def allocate(self, shape: Tuple[int, ...], dtype=bool) -> np.ndarray:
+        """Allocates a new array that is not returned to the pool."""
+        result = np.empty(shape, dtype=dtype)
+        self._record(result.nbytes, reused=False)
+        return result
+
+    def take(self, shape: Tuple[int, ...], dtype=bool) -> np.ndarray:
+        """Returns a free buffer of the given shape and dtype."""
+        key = (tuple(shape), np.dtype(dtype))
+        free = self._free.get(key)
+        if not free:
+            return self.allocate(shape, dtype)
+        self._free.move_to_end(key)
+        result = free.pop()
+        self._record(result.nbytes, reused=True)
+        return result
+
+    def give(self, array: np.ndarray) -> None:
+        """Returns a buffer to the pool. It must not be used afterwards."""
+        key = (array.shape, array.dtype)
+        free = self._free.setdefault(key, [])
+        self._free.move_to_end(key)
+        if len(free) < SCRATCH_BUFFERS_PER_KEY:
+            free.append(array)
+        if len(self._free) > SCRATCH_POOL_KEYS:
+            self._free.popitem(last=False)
+
+    @contextmanager
+    def borrow(self, shape: Tuple[int, ...], dtype=bool) -> Iterator[np.ndarray]:
+        """Lends a buffer for the duration of the block."""
+        buffer = self.take(shape, dtype)
+        try:
+            yield buffer
+        finally:
+            self.give(buffer)
+
+
+_local = threading.local()
+
+
+def scratch_pool() -> ScratchPool:
+    """Returns the pool of the current thread."""
+    pool = getattr(_local, "pool", None)
+    if pool is None:
+        pool = ScratchPool()
+        _local.pool = pool
+    return pool
+
+
+@contextmanager
+def count_allocations() -> Iterator[AllocationCounter]:
+    """Counts the buffers given out by the pool of the current thread inside the
+    block."""
+    pool = scratch_pool()
+    counter = AllocationCounter()
+    pool.counters.append(counter)
+    try:
+        yield counter
+    finally:
+        pool.counters.remove(counter)
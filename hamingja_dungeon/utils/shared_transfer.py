@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import pickle
+import sys
+from dataclasses import dataclass
+from multiprocessing import resource_tracker, shared_memory
+from typing import Any, Tuple
+
+# Buffers smaller than this number of bytes stay in the pickled metadata.
+SHARED_BUFFER_THRESHOLD = 256
+# Alignment of the buffers in the shared memory block.
+SHARED_BUFFER_ALIGNMENT = 64
+# Arguments keeping the blocks out of the resource tracker, possible since
+# Python 3.13.
+UNTRACKED = {"track": False} if sys.version_info >= (3, 13) else {}
+
+
+def _untrack(block: shared_memory.SharedMemory) -> None:
+    """Keeps the resource tracker of this process from unlinking the block when
+    the process exits, another process frees it. Before Python 3.13 every new
+    block is tracked by its creator (CPython gh-82300, formerly bpo-38119)."""
+    if not UNTRACKED:
+        resource_tracker.unregister(block._name, "shared_memory")
+
+
+@dataclass
+class SharedPayload:
+    """An object split into a shared memory block holding the data of its large
+    arrays and a small pickled metadata blob describing the rest. Only the
+    payload itself is pickled when it is returned from a worker process. The
+    data is still copied once more when the payload is loaded.
+
+    The block is freed when the payload is loaded, so it has to be loaded
+    exactly once or released when it is not needed."""
+
+    name: str | None
+    # Start and end of each buffer in the block.
+    buffers: list[Tuple[int, int]]
+    metadata: bytes
+
+    @property
+    def shared_bytes(self) -> int:
+        return self.buffers[-1][1] if self.buffers else 0
+
+    def load(self) -> Any:
+        """Rebuilds the object and frees the shared memory block. The buffers are
+        copied out of the block, so loading makes one more full copy of the array
+        data in this process."""
+        if self.name is None:
+            return pickle.loads(self.metadata)
+        block = shared_memory.SharedMemory(name=self.name, **UNTRACKED)
+        try:
+            # Copied out, the block cannot be closed while its memory is used.
+            buffers = [bytearray(block.buf[start:end]) for start, end in self.buffers]
+        finally:
+            block.close()
+            block.unlink()
+        return pickle.loads(self.metadata, buffers=buffers)
+
+    def release(self) -> None:
+        """Frees the shared memory block without loading the object. Does nothing
+        if the block is already freed."""
+        if self.name is None:
+            return
+        try:
+            block = shared_memory.SharedMemory(name=self.name, **UNTRACKED)
+        except FileNotFoundError:
+            return
+        block.close()
+        block.unlink()
+
+
+def share(obj: Any) -> SharedPayload:
+    """Moves the data of the large arrays of the object into a new shared memory
+    block, using the out-of-band buffers of the pickle protocol 5. The rest of the
+    object is pickled as usual."""
+    buffers: list[pickle.PickleBuffer] = []
+
+    def out_of_band(buffer: pickle.PickleBuffer) -> bool:
+        if buffer.raw().nbytes < SHARED_BUFFER_THRESHOLD:
+            return True
+        buffers.append(buffer)
+        return False
+
+    metadata = pickle.dumps(obj, protocol=5, buffer_callback=out_of_band)
+    if not buffers:
+        return SharedPayload(None, [], metadata)
+    bounds = []
+    offset = 0
+    for buffer in buffers:
+        end = offset + buffer.raw().nbytes
+        bounds.append((offset, end))
+        offset = -(-end // SHARED_BUFFER_ALIGNMENT) * SHARED_BUFFER_ALIGNMENT
+    block = shared_memory.SharedMemory(create=True, size=offset, **UNTRACKED)
+    try:
+        for buffer, (start, end) in zip(buffers, bounds):
+            block.buf[start:end] = buffer.raw()
+    except BaseException:
+        block.close()
+        block.unlink()
+        raise
+    block.close()
+    # The process loading the payload frees the block.
+    _untrack(block)
+    return SharedPayload(block.name, bounds, metadata)
@@ -1,7 +1,10 @@
+import hashlib
+
 import numpy as np
 from scipy.ndimage import distance_transform_edt
 
 from hamingja_dungeon.utils.morphology.morphology import prune
+from hamingja_dungeon.utils.vector import Vector
 
 
 def tighten(array: np.array) -> np.array:
@@ -25,3 +28,19 @@ def circle_mask(dim: int) -> np.array:
     circle = distance_map < circle_dim // 2
     circle = prune(circle)
     return circle[1:-1, 1:-1]
+
+
+def add_at_mask(counts: np.array, origin: Vector, mask: np.array, step: int) -> None:
+    """Adds the step to the counts at the true values of the mask placed at the
+    given origin. The mask is cropped if it protrudes outside of the counts."""
+    afflicted_area = counts[
+        origin.y : origin.y + mask.shape[0], origin.x : origin.x + mask.shape[1]
+    ]
+    cropped_mask = mask[0 : afflicted_area.shape[0], 0 : afflicted_area.shape[1]]
+    afflicted_area[cropped_mask] += step
+
+
+def derive_seed(*parts) -> int:
+    """Returns a seed determined by the given parts, stable across runs."""
+    digest = hashlib.blake2b(repr(parts).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
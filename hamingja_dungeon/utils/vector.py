@@ -1,60 +1,150 @@
 from __future__ import annotations
 
-from typing import Tuple
+from typing import Iterable, Iterator, Tuple
+
+import numpy as np
+
+NEIGHBOUR_OFFSETS = (
+    (-1, -1),
+    (-1, 0),
+    (-1, 1),
+    (0, -1),
+    (0, 1),
+    (1, -1),
+    (1, 0),
+    (1, 1),
+)
 
 
 class Vector:
+    """An immutable two dimensional integer vector in the (y, x) order."""
+
+    __slots__ = ("y", "x")
+
     def __init__(self, y: int, x: int):
-        self.y = y
-        self.x = x
+        object.__setattr__(self, "y", int(y))
+        object.__setattr__(self, "x", int(x))
 
-    def __eq__(self, other: Vector) -> bool:
+    def __setattr__(self, name, value):
+        raise AttributeError("Vector is immutable.")
+
+    def __delattr__(self, name):
+        raise AttributeError("Vector is immutable.")
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Vector):
+            return NotImplemented
         return self.x == other.x and self.y == other.y
 
+    def __hash__(self) -> int:
+        return hash((self.y, self.x))
+
     def __add__(self, other: Vector) -> Vector:
         return Vector(self.y + other.y, self.x + other.x)
 
-    def __iadd__(self, other: Vector) -> Vector:
-        self.y += other.y
-        self.x += other.x
-        return self
-
     def __sub__(self, other: Vector) -> Vector:
         return Vector(self.y - other.y, self.x - other.x)
 
-    def __isub__(self, other: Vector) -> Vector:
-        self.y -= other.y
-        self.x -= other.x
-        return self
-
     def __mul__(self, other: int) -> Vector:
         return Vector(other * self.y, other * self.x)
 
     def __rmul__(self, other: int) -> Vector:
         return self * other
 
-    def __imul__(self, other: int) -> Vector:
-        self.y *= other
-        self.x *= other
-        return self
-
     def __str__(self):
         return f"({self.y}, {self.x})"
 
+    def __repr__(self):
+        return f"Vector({self.y}, {self.x})"
+
     def __iter__(self):
         return iter((self.y, self.x))
 
+    def __reduce__(self):
+        return Vector, (self.y, self.x)
+
     def is_positive(self) -> bool:
         return self.x >= 0 and self.y >= 0
 
     def neighbours(self) -> list[Vector]:
-        result = []
-        for y in range(-1, 2):
-            for x in range(-1, 2):
-                result.append(Vector(self.y + y, self.x + x))
-        result.remove(self)
-        return result
+        return [Vector(self.y + y, self.x + x) for y, x in NEIGHBOUR_OFFSETS]
 
     @staticmethod
     def from_tuple(tup: Tuple[int, int]) -> Vector:
         return Vector(*tup)
+
+
+class VectorArray:
+    """A batch of vectors backed by an integer array of the shape (N, 2) in the
+    (y, x) order. Indexing by an integer returns a Vector."""
+
+    __slots__ = ("array",)
+
+    def __init__(self, array: np.ndarray):
+        self.array = np.asarray(array, dtype=np.int64).reshape(-1, 2)
+
+    @staticmethod
+    def from_vectors(vectors: Iterable[Vector]) -> VectorArray:
+        return VectorArray(np.array([tuple(vector) for vector in vectors]))
+
+    @property
+    def ys(self) -> np.ndarray:
+        return self.array[:, 0]
+
+    @property
+    def xs(self) -> np.ndarray:
+        return self.array[:, 1]
+
+    def __len__(self) -> int:
+        return self.array.shape[0]
+
+    def __iter__(self) -> Iterator[Vector]:
+        for y, x in self.array.tolist():
+            yield Vector(y, x)
+
+    def __getitem__(self, index) -> Vector | VectorArray:
+        if isinstance(index, (int, np.integer)):
+            y, x = self.array[index]
+            return Vector(y, x)
+        return VectorArray(self.array[index])
+
+    def __contains__(self, vector: Vector) -> bool:
+        return bool(np.any((self.ys == vector.y) & (self.xs == vector.x)))
+
+    def __add__(self, other: Vector | VectorArray) -> VectorArray:
+        if isinstance(other, Vector):
+            return VectorArray(self.array + (other.y, other.x))
+        return VectorArray(self.array + other.array)
+
+    def __sub__(self, other: Vector | VectorArray) -> VectorArray:
+        if isinstance(other, Vector):
+            return VectorArray(self.array - (other.y, other.x))
+        return VectorArray(self.array - other.array)
+
+    def __str__(self):
+        return str(self.array.tolist())
+
+    def min(self) -> Vector:
+        """Returns the top left corner of the bounding box of the vectors."""
+        y, x = self.array.min(axis=0)
+        return Vector(y, x)
+
+    def max(self) -> Vector:
+        """Returns the bottom right corner (inclusive) of the bounding box of the
+        vectors."""
+        y, x = self.array.max(axis=0)
+        return Vector(y, x)
+
+    def neighbours(self) -> VectorArray:
+        """Returns the eight neighbours of every vector. The neighbours of the
+        vector i are at the indices 8 * i to 8 * i + 7."""
+        return VectorArray(
+            (self.array[:, np.newaxis, :] + np.array(NEIGHBOUR_OFFSETS)).reshape(-1, 2)
+        )
+
+    def in_bounds(self, size: Tuple[int, int]) -> np.ndarray:
+        """Returns a boolean array telling which vectors lie inside an area of the
+        given size."""
+        return (
+            (self.ys >= 0) & (self.ys < size[0]) & (self.xs >= 0) & (self.xs < size[1])
+        )
@@ -0,0 +1,97 @@
+import asyncio
+from concurrent.futures import Executor, Future
+from unittest import TestCase
+
+from hamingja_dungeon.dungeon_designers.config.dungeon_area_config import (
+    DungeonAreaConfig,
+)
+from hamingja_dungeon.utils.ascii_dungeon_generator.async_dungeon_service import (
+    AsyncDungeonService,
+)
+from hamingja_dungeon.utils.ascii_dungeon_generator.config.ascii_dungeon_config import (
+    ASCIIDungeonConfig,
+)
+from hamingja_dungeon.utils.ascii_dungeon_generator.dungeon_cache import config_key
+
+
+def get_config(**fields) -> ASCIIDungeonConfig:
+    return ASCIIDungeonConfig(
+        **fields,
+        dungeon_area=DungeonAreaConfig(
+            size=(30, 40),
+            room_size_method="range",
+            range_room_size=(3, 10, 3, 10),
+            fullness=0.6,
+        )
+    )
+
+
+class StalledExecutor(Executor):
+    """Never runs the submitted calls."""
+
+    def submit(self, fn, *args, **kwargs) -> Future:
+        return Future()
+
+
+class TestAsyncDungeonService(TestCase):
+    def test_seeded(self):
+        async def run():
+            async with AsyncDungeonService(prefetch=0, workers=2) as service:
+                return await asyncio.gather(
+                    service.get(get_config(), seed=7),
+                    service.get(get_config(), seed=7),
+                )
+
+        first, second = asyncio.run(run())
+        print(first)
+        assert first.content == second.content
+        assert first.name == second.name
+
+    def test_prefetch(self):
+        config = get_config()
+        key = config_key(config)
+
+        async def run():
+            async with AsyncDungeonService(prefetch=2, workers=2, seed=0) as service:
+                dungeon = await service.get(config)
+                while service.metrics().queue_depths[key] < 2:
+                    await asyncio.sleep(0.01)
+                await service.get(config)
+                return dungeon, service.metrics()
+
+        dungeon, metrics = asyncio.run(run())
+        print(metrics)
+        assert len(dungeon.content) > 0
+        assert metrics.requests == 2
+        assert metrics.prefetch_hits == 1
+        assert metrics.queue_depths[key] + metrics.in_flight[key] <= 2
+        assert metrics.get_latency.count == 2
+        assert metrics.generation_latency.count >= 3
+
+    def test_shared_queue(self):
+        first_config = get_config(base_name="first")
+        second_config = get_config(base_name="second")
+
+        async def run():
+            async with AsyncDungeonService(prefetch=1, workers=1, seed=0) as service:
+                first = await service.get(first_config)
+                second = await service.get(second_config)
+                return first, second, service.metrics()
+
+        first, second, metrics = asyncio.run(run())
+        assert len(metrics.queue_depths) == 1
+        assert first.name.startswith("first_")
+        assert second.name.startswith("second_")
+
+    def test_close_wakes_waiting_requests(self):
+        async def run():
+            service = AsyncDungeonService(prefetch=2, executor=StalledExecutor())
+            waiting = [asyncio.create_task(service.get(get_config())) for _ in range(2)]
+            await asyncio.sleep(0.01)
+            await service.close()
+            return await asyncio.wait_for(
+                asyncio.gather(*waiting, return_exceptions=True), timeout=5
+            )
+
+        results = asyncio.run(run())
+        assert all(isinstance(result, ValueError) for result in results)
@@ -0,0 +1,69 @@
+import os
+import tempfile
+from unittest import TestCase
+
+import numpy as np
+
+from hamingja_dungeon.dungeon_elements.area import Area
+from hamingja_dungeon.dungeon_elements.chunked_area import ChunkedArea, ChunkedMask
+from hamingja_dungeon.dungeon_elements.mask import Mask
+from hamingja_dungeon.dungeon_elements.room import Room
+from hamingja_dungeon.utils.vector import Vector
+
+
+class TestChunkedArea(TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.chunked = ChunkedArea(
+            (13, 17), path=self.path, chunk_size=(4, 5), max_resident_chunks=2
+        )
+        self.area = Area((13, 17))
+        for area in [self.chunked, self.area]:
+            area.remove_shape(Vector(2, 3), Mask((6, 9)))
+            area.insert_shape(Vector(3, 4), Mask((2, 2)))
+            area.draw_area(Vector(6, 8), Room((5, 7)))
+
+    def test_across_chunks(self):
+        assert np.array_equal(np.asarray(self.chunked.array), self.area.array)
+        assert np.array_equal(np.asarray(self.chunked.tiles), self.area.tiles)
+        assert len(self.chunked.array.resident_chunks) <= 2
+
+    def test_fit_in(self):
+        to_fit = Mask.from_array(np.array([[1, 1, 0], [1, 1, 1]], dtype=bool))
+        expected = self.area.fit_in(to_fit).array
+        with self.chunked.fit_in(to_fit) as fit:
+            assert isinstance(fit, ChunkedMask)
+            assert np.array_equal(np.asarray(fit.array), expected)
+            assert len(fit.array.resident_chunks) <= 2
+        window = self.chunked.fit_in_window(to_fit, Vector(5, 6), (4, 20))
+        assert window.origin == Vector(5, 6)
+        assert np.array_equal(window.object.array, expected[5:9, 6:17])
+
+    def test_fit_in_stores_only_fitting_chunks(self):
+        with ChunkedMask((12, 12), fill=False, chunk_size=(4, 4)) as mask:
+            mask.insert_shape(Vector(0, 0), Mask((3, 3)))
+            with mask.fit_in(Mask((2, 2))) as fit:
+                assert np.array_equal(
+                    np.argwhere(np.asarray(fit.array)), [[0, 0], [0, 1], [1, 0], [1, 1]]
+                )
+                assert len(list(fit.array.path.iterdir())) == 1
+
+    def test_reopen(self):
+        self.chunked.flush()
+        reopened = ChunkedArea((13, 17), path=self.path, chunk_size=(4, 5))
+        assert np.array_equal(np.asarray(reopened.tiles), self.area.tiles)
+
+    def test_temporary_directories(self):
+        with ChunkedArea((10, 10), chunk_size=(4, 4)) as chunked:
+            chunked.remove_shape(Vector(1, 1), Mask((5, 5)))
+            paths = [chunked.array.path, chunked.tiles.path]
+            assert all(path.exists() for path in paths)
+        assert not any(path.exists() for path in paths)
+
+        chunked = ChunkedArea((10, 10), chunk_size=(4, 4))
+        path = chunked.array.path
+        del chunked
+        assert not path.exists()
+
+        self.chunked.close()
+        assert os.path.exists(self.path)
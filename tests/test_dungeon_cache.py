@@ -0,0 +1,99 @@
+import tempfile
+from unittest import TestCase
+
+from hamingja_dungeon.dungeon_designers.config.dungeon_area_config import (
+    DungeonAreaConfig,
+)
+from hamingja_dungeon.utils.ascii_dungeon_generator.ascii_dungeon_generator import (
+    ASCIIDungeonGenerator,
+)
+from hamingja_dungeon.utils.ascii_dungeon_generator.config.ascii_dungeon_config import (
+    ASCIIDungeonConfig,
+)
+from hamingja_dungeon.utils.ascii_dungeon_generator.dungeon_cache import (
+    DungeonCache,
+    dungeon_key,
+    is_cacheable,
+)
+
+
+def get_config(fullness: float = 0.6, **fields) -> ASCIIDungeonConfig:
+    return ASCIIDungeonConfig(
+        dungeon_area=DungeonAreaConfig(
+            size=(30, 40),
+            room_size_method="range",
+            range_room_size=(3, 10, 3, 10),
+            fullness=fullness,
+            **fields,
+        )
+    )
+
+
+class TestDungeonCache(TestCase):
+    def test_key(self):
+        config = get_config()
+        same = ASCIIDungeonConfig(
+            dungeon_area=DungeonAreaConfig(
+                fullness=0.6,
+                range_room_size=(3, 10, 3, 10),
+                room_size_method="range",
+                size=(30, 40),
+            ),
+        )
+        assert dungeon_key(config, 1) == dungeon_key(same, 1)
+        assert dungeon_key(config, 1) != dungeon_key(config, 2)
+        assert dungeon_key(config, 1) != dungeon_key(get_config(fullness=0.5), 1)
+        renamed = config.model_copy(update={"base_name": "other"})
+        assert dungeon_key(config, 1) == dungeon_key(renamed, 1)
+        unused = get_config(fixed_room_size=(5, 5))
+        assert dungeon_key(config, 1) == dungeon_key(unused, 1)
+        assert dungeon_key(config, 1) == dungeon_key(config.dungeon_area, 1)
+
+    def test_time_budget_is_not_cached(self):
+        config = get_config(time_budget=10.0)
+        assert is_cacheable(get_config())
+        assert not is_cacheable(config)
+        with tempfile.TemporaryDirectory() as directory:
+            cache = DungeonCache(directory)
+            ASCIIDungeonGenerator(config, cache=cache).generate(seed=3)
+            assert len(cache) == 0
+
+    def test_shared_directory(self):
+        with tempfile.TemporaryDirectory() as directory:
+            first = DungeonCache(directory, max_bytes=25)
+            second = DungeonCache(directory, max_bytes=25)
+            first.put("a", "#" * 10)
+            second.put("b", "#" * 10)
+            first.put("c", "#" * 10)
+            assert len(second) == 2
+            assert first.size == 20
+            assert "a" not in second
+
+    def test_eviction(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cache = DungeonCache(directory, max_bytes=25)
+            cache.put("a", "#" * 10)
+            cache.put("b", "#" * 10)
+            assert cache.get("a") == "#" * 10
+            cache.put("c", "#" * 10)
+            assert "a" in cache and "c" in cache
+            assert "b" not in cache
+            assert cache.get("b") is None
+            assert cache.size == 20
+
+            reopened = DungeonCache(directory, max_bytes=25)
+            assert len(reopened) == 2
+            assert reopened.size == 20
+
+    def test_generator(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cache = DungeonCache(directory)
+            generator = ASCIIDungeonGenerator(get_config(), cache=cache)
+            first = generator.generate(seed=3)
+            print(first)
+            assert len(cache) == 1
+            second = generator.generate(seed=3)
+            assert first.content == second.content
+            assert len(cache) == 1
+            uncached = ASCIIDungeonGenerator(get_config()).generate(seed=3)
+            assert uncached.content == first.content
@@ -0,0 +1,111 @@
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+
+import numpy as np
+
+from hamingja_dungeon.dungeon_designers.config.dungeon_area_config import (
+    DungeonAreaConfig,
+)
+from hamingja_dungeon.utils.ascii_dungeon_generator.ascii_dungeon import ASCIIDungeon
+from hamingja_dungeon.utils.ascii_dungeon_generator.ascii_dungeon_generator import (
+    generate_batch,
+    generate_dungeon,
+)
+from hamingja_dungeon.utils.ascii_dungeon_generator.config.ascii_dungeon_config import (
+    ASCIIDungeonConfig,
+)
+from hamingja_dungeon.utils.ascii_dungeon_generator.dungeon_sinks import (
+    DungeonSink,
+    JsonlSink,
+    NpzSink,
+    TarSink,
+)
+
+
+def get_config() -> ASCIIDungeonConfig:
+    return ASCIIDungeonConfig(
+        dungeon_area=DungeonAreaConfig(
+            size=(20, 30),
+            room_size_method="range",
+            range_room_size=(3, 8, 3, 8),
+            fullness=0.5,
+        )
+    )
+
+
+class TestDungeonSinks(TestCase):
+    def test_array(self):
+        dungeon = generate_dungeon(get_config(), 1)
+        array = dungeon.to_array()
+        print(array.shape)
+        assert array.shape == (20, 30)
+        assert ASCIIDungeon.from_array(array).content == dungeon.content
+        codes, glyphs = dungeon.to_codes()
+        assert codes.dtype == np.uint8 and codes.shape == (20, 30)
+        assert ASCIIDungeon.from_codes(codes, glyphs).content == dungeon.content
+
+    def test_sinks(self):
+        dungeons = [generate_dungeon(get_config(), seed) for seed in range(5)]
+        for sink_type in (TarSink, JsonlSink, NpzSink):
+            with tempfile.TemporaryDirectory() as directory:
+                with sink_type(directory, shard_size=2, queue_size=1) as sink:
+                    for i, dungeon in enumerate(dungeons):
+                        sink.write(dungeon, {"seed": i})
+                    sink.flush()
+                    index = DungeonSink.read_index(directory)
+                    assert len(index) == 5
+                    for entry in index:
+                        assert (Path(directory) / entry["shard"]).exists()
+                index = DungeonSink.read_index(directory)
+                print(sink_type.__name__, index[-1])
+                assert len({entry["shard"] for entry in index}) == 3
+                for i, (entry, dungeon) in enumerate(zip(index, dungeons)):
+                    assert entry["metadata"] == {"seed": i}
+                    read = sink_type.read(directory, entry)
+                    assert read.name == dungeon.name
+                    assert read.content == dungeon.content
+
+    def test_batch(self):
+        config = get_config()
+        with tempfile.TemporaryDirectory() as directory:
+            with TarSink(directory) as sink:
+                sink.write_all(generate_batch(config, [3, 4, 5], workers=2))
+            index = DungeonSink.read_index(directory)
+            for entry, seed in zip(index, [3, 4, 5]):
+                expected = generate_dungeon(config, seed)
+                assert TarSink.read(directory, entry).content == expected.content
+
+    def test_existing_index(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with JsonlSink(directory) as sink:
+                sink.write(ASCIIDungeon("#"))
+            with self.assertRaises(ValueError):
+                JsonlSink(directory)
+            with JsonlSink(directory, prefix="more") as sink:
+                sink.write(ASCIIDungeon("."))
+            assert len(DungeonSink.read_index(directory)) == 1
+        with self.assertRaises(TypeError):
+            DungeonSink(directory)
+
+    def test_npz_flush(self):
+        dungeons = [ASCIIDungeon("#.", "first"), ASCIIDungeon("+#", "second")]
+        with tempfile.TemporaryDirectory() as directory:
+            with NpzSink(directory, shard_size=5) as sink:
+                sink.write(dungeons[0])
+                sink.flush()
+                sink.write(dungeons[1])
+            index = DungeonSink.read_index(directory)
+            assert [entry["shard"] for entry in index] == [
+                "dungeons-00000.npz",
+                "dungeons-00001.npz",
+            ]
+            for entry, dungeon in zip(index, dungeons):
+                assert NpzSink.read(directory, entry).content == dungeon.content
+
+    def test_closed(self):
+        with tempfile.TemporaryDirectory() as directory:
+            sink = JsonlSink(directory)
+            sink.close()
+            with self.assertRaises(ValueError):
+                sink.write(ASCIIDungeon("#"))
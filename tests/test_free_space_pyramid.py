@@ -0,0 +1,35 @@
+from unittest import TestCase
+
+import numpy as np
+
+from hamingja_dungeon.dungeon_elements.room import Room
+from hamingja_dungeon.utils.free_space_pyramid import FreeSpacePyramid, square_levels
+from hamingja_dungeon.utils.vector import Vector
+from test_utils import get_test_sector
+
+
+class TestFreeSpacePyramid(TestCase):
+    def test_square_levels(self):
+        free = np.ones((5, 6), dtype=bool)
+        free[2, 3] = False
+        levels = square_levels(free, 4)
+        print(levels)
+        assert levels[0, 0] == 2
+        assert levels[2, 3] == 0
+        assert levels[3, 0] == 2
+        assert levels[4, 5] == 1
+
+    def test_has_free_square(self):
+        free = np.zeros((16, 16), dtype=bool)
+        free[10:14, 2:6] = True
+        pyramid = FreeSpacePyramid(free, 4)
+        assert pyramid.has_free_square(4)
+        assert not pyramid.has_free_square(8)
+        assert pyramid.has_free_square(4, Vector(8, 0), (4, 4))
+        assert not pyramid.has_free_square(2, Vector(0, 8), (8, 8))
+
+    def test_room_may_fit(self):
+        sector = get_test_sector()
+        rid = sector.add_room(Vector(1, 1), Room((11, 15)))
+        assert sector.room_may_fit(Room((3, 3)))
+        assert not sector.room_may_fit(Room((8, 8)), rid)
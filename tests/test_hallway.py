@@ -22,7 +22,9 @@ class TestHallway(TestCase):
         sector.make_entrance(rid1, rid3)
         print_sector(sector)
         assert hallway.has_dead_end()
+        assert len(hallway.dead_ends()) == 1
         print_sector(sector)
 
         sector.make_entrance(rid2, rid3)
         assert not hallway.has_dead_end()
+        assert len(hallway.dead_ends()) == 0
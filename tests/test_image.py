@@ -0,0 +1,98 @@
+import struct
+import tempfile
+import time
+import zlib
+from pathlib import Path
+from unittest import TestCase
+
+import numpy as np
+
+from hamingja_dungeon.dungeon_designers.config.dungeon_area_config import (
+    DungeonAreaConfig,
+)
+from hamingja_dungeon.dungeon_designers.prototype_designer import PrototypeDesigner
+from hamingja_dungeon.dungeon_elements.room import Room
+from hamingja_dungeon.dungeon_elements.sector import Sector
+from hamingja_dungeon.tile_types import bg, floor, wall
+from hamingja_dungeon.utils.ascii_dungeon_generator.dungeon_renderer.image import (
+    drawn_to_rgb,
+    encode_png,
+    save_png,
+    to_rgb,
+)
+from hamingja_dungeon.utils.ascii_dungeon_generator.dungeon_renderer.renderer import (
+    Renderer,
+)
+from hamingja_dungeon.utils.vector import Vector
+
+
+def decode_png(data: bytes) -> np.ndarray:
+    assert data[:8] == b"\x89PNG\r\n\x1a\n"
+    position, chunks = 8, {}
+    while position < len(data):
+        (length,) = struct.unpack(">I", data[position : position + 4])
+        kind = data[position + 4 : position + 8]
+        body = data[position + 8 : position + 8 + length]
+        end = position + 8 + length
+        (crc,) = struct.unpack(">I", data[end : end + 4])
+        assert crc == zlib.crc32(kind + body)
+        chunks[kind] = body
+        position += 12 + length
+    w, h, depth, colour, _, _, _ = struct.unpack(">IIBBBBB", chunks[b"IHDR"])
+    assert (depth, colour) == (8, 2)
+    rows = np.frombuffer(zlib.decompress(chunks[b"IDAT"]), dtype=np.uint8)
+    rows = rows.reshape(h, 1 + 3 * w)
+    assert not rows[:, 0].any()
+    return rows[:, 1:].reshape(h, w, 3)
+
+
+class TestImage(TestCase):
+    def test_to_rgb(self):
+        sector = Sector((10, 12))
+        room = Room((4, 5))
+        sector.add_room(Vector(2, 3), room)
+        sector.array[0, 0] = False
+        image = to_rgb(sector)
+        print(image.shape)
+        assert image.shape == (10, 12, 3) and image.dtype == np.uint8
+        assert (image[2, 3] == wall["dark"]["bg"]).all()
+        assert (image[3, 4] == floor["dark"]["bg"]).all()
+        assert (image[0, 0] == bg["dark"]["bg"]).all()
+        assert (to_rgb(sector, "fg")[2, 3] == wall["dark"]["fg"]).all()
+
+        scaled = to_rgb(sector, scale=3)
+        assert scaled.shape == (30, 36, 3)
+        assert (scaled[::3, ::3] == image).all()
+        assert (scaled[2::3, 1::3] == image).all()
+
+        drawn = sector.draw_children()
+        assert (drawn_to_rgb(drawn, scale=3) == scaled).all()
+        assert (Renderer(sector).render_image(scale=3) == scaled).all()
+
+        with self.assertRaises(ValueError):
+            to_rgb(sector, "ch")
+        with self.assertRaises(ValueError):
+            to_rgb(sector, scale=0)
+
+    def test_png(self):
+        image = np.random.randint(0, 256, (7, 9, 3), dtype=np.uint8)
+        assert (decode_png(encode_png(image)) == image).all()
+        with self.assertRaises(ValueError):
+            encode_png(np.zeros((3, 3), dtype=np.uint8))
+
+    def test_save_png(self):
+        sector = Sector((100, 150))
+        config = DungeonAreaConfig(
+            size=sector.size,
+            room_size_method="range",
+            range_room_size=(3, 10, 3, 10),
+            fullness=0.5,
+        )
+        PrototypeDesigner(config).populate(sector)
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / "sector.png"
+            start = time.perf_counter()
+            save_png(sector, path, scale=4)
+            print(f"Saved in {time.perf_counter() - start:.4f} s.")
+            image = decode_png(path.read_bytes())
+        assert (image == to_rgb(sector, scale=4)).all()
@@ -2,7 +2,7 @@ from __future__ import annotations
 from unittest import TestCase
 
 import numpy as np
-from hamingja_dungeon.dungeon_elements.mask import Mask
+from hamingja_dungeon.dungeon_elements.mask import LazyMask, Mask
 from hamingja_dungeon.utils.direction import Direction
 from hamingja_dungeon.utils.vector import Vector
 from test_utils import print_test_areas, get_test_areas, print_name
@@ -65,3 +65,44 @@ class TestMask(TestCase):
             print(area.border())
             print("result: ")
             print(area.fit_in(to_fit, area.border(), to_fit_anchor))
+
+    def test_sample_mask_coordinates(self):
+        mask = Mask.from_array(
+            np.array([[0, 1, 0, 0], [0, 0, 0, 0], [1, 1, 0, 1]], dtype=bool)
+        )
+        coordinates = [tuple(c) for c in mask.iter_mask_coordinates()]
+        self.assertEqual(coordinates, [(0, 1), (2, 0), (2, 1), (2, 3)])
+        for _ in range(20):
+            self.assertIn(tuple(mask.sample_mask_coordinate()), coordinates)
+        sample = mask.sample_mask_coordinates(4)
+        self.assertEqual(sorted(map(tuple, sample.array.tolist())), coordinates)
+
+    def test_lazy_mask(self):
+        rng = np.random.default_rng(0)
+        first, second, third = [
+            Mask.from_array(rng.random((300, 300)) < 0.5) for _ in range(3)
+        ]
+        eager = (first - second) | ~(second ^ third)
+        lazy = (first.lazy() - second) | ~(second ^ third.lazy())
+        self.assertIsInstance(lazy, LazyMask)
+        self.assertFalse(lazy.is_evaluated())
+        self.assertEqual(lazy.size, first.size)
+        self.assertTrue(np.array_equal(lazy.evaluate().array, eager.array))
+        self.assertTrue(lazy.is_evaluated())
+
+    def test_views(self):
+        array = np.zeros((4, 5), dtype=bool)
+        view = Mask.view(array)
+        view.insert_shape(Vector(1, 1), Mask((2, 2)))
+        self.assertEqual(np.count_nonzero(array), 4)
+        window = view.crop_view(Vector(1, 2), (3, 10))
+        self.assertEqual(window.size, (3, 3))
+        window.array.fill(True)
+        self.assertEqual(np.count_nonzero(array), 11)
+        copy = view.copy()
+        copy.array.fill(False)
+        self.assertEqual(np.count_nonzero(array), 11)
+        self.assertEqual(Mask((2, 3), fill=None).size, (2, 3))
+        self.assertTrue(Mask.empty_mask((2, 3)).is_empty())
+        with self.assertRaises(ValueError):
+            Mask.wrap(np.zeros((2, 2), dtype=np.uint8))
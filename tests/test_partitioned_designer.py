@@ -0,0 +1,59 @@
+from unittest import TestCase
+
+import numpy as np
+
+from hamingja_dungeon.dungeon_designers.config.dungeon_area_config import (
+    DungeonAreaConfig,
+)
+from hamingja_dungeon.dungeon_designers.partitioned_designer import (
+    PartitionedDesigner,
+    partition,
+)
+from hamingja_dungeon.dungeon_elements.mask import Mask
+from hamingja_dungeon.dungeon_elements.sector import Sector
+from hamingja_dungeon.utils.vector import Vector
+
+
+class TestPartitionedDesigner(TestCase):
+    def test_partition(self):
+        regions = partition((10, 21), (1, 2))
+        assert regions == [(Vector(0, 0), (10, 11)), (Vector(0, 10), (10, 11))]
+        regions = partition((10, 21), (2, 1), margin=2)
+        assert regions == [(Vector(0, 0), (4, 21)), (Vector(6, 0), (4, 21))]
+
+    def test_populate(self):
+        config = DungeonAreaConfig(
+            size=(60, 60),
+            room_size_method="range",
+            range_room_size=(3, 12, 3, 12),
+            fullness=0.8,
+        )
+        first = Sector(config.size)
+        designer = PartitionedDesigner(config, (2, 2), workers=2)
+        report = designer.populate(first, seed=4)
+        second = Sector(config.size)
+        PartitionedDesigner(config, (2, 2), workers=1).populate(second, seed=4)
+        assert len(first.get_rooms()) > 4
+        assert report.rooms == len(first.get_rooms())
+        assert report.fullness == first.fullness()
+        assert report.allocations.allocations > 0
+        assert designer.stitched
+        assert np.array_equal(
+            first.draw_children().tiles, second.draw_children().tiles
+        )
+
+    def test_populate_masked(self):
+        config = DungeonAreaConfig(
+            size=(40, 40),
+            room_size_method="range",
+            range_room_size=(3, 8, 3, 8),
+            fullness=0.8,
+        )
+        sector = Sector(config.size)
+        sector.remove_shape(Vector(0, 20), Mask((40, 20)))
+        designer = PartitionedDesigner(config, (1, 2), workers=1)
+        report = designer.populate(sector, seed=1)
+        assert report.rooms > 0
+        for room in sector.get_rooms().values():
+            assert room.origin.x + room.object.w <= 21
+        self.assertRaises(ValueError, designer.populate, sector, 1)
@@ -0,0 +1,69 @@
+import random
+from unittest import TestCase
+
+from hamingja_dungeon.dungeon_designers.config.dungeon_area_config import (
+    DungeonAreaConfig,
+)
+from hamingja_dungeon.dungeon_designers.population_report import PopulationStatus
+from hamingja_dungeon.dungeon_designers.prototype_designer import PrototypeDesigner
+from hamingja_dungeon.dungeon_elements.sector import Sector
+
+
+def get_config(**budgets) -> DungeonAreaConfig:
+    return DungeonAreaConfig(
+        size=(50, 50),
+        room_size_method="range",
+        range_room_size=(3, 12, 3, 12),
+        fullness=0.9,
+        **budgets,
+    )
+
+
+class TestPrototypeDesigner(TestCase):
+    def test_populate_report(self):
+        random.seed(0)
+        sector = Sector((50, 50))
+        report = PrototypeDesigner(get_config()).populate(sector)
+        print(report)
+        assert report.status in (PopulationStatus.FULL, PopulationStatus.NO_SPACE)
+        assert report.is_complete()
+        assert report.rooms == len(sector.get_rooms())
+        assert report.allocations.allocated_bytes > 0
+
+    def test_attempt_budget(self):
+        random.seed(0)
+        sector = Sector((50, 50))
+        designer = PrototypeDesigner(get_config(max_failed_attempts=1))
+        report = designer.populate(sector)
+        assert report.status == PopulationStatus.ATTEMPT_BUDGET
+        assert report.failed_attempts == 1
+
+    def test_time_budget(self):
+        random.seed(0)
+        sector = Sector((50, 50))
+        config = get_config(time_budget=1e-9, cleanup_time_budget=1e-9)
+        report = PrototypeDesigner(config).populate(sector)
+        assert report.status == PopulationStatus.TIME_BUDGET
+        assert report.rooms == 1
+        assert not report.is_complete()
+
+    def test_concurrent_fits(self):
+        config = get_config(concurrent_fits=4)
+        tiles = []
+        for workers in (1, 3):
+            random.seed(0)
+            sector = Sector((50, 50))
+            PrototypeDesigner(config, workers=workers).populate(sector)
+            tiles.append(sector.draw_children().tiles)
+        assert (tiles[0] == tiles[1]).all()
+
+    def test_grow_starts_from_given_rooms(self):
+        random.seed(0)
+        sector = Sector((50, 50))
+        designer = PrototypeDesigner(get_config(max_failed_attempts=1))
+        designer.populate(sector)
+        rooms = list(sector.get_rooms())
+        designer.grow(sector, [rooms[0], rooms[0]], 0)
+        assert designer._to_process == [rooms[0]]
+        designer.grow(sector, [rooms[-1]], 0)
+        assert designer._to_process == [rooms[-1]]
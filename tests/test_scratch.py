@@ -0,0 +1,44 @@
+from concurrent.futures import ThreadPoolExecutor
+from unittest import TestCase
+
+import numpy as np
+from scipy.ndimage import binary_erosion
+
+from hamingja_dungeon.utils.morphology.morphology import erosion
+from hamingja_dungeon.utils.morphology.scratch import count_allocations, scratch_pool
+
+
+class TestScratchPool(TestCase):
+    def test_borrow_reuses_buffers(self):
+        pool = scratch_pool()
+        with count_allocations() as counter:
+            with pool.borrow((7, 9)) as first:
+                pass
+            with pool.borrow((7, 9)) as second:
+                pass
+        assert first is second
+        assert counter.reuses >= 1
+        assert counter.allocated_bytes + counter.reused_bytes == 2 * 7 * 9
+
+    def test_merge_from_thread(self):
+        def allocate():
+            with count_allocations() as counter:
+                scratch_pool().allocate((5, 5))
+            return counter
+
+        with count_allocations() as counter:
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                worker_counter = executor.submit(allocate).result()
+            assert counter.allocations == 0
+            scratch_pool().merge(worker_counter)
+        assert counter.allocations == 1
+        assert counter.allocated_bytes == 25
+
+    def test_erosion_into_output(self):
+        array = np.ones((6, 6), dtype=bool)
+        array[0, 2] = False
+        structure = np.ones((2, 2), dtype=bool)
+        with scratch_pool().borrow(array.shape) as output:
+            result = erosion(array, structure, output=output)
+            assert result is output
+            assert np.array_equal(result, binary_erosion(array, structure=structure))
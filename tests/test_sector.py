@@ -1,7 +1,11 @@
 from unittest import TestCase
 
+import numpy as np
+
+from hamingja_dungeon import tile_types
 from hamingja_dungeon.dungeon_elements.room import Room
-from hamingja_dungeon.utils.vector import Vector
+from hamingja_dungeon.dungeon_elements.sector import Sector
+from hamingja_dungeon.utils.vector import Vector, VectorArray
 from test_utils import get_test_sector, print_sector
 
 
@@ -27,8 +31,128 @@ class TestSector(TestCase):
         room3 = Room((4,6))
         rid3 = sector.add_room(Vector(1,5),room3)
         sector.make_entrance(rid1, rid3)
+        assert len(room1.entrances) == 2
 
         print_sector(sector)
         sector.remove_room(rid2)
         sector.remove_room(rid3)
+        assert len(room1.entrances) == 0
+        assert not room1.entrances_bitmap().any()
+        print_sector(sector)
+
+    def test_fit_room(self):
+        sector = get_test_sector()
+        to_fit = Room((4, 4))
+        sector.fit_room(to_fit)
+        rid1 = sector.add_room(Vector(1, 1), Room((5, 5)))
+        rid2 = sector.add_room_adjacent(Room((5, 7)), rid1)
+        expected = sector.childless_shape().fit_in(to_fit)
+        assert (sector.fit_room(to_fit).array == expected.array).all()
+        sector.remove_room(rid2)
+        expected = sector.childless_shape().fit_in(to_fit)
+        assert (sector.fit_room(to_fit).array == expected.array).all()
+
+    def test_room_distances(self):
+        sector = get_test_sector()
+        rid1 = sector.add_room(Vector(1, 1), Room((5, 5)))
+        rid2 = sector.add_room(Vector(5, 1), Room((5, 7)))
+        rid3 = sector.add_room(Vector(1, 5), Room((4, 6)))
+        sector.make_entrance(rid1, rid2)
+        sector.make_entrance(rid1, rid3)
+        distances = sector.room_distances([rid2], [rid1, rid3])
+        assert distances.tolist() == [[1, 2]]
+        assert sector.is_within_hops(rid2, rid3, 2)
+        assert not sector.is_within_hops(rid2, rid3, 1)
+        sector.remove_room(rid1)
+        assert not sector.is_within_hops(rid2, rid3, 2)
+        assert sector.vertex_index(rid3) == 1
+        assert sector.room_distances([rid2], [rid3])[0][0] == float("inf")
+
+    def test_rooms_sharing_entrypoints(self):
+        sector = get_test_sector()
+        rid1 = sector.add_room(Vector(1, 1), Room((5, 5)))
+        rid2 = sector.add_room(Vector(5, 1), Room((5, 7)))
+        rid3 = sector.add_room(Vector(7, 9), Room((4, 4)))
+        shared = sector.rooms_sharing_entrypoints(rid1)
+        assert list(shared) == [rid2]
+        assert shared[rid2].array.tolist() == [[5, 2], [5, 3], [5, 4]]
+        assert len(sector.shared_entrypoints(rid1, rid3)) == 0
+        sector.remove_room(rid2)
+        assert sector.rooms_sharing_entrypoints(rid1) == {}
+
+    def test_snapshot(self):
+        sector = get_test_sector()
+        rid1 = sector.add_room(Vector(1, 1), Room((5, 5)))
+        rid2 = sector.add_room(Vector(5, 1), Room((5, 7)))
+        sector.make_entrance(rid1, rid2)
+        tiles = sector.draw_children().tiles.copy()
+        occupancy = sector._occupancy.copy()
+        fit = sector.fit_room(Room((4, 4))).array.copy()
+        snapshot = sector.snapshot()
+
+        rid3 = sector.add_room(Vector(1, 5), Room((4, 6)))
+        sector.make_entrance(rid1, rid3)
+        sector.remove_room(rid2)
+        sector.draw(tile_types.carpet)
+        print_sector(sector)
+        sector.restore(snapshot)
         print_sector(sector)
+
+        assert list(sector.children) == [rid1, rid2]
+        assert rid3 not in sector._adjacency
+        assert sector.room_graph.vcount() == 2
+        assert sector.room_graph.ecount() == 1
+        assert sector.is_within_hops(rid1, rid2, 1)
+        assert len(sector.get_child(rid1).object.entrances) == 1
+        assert (sector._occupancy == occupancy).all()
+        assert (sector.fit_room(Room((4, 4))).array == fit).all()
+        assert (sector.draw_children().tiles == tiles).all()
+
+        sector.remove_room(rid1)
+        sector.restore(snapshot)
+        assert sector.is_within_hops(rid2, rid1, 1)
+        sector.release_snapshots()
+        with self.assertRaises(ValueError):
+            sector.restore(snapshot)
+
+    def test_nested_snapshots(self):
+        sector = get_test_sector()
+        rid1 = sector.add_room(Vector(1, 1), Room((5, 5)))
+        first = sector.snapshot()
+        sector.add_room(Vector(5, 1), Room((5, 7)))
+        second = sector.snapshot()
+        sector.remove_room(rid1)
+        sector.restore(second)
+        assert len(sector.children) == 2
+        sector.restore(first)
+        assert list(sector.children) == [rid1]
+        with self.assertRaises(ValueError):
+            sector.restore(second)
+
+    def test_snapshot_keeps_views(self):
+        sector = get_test_sector()
+        view = sector.crop_view(Vector(2, 2), (3, 3))
+        array = sector.array.copy()
+        tiles = sector.tiles
+        snapshot = sector.snapshot()
+        sector.remove_shape(Vector(0, 0), Room((4, 4)))
+        sector.draw(tile_types.carpet)
+        assert np.shares_memory(view.array, sector.array)
+        assert sector.tiles is tiles
+        sector.restore(snapshot)
+        assert (sector.array == array).all()
+        view.array[:] = False
+        assert not sector.array[2:5, 2:5].any()
+
+    def test_placement_scores(self):
+        sector = Sector((20, 20))
+        rid1 = sector.add_room(Vector(0, 0), Room((5, 5)))
+        room = Room((5, 5))
+        origins = VectorArray.from_vectors([Vector(0, 4), Vector(0, 6)])
+        scores = sector.placement_scores(room, origins)
+        print(scores)
+        assert scores[0] > scores[1]
+        rid2 = sector.add_room_adjacent(room, rid1, candidates=8)
+        assert rid2 in sector.get_rooms()
+        with self.assertRaises(ValueError):
+            sector.add_room_adjacent(Room((5, 5)), rid1, candidates=0)
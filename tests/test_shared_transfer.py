@@ -0,0 +1,77 @@
+import pickle
+import random
+from multiprocessing import shared_memory
+from unittest import TestCase
+
+from hamingja_dungeon.dungeon_designers.config.dungeon_area_config import (
+    DungeonAreaConfig,
+)
+from hamingja_dungeon.dungeon_designers.prototype_designer import PrototypeDesigner
+from hamingja_dungeon.dungeon_elements.sector import Sector
+from hamingja_dungeon.utils.shared_transfer import share
+
+
+def get_sector() -> Sector:
+    random.seed(0)
+    config = DungeonAreaConfig(
+        size=(60, 60),
+        room_size_method="range",
+        range_room_size=(3, 12, 3, 12),
+        fullness=0.5,
+    )
+    sector = Sector(config.size)
+    PrototypeDesigner(config).populate(sector)
+    return sector
+
+
+def get_edges(sector: Sector) -> list:
+    graph = sector.room_graph
+    ids = graph.vs["id"]
+    return sorted(
+        (ids[edge.source], ids[edge.target], sorted(edge["ids"].items()))
+        for edge in graph.es
+    )
+
+
+class TestSharedTransfer(TestCase):
+    def test_share(self):
+        sector = get_sector()
+        payload = share(sector)
+        print(len(payload.metadata), payload.shared_bytes)
+        assert len(payload.metadata) < payload.shared_bytes
+        loaded = payload.load()
+        with self.assertRaises(FileNotFoundError):
+            shared_memory.SharedMemory(name=payload.name)
+
+        assert type(loaded) is Sector
+        assert list(loaded.children) == list(sector.children)
+        assert (loaded.draw_children().tiles == sector.draw_children().tiles).all()
+        assert (loaded._occupancy == sector._occupancy).all()
+        assert get_edges(loaded) == get_edges(sector)
+        assert loaded._entrypoint_index == sector._entrypoint_index
+        for id, child in sector.children.items():
+            assert type(loaded.get_child(id).object) is type(child.object)
+        assert next(loaded.id_generator) == next(sector.id_generator)
+
+    def test_continue_after_pickle(self):
+        sector = get_sector()
+        loaded = pickle.loads(pickle.dumps(sector))
+        config = DungeonAreaConfig(
+            size=(60, 60),
+            room_size_method="range",
+            range_room_size=(3, 12, 3, 12),
+            fullness=0.8,
+        )
+        tiles = []
+        for target in (sector, loaded):
+            random.seed(1)
+            PrototypeDesigner(config).grow(target, list(target.get_rooms()), 30)
+            tiles.append(target.draw_children().tiles)
+        assert (tiles[0] == tiles[1]).all()
+
+    def test_release(self):
+        payload = share(get_sector())
+        payload.release()
+        with self.assertRaises(FileNotFoundError):
+            shared_memory.SharedMemory(name=payload.name)
+        payload.release()
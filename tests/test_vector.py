@@ -0,0 +1,41 @@
+from unittest import TestCase
+
+import numpy as np
+
+from hamingja_dungeon.dungeon_elements.mask import Mask
+from hamingja_dungeon.utils.vector import Vector, VectorArray
+
+
+class TestVector(TestCase):
+    def test_value_semantics(self):
+        vector = Vector(np.int64(1), 2)
+        assert vector == Vector(1, 2)
+        assert vector != (1, 2)
+        assert len({vector, Vector(1, 2), Vector(2, 1)}) == 2
+        self.assertRaises(AttributeError, setattr, vector, "y", 3)
+        moved = vector
+        moved += Vector(1, 1)
+        assert vector == Vector(1, 2) and moved == Vector(2, 3)
+
+    def test_neighbours(self):
+        neighbours = Vector(1, 1).neighbours()
+        assert len(neighbours) == 8
+        assert Vector(1, 1) not in neighbours
+
+    def test_vector_array(self):
+        vectors = VectorArray([[0, 0], [2, 3]])
+        assert vectors[1] == Vector(2, 3)
+        assert (vectors + Vector(1, 1)).array.tolist() == [[1, 1], [3, 4]]
+        assert Vector(2, 3) in vectors
+        assert vectors.neighbours().in_bounds((3, 4)).tolist() == [
+            False, False, False, False, True, False, True, True,
+            True, True, False, True, False, False, False, False,
+        ]
+
+    def test_mask_accepts_vector_array(self):
+        mask = Mask.empty_mask((3, 3))
+        mask.array[1, 1] = True
+        coordinates = mask.mask_coordinates()
+        assert list(coordinates) == [Vector(1, 1)]
+        inside = mask.is_inside_mask(VectorArray([[1, 1], [0, 0], [5, 5]]))
+        assert inside.tolist() == [True, False, False]
@@ -0,0 +1,62 @@
+import random
+import tempfile
+from unittest import TestCase
+
+import numpy as np
+
+from hamingja_dungeon.dungeon_designers.config.dungeon_area_config import (
+    DungeonAreaConfig,
+)
+from hamingja_dungeon.dungeon_designers.prototype_designer import PrototypeDesigner
+from hamingja_dungeon.dungeon_designers.world import World
+from hamingja_dungeon.dungeon_elements.sector import Sector
+from hamingja_dungeon.utils.direction import Direction
+
+
+class TestWorld(TestCase):
+    def setUp(self):
+        self.config = DungeonAreaConfig(
+            size=(30, 36),
+            room_size_method="range",
+            range_room_size=(3, 10, 3, 10),
+            fullness=0.6,
+        )
+
+    def test_chunks_are_deterministic(self):
+        cache_dir = tempfile.mkdtemp()
+        with World(self.config, 3, cache_dir=cache_dir) as world:
+            first = world.chunk(0, 0).draw_children().tiles
+        with World(self.config, 3, prefetch=False) as world:
+            generated = world.chunk(0, 0).draw_children().tiles
+        with World(self.config, 3, cache_dir=cache_dir, prefetch=False) as world:
+            cached = world.chunk(0, 0).draw_children().tiles
+        assert np.array_equal(first, generated)
+        assert np.array_equal(first, cached)
+
+    def test_gates_meet_at_seams(self):
+        with World(self.config, 3, prefetch=False) as world:
+            east = world.gates(2, -1)[Direction.EAST]
+            west = world.gates(2, 0)[Direction.WEST]
+            assert east.y == west.y
+            south = world.gates(-1, 4)[Direction.SOUTH]
+            north = world.gates(0, 4)[Direction.NORTH]
+            assert south.x == north.x
+            tiles = world.chunk(2, 0).draw_children().tiles
+            assert tiles["walkable"][west.y, west.x]
+
+    def test_prefetch_keeps_random_state(self):
+        def populate():
+            random.seed(5)
+            sector = Sector(self.config.size)
+            PrototypeDesigner(self.config).populate(sector)
+            return sector.draw_children().tiles
+
+        alone = populate()
+        with World(self.config, 3, prefetch=False) as world:
+            expected = world.chunk(-1, 0).draw_children().tiles
+        with World(self.config, 3) as world:
+            world.chunk(0, 0)
+            during_prefetch = populate()
+            prefetched = world.chunk(-1, 0).draw_children().tiles
+        assert np.array_equal(alone, during_prefetch)
+        assert np.array_equal(expected, prefetched)